@@ -0,0 +1,212 @@
+import os
+import sys
+import gc
+import json
+import time
+import shutil
+import argparse
+import tempfile
+import tracemalloc
+# Add project root to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_perf import make_pdf, offline_setting
+
+BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "memory_baseline.json")
+
+
+class StageMemory:
+    """Peak traced Python memory, peak RSS and the top new allocations of one stage."""
+
+    def __init__(self, name: str, top: int) -> None:
+        self.name = name
+        self._top = top
+        self.result: dict = {}
+
+    def __enter__(self) -> "StageMemory":
+        from src.eval.benchmark import PeakRSS
+
+        gc.collect()
+        self._before = tracemalloc.take_snapshot()
+        tracemalloc.reset_peak()
+        self._base, _ = tracemalloc.get_traced_memory()
+        self._rss = PeakRSS().__enter__()
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        elapsed = time.perf_counter() - self._start
+        self._rss.__exit__(*exc)
+        current, peak = tracemalloc.get_traced_memory()
+        after = tracemalloc.take_snapshot()
+        # the benchmark's own bookkeeping is not what we are after
+        filters = [tracemalloc.Filter(False, tracemalloc.__file__), tracemalloc.Filter(False, __file__)]
+        diff = after.filter_traces(filters).compare_to(self._before.filter_traces(filters), "lineno")
+        self.result = {
+            "seconds": round(elapsed, 3),
+            "peak_mb": round((peak - self._base) / 2**20, 3),
+            "retained_mb": round((current - self._base) / 2**20, 3),
+            "peak_rss_mb": self._rss.peak_mb,
+            "top": [
+                {
+                    "where": f"{stat.traceback[0].filename}:{stat.traceback[0].lineno}",
+                    "size_kb": round(stat.size_diff / 1024, 1),
+                    "count": stat.count_diff,
+                }
+                for stat in diff[: self._top]
+            ],
+        }
+
+
+def run_size(setting, pages: int, args) -> dict:
+    from src.core import LocalDataIngestion, LocalVectorStore
+
+    topic = f"memory_{pages}"
+    pdf = make_pdf(os.path.join(args.work_dir, f"{topic}.pdf"), pages, args.seed)
+    ingestion = LocalDataIngestion(setting)
+    store = LocalVectorStore(setting)
+    store.change_topic(topic)
+    index = store.get_index()
+    stages = {}
+
+    with StageMemory("extract", args.top) as stage:
+        document = ingestion.read_document(pdf)
+    stages["extract"] = stage.result
+    with StageMemory("split", args.top) as stage:
+        nodes = ingestion.get_splitter()([document])
+    stages["split"] = stage.result
+    del document
+    with StageMemory("embed", args.top) as stage:
+        nodes = ingestion._embed(nodes, lambda counter, count: None)
+    stages["embed"] = stage.result
+    with StageMemory("insert", args.top) as stage:
+        index.insert_nodes(nodes)
+    stages["insert"] = stage.result
+    with StageMemory("persist", args.top) as stage:
+        index.storage_context.persist(persist_dir=store.get_persist_dir())
+    stages["persist"] = stage.result
+    chunks = len(nodes)
+    del nodes, index, store, ingestion
+    with StageMemory("load", args.top) as stage:
+        store = LocalVectorStore(setting)
+        store.change_topic(topic)
+        store.get_index()
+    stages["load"] = stage.result
+
+    for result in stages.values():
+        result["kb_per_chunk"] = round(result["peak_mb"] * 1024 / max(1, chunks), 3)
+    return {"pages": pages, "chunks": chunks, "stages": stages}
+
+
+def compare(results: list[dict], baseline: dict, tolerance: float, min_kb: float) -> list[str]:
+    """Stages whose peak memory per chunk grew beyond `tolerance` (relative)."""
+    regressions = []
+    for result in results:
+        base = baseline.get(str(result["pages"]))
+        if base is None:
+            continue
+        for stage, values in result["stages"].items():
+            base_kb = base.get(stage)
+            kb = values["kb_per_chunk"]
+            if base_kb is not None and kb > base_kb * (1 + tolerance) and kb - base_kb > min_kb:
+                regressions.append(
+                    f"{result['pages']} pages, {stage}: {kb:.1f} KB/chunk > {base_kb:.1f} KB/chunk"
+                )
+    return regressions
+
+
+def report(results: list[dict], top: int) -> None:
+    for result in results:
+        print(f"\n{result['pages']} pages, {result['chunks']} chunks")
+        print(f"  {'stage':<10}{'seconds':>9}{'peak MB':>10}{'kept MB':>10}{'KB/chunk':>10}{'RSS MB':>9}")
+        for stage, values in result["stages"].items():
+            print(
+                f"  {stage:<10}{values['seconds']:>9.3f}{values['peak_mb']:>10.2f}"
+                f"{values['retained_mb']:>10.2f}{values['kb_per_chunk']:>10.1f}"
+                f"{str(values['peak_rss_mb']):>9}"
+            )
+    largest = results[-1]
+    print(f"\ntop allocations per stage, {largest['pages']} pages")
+    for stage, values in largest["stages"].items():
+        print(f"  {stage}")
+        for item in values["top"][:top]:
+            print(f"    {item['size_kb']:>10.1f} KB {item['count']:>7}  {item['where']}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Peak memory per ingestion stage (extract, split, embed, insert, persist, load)"
+    )
+    parser.add_argument(
+        "--sizes", type=int, nargs="+", default=[8, 32, 128], help="Corpus sizes in pages"
+    )
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the synthetic corpora")
+    parser.add_argument("--embed-dim", type=int, default=768, help="Mock embedding size")
+    parser.add_argument("--top", type=int, default=5, help="Allocation sites listed per stage")
+    parser.add_argument("--frames", type=int, default=1, help="tracemalloc frames per allocation")
+    parser.add_argument("--baseline", type=str, default=BASELINE, help="Baseline JSON")
+    parser.add_argument(
+        "--save-baseline", action="store_true", help="Store this run as the new baseline"
+    )
+    parser.add_argument(
+        "--tolerance", type=float, default=0.2, help="Allowed relative growth of memory per chunk"
+    )
+    parser.add_argument(
+        "--min-kb", type=float, default=1.0,
+        help="Ignore growth smaller than this many KB per chunk",
+    )
+    parser.add_argument("--output", type=str, default=None, help="Write the results as JSON")
+    parser.add_argument(
+        "--work-dir", type=str, default=None, help="Keep the data here (default: temp dir)"
+    )
+    args = parser.parse_args()
+
+    from llama_index.core import Settings
+    from llama_index.core.embeddings import MockEmbedding
+
+    keep = args.work_dir is not None
+    args.work_dir = args.work_dir or tempfile.mkdtemp(prefix="rag-memory-")
+    os.makedirs(args.work_dir, exist_ok=True)
+    Settings.embed_model = MockEmbedding(embed_dim=args.embed_dim)
+    setting = offline_setting(args.work_dir)
+    tracemalloc.start(args.frames)
+    try:
+        results = [run_size(setting, pages, args) for pages in sorted(args.sizes)]
+    finally:
+        tracemalloc.stop()
+        if not keep:
+            shutil.rmtree(args.work_dir, ignore_errors=True)
+
+    report(results, args.top)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)["kb_per_chunk"]
+    if args.save_baseline:
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(
+                {
+                    "embed_dim": args.embed_dim,
+                    "kb_per_chunk": {
+                        str(r["pages"]): {s: v["kb_per_chunk"] for s, v in r["stages"].items()}
+                        for r in results
+                    },
+                },
+                f,
+                indent=2,
+            )
+        print(f"\nBaseline saved to {args.baseline}")
+    elif baseline:
+        regressions = compare(results, baseline, args.tolerance, args.min_kb)
+        if regressions:
+            print(f"\n{len(regressions)} memory regression(s) beyond {args.tolerance:.0%}:")
+            for line in regressions:
+                print(f"  {line}")
+            sys.exit(1)
+        print("\nNo memory regressions against the baseline")
+    else:
+        print(f"\nNo baseline at {args.baseline}, run with --save-baseline to create one")
@@ -0,0 +1,316 @@
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import argparse
+import tempfile
+from typing import Any
+# Add project root to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from llama_index.core.bridge.pydantic import Field
+from llama_index.core.llms import (
+    CompletionResponse,
+    CompletionResponseGen,
+    CustomLLM,
+    LLMMetadata,
+)
+from llama_index.core.postprocessor.types import BaseNodePostprocessor
+
+BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "perf_baseline.json")
+# arguments that change what is measured, a baseline only compares with the same ones
+RESULT_ARGS = ("sizes", "queries", "seed", "ttft", "tokens_per_s", "answer_tokens", "embed_dim")
+
+_WORDS = (
+    "wizard castle potion letter owl forest dragon school house spell wand cloak "
+    "library train station garden window candle portrait staircase lake village "
+    "tower secret map friend teacher ghost feast match broom stone mirror key"
+).split()
+
+
+class StubLLM(CustomLLM):
+    """LLM answering from a fixed vocabulary after `ttft` seconds, at `tokens_per_s`."""
+
+    ttft: float = Field(default=0.02)
+    tokens_per_s: float = Field(default=500.0)
+    answer_tokens: int = Field(default=32)
+
+    @property
+    def metadata(self) -> LLMMetadata:
+        return LLMMetadata(context_window=8192, num_output=256, model_name="stub")
+
+    def _tokens(self, prompt: str) -> list[str]:
+        if "choice" in prompt:
+            # router selector, pick the two stage retriever
+            return ['[{"choice": 2, "reason": "The question is clear."}]']
+        rng = random.Random(len(prompt))
+        return [f" {rng.choice(_WORDS)}" for _ in range(self.answer_tokens)]
+
+    def complete(self, prompt: str, formatted: bool = False, **kwargs: Any) -> CompletionResponse:
+        tokens = self._tokens(prompt)
+        time.sleep(self.ttft + len(tokens) / self.tokens_per_s)
+        return CompletionResponse(text="".join(tokens))
+
+    def stream_complete(
+        self, prompt: str, formatted: bool = False, **kwargs: Any
+    ) -> CompletionResponseGen:
+        tokens = self._tokens(prompt)
+
+        def gen():
+            text = ""
+            time.sleep(self.ttft)
+            for token in tokens:
+                time.sleep(1 / self.tokens_per_s)
+                text += token
+                yield CompletionResponse(text=text, delta=token)
+
+        return gen()
+
+
+class TopNRerank(BaseNodePostprocessor):
+    """Keeps the first `top_n` nodes, stands in for the cross-encoder."""
+
+    top_n: int = 6
+
+    def _postprocess_nodes(self, nodes, query_bundle=None):
+        return nodes[: self.top_n]
+
+
+def make_pdf(path: str, pages: int, seed: int = 0, words_per_page: int = 350) -> str:
+    """Synthetic PDF of `pages` pages of sentences, the same for the same seed."""
+    import fitz
+
+    rng = random.Random(seed * 100003 + pages)
+    document = fitz.open()
+    for _ in range(pages):
+        words = [rng.choice(_WORDS) for _ in range(words_per_page)]
+        sentences = [" ".join(words[i : i + 12]).capitalize() + "." for i in range(0, len(words), 12)]
+        page = document.new_page()
+        page.insert_textbox(fitz.Rect(40, 40, 555, 800), " ".join(sentences), fontsize=8)
+    document.save(path)
+    document.close()
+    return path
+
+
+def offline_setting(work_dir: str):
+    """Settings keeping every file the pipeline writes inside `work_dir`."""
+    from src.setting import RAGSettings
+
+    setting = RAGSettings()
+    setting.storage.persist_dir_chroma = os.path.join(work_dir, "chroma")
+    setting.storage.persist_dir_storage = os.path.join(work_dir, "storage")
+    setting.cache.cache_dir = os.path.join(work_dir, "cache")
+    setting.cache.answer_cache = False
+    setting.metrics.generation_log = ""
+    setting.metrics.profile_dir = os.path.join(work_dir, "profiles")
+    setting.pipeline.background_load = False
+    setting.pipeline.warmup_steps = ["embedding", "retrieval"]
+    return setting
+
+
+def use_stub_reranker(setting) -> None:
+    """Put the top-n stand-in into the reranker cache, so no cross-encoder is downloaded."""
+    from src.core.engine import retriever
+
+    top_n = setting.retriever.top_k_rerank
+    retriever._rerankers[(setting.retriever.rerank_llm, top_n)] = TopNRerank(top_n=top_n)
+
+
+def use_offline_models(setting, llm: StubLLM, embed_dim: int = 384) -> None:
+    """Point the model factories and the reranker cache at the offline stand-ins."""
+    from llama_index.core.embeddings import MockEmbedding
+    from src.core import LocalEmbedding, LocalRAGModel
+
+    embed_model = MockEmbedding(embed_dim=embed_dim)
+    LocalRAGModel.set = staticmethod(lambda *args, **kwargs: llm)
+    LocalEmbedding.set = staticmethod(lambda *args, **kwargs: embed_model)
+    use_stub_reranker(setting)
+
+
+def retriever_types(retriever) -> set[str]:
+    """Class names of `retriever` and every retriever under its router and fusion stages."""
+    pending, names = [retriever], set()
+    while pending:
+        current = pending.pop()
+        names.add(type(current).__name__)
+        pending.extend(getattr(current, "_retrievers", []))
+    return names
+
+
+def run_suite(args) -> dict[str, float]:
+    from src.core import LocalVectorStore
+    from src.eval.benchmark import latency_summary
+    from src.pipeline import LocalRAGPipeline
+
+    setting = offline_setting(args.work_dir)
+    llm = StubLLM(ttft=args.ttft, tokens_per_s=args.tokens_per_s, answer_tokens=args.answer_tokens)
+    use_offline_models(setting, llm, args.embed_dim)
+    results = {}
+
+    start = time.perf_counter()
+    pipeline = LocalRAGPipeline(setting)
+    results["pipeline_init_s"] = time.perf_counter() - start
+
+    topics = []
+    for pages in args.sizes:
+        topic = f"bench_{pages}"
+        topics.append(topic)
+        pdf = make_pdf(os.path.join(args.work_dir, f"{topic}.pdf"), pages, args.seed)
+        pipeline.switch_topic(topic)
+
+        start = time.perf_counter()
+        pipeline.store_nodes([pdf])
+        elapsed = time.perf_counter() - start
+        chunks = len(pipeline._ingestion.get_ingested_nodes())
+        results[f"ingest_{pages}p.pages_per_s"] = pages / elapsed
+        results[f"ingest_{pages}p.chunks_per_s"] = chunks / elapsed
+
+        start = time.perf_counter()
+        pipeline.set_engine()
+        results[f"engine_build_{pages}p_s"] = time.perf_counter() - start
+        # without BM25 only the vector search is timed, the numbers are not comparable
+        has_bm25 = "LocalBM25Retriever" in retriever_types(pipeline._query_engine._retriever)
+        results[f"bm25_{pages}p"] = float(has_bm25)
+        if not has_bm25:
+            print(f"Warning: the engine of {topic} has no BM25 retriever, only vector search is timed")
+
+        latencies = []
+        rng = random.Random(args.seed)
+        for i in range(args.queries):
+            question = f"What about the {rng.choice(_WORDS)} and the {rng.choice(_WORDS)} ({i})?"
+            start = time.perf_counter()
+            response = pipeline.query("QA", question, [])
+            for _ in response.response_gen:
+                pass
+            latencies.append(time.perf_counter() - start)
+        summary = latency_summary(latencies)
+        results[f"query_{pages}p.p50_s"] = summary["p50_ms"] / 1000
+        results[f"query_{pages}p.p95_s"] = summary["p95_ms"] / 1000
+
+        start = time.perf_counter()
+        store = LocalVectorStore(setting)
+        store.change_topic(topic)
+        store.get_index()
+        results[f"index_load_{pages}p_s"] = time.perf_counter() - start
+
+    switches = []
+    for topic in topics * 2:
+        start = time.perf_counter()
+        pipeline.switch_topic(topic)
+        switches.append(time.perf_counter() - start)
+    results["switch_topic_s"] = sum(switches) / len(switches)
+    return {name: round(value, 6) for name, value in results.items()}
+
+
+def higher_is_better(metric: str) -> bool:
+    # bm25_*: 1 when the engine searched with BM25, losing it is a regression
+    return metric.endswith("_per_s") or metric.startswith("bm25_")
+
+
+def compare(results: dict, baseline: dict, tolerance: float, min_delta_s: float) -> list[str]:
+    """Metrics worse than the baseline by more than `tolerance` (relative)."""
+    regressions = []
+    for metric, value in results.items():
+        base = baseline.get(metric)
+        if base is None or base == 0:
+            continue
+        if higher_is_better(metric):
+            if value < base / (1 + tolerance):
+                regressions.append(f"{metric}: {value:.3f} < {base:.3f}")
+        elif value > base * (1 + tolerance) and value - base > min_delta_s:
+            regressions.append(f"{metric}: {value:.4f}s > {base:.4f}s")
+    return regressions
+
+
+def mismatched_args(args, saved: dict) -> list[str]:
+    """Measurement arguments that differ from those the baseline was made with."""
+    current = vars(args)
+    return [
+        f"{name}: {saved.get(name)!r} (baseline) != {current[name]!r}"
+        for name in RESULT_ARGS
+        if saved.get(name) != current[name]
+    ]
+
+
+def report(results: dict, baseline: dict) -> None:
+    print(f"\n  {'metric':<36}{'current':>12}{'baseline':>12}{'change':>10}")
+    for metric, value in results.items():
+        base = baseline.get(metric)
+        change = ""
+        if base:
+            change = f"{(value - base) / base * 100:+.1f}%"
+        base = f"{base:.4f}" if base is not None else "-"
+        print(f"  {metric:<36}{value:>12.4f}{base:>12}{change:>10}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Offline performance regression suite (mock embeddings, stub LLM, synthetic PDFs)"
+    )
+    parser.add_argument(
+        "--sizes", type=int, nargs="+", default=[4, 16, 64], help="Corpus sizes in pages"
+    )
+    parser.add_argument("--queries", type=int, default=20, help="Queries timed per corpus")
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the synthetic corpora")
+    parser.add_argument("--ttft", type=float, default=0.02, help="Stub LLM time to first token")
+    parser.add_argument(
+        "--tokens-per-s", type=float, default=500.0, help="Stub LLM decode rate"
+    )
+    parser.add_argument("--answer-tokens", type=int, default=32, help="Stub LLM answer length")
+    parser.add_argument("--embed-dim", type=int, default=384, help="Mock embedding size")
+    parser.add_argument("--baseline", type=str, default=BASELINE, help="Baseline JSON")
+    parser.add_argument(
+        "--save-baseline", action="store_true", help="Store this run as the new baseline"
+    )
+    parser.add_argument(
+        "--tolerance", type=float, default=0.3, help="Allowed relative slowdown"
+    )
+    parser.add_argument(
+        "--min-delta", type=float, default=0.005,
+        help="Ignore slowdowns of timings smaller than this many seconds",
+    )
+    parser.add_argument(
+        "--work-dir", type=str, default=None, help="Keep the data here (default: temp dir)"
+    )
+    args = parser.parse_args()
+
+    baseline = {}
+    if os.path.exists(args.baseline) and not args.save_baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            saved = json.load(f)
+        mismatched = mismatched_args(args, saved.get("args", {}))
+        if mismatched:
+            print(f"{args.baseline} was made with other arguments, run with those or --save-baseline:")
+            for line in mismatched:
+                print(f"  {line}")
+            sys.exit(2)
+        baseline = saved["results"]
+
+    keep = args.work_dir is not None
+    args.work_dir = args.work_dir or tempfile.mkdtemp(prefix="rag-bench-")
+    os.makedirs(args.work_dir, exist_ok=True)
+    try:
+        results = run_suite(args)
+    finally:
+        if not keep:
+            shutil.rmtree(args.work_dir, ignore_errors=True)
+
+    report(results, baseline)
+
+    if args.save_baseline:
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump({"args": {k: v for k, v in vars(args).items() if k != "work_dir"},
+                       "results": results}, f, indent=2)
+        print(f"\nBaseline saved to {args.baseline}")
+    elif baseline:
+        regressions = compare(results, baseline, args.tolerance, args.min_delta)
+        if regressions:
+            print(f"\n{len(regressions)} regression(s) beyond {args.tolerance:.0%}:")
+            for line in regressions:
+                print(f"  {line}")
+            sys.exit(1)
+        print("\nNo regressions against the baseline")
+    else:
+        print(f"\nNo baseline at {args.baseline}, run with --save-baseline to create one")
@@ -0,0 +1,86 @@
+import os
+import sys
+import time
+import argparse
+import subprocess
+from collections import defaultdict
+# Add project root to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def import_profile(module: str) -> tuple[float, dict[str, int], dict[str, int]]:
+    """Import a module in a fresh interpreter and collect `-X importtime` data (microseconds)."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True,
+        cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+    )
+    self_by_package = defaultdict(int)
+    cumulative = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        name = name.strip()
+        self_by_package[name.split(".")[0]] += int(self_us)
+        cumulative[name] = int(cumulative_us)
+    total = cumulative.get(module, sum(self_by_package.values()))
+    return total / 1e6, dict(self_by_package), cumulative
+
+
+def report_imports(module: str, top: int):
+    total, by_package, cumulative = import_profile(module)
+    print(f"\nimport {module}: {total:.2f}s")
+    print(f"  {'package':<32}{'self time':>12}")
+    for name, us in sorted(by_package.items(), key=lambda x: -x[1])[:top]:
+        print(f"  {name:<32}{us / 1e6:>11.2f}s")
+    heavy = ["torch", "transformers", "gradio", "chromadb", "sentence_transformers"]
+    loaded = [name for name in heavy if name in cumulative]
+    print(f"  heavy backends imported: {', '.join(loaded) or 'none'}")
+
+
+def report_pipeline(data_dir: str | None):
+    start = time.perf_counter()
+    from src.setting import RAGSettings
+    from src.pipeline import LocalRAGPipeline
+
+    imported = time.perf_counter()
+
+    setting = RAGSettings()
+    if data_dir:
+        setting.storage.persist_dir_chroma = os.path.join(data_dir, "chroma")
+        setting.storage.persist_dir_storage = os.path.join(data_dir, "storage")
+        setting.cache.cache_dir = os.path.join(data_dir, "cache")
+    pipeline = LocalRAGPipeline(setting)
+    constructed = time.perf_counter()
+    pipeline.wait_ready()
+    ready = time.perf_counter()
+    print("\npipeline startup")
+    print(f"  import src.pipeline   {imported - start:>8.2f}s")
+    print(f"  LocalRAGPipeline()    {constructed - imported:>8.2f}s  (app can serve from here)")
+    print(f"  index ready           {ready - constructed:>8.2f}s  (background load)")
+    print(f"  total                 {ready - start:>8.2f}s")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Break down the startup time of the app")
+    parser.add_argument(
+        "--modules",
+        nargs="+",
+        default=["src.pipeline", "src.ui"],
+        help="Modules to profile, each in a fresh interpreter",
+    )
+    parser.add_argument("--top", type=int, default=15, help="Packages to list per module")
+    parser.add_argument(
+        "--pipeline", action="store_true", help="Also time LocalRAGPipeline construction"
+    )
+    parser.add_argument(
+        "--data-dir", type=str, default=None, help="Data directory for --pipeline"
+    )
+    args = parser.parse_args()
+
+    for module in args.modules:
+        report_imports(module, args.top)
+    if args.pipeline:
+        report_pipeline(args.data_dir)
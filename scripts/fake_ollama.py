@@ -0,0 +1,345 @@
+import os
+import sys
+import json
+import time
+import random
+import hashlib
+import argparse
+import threading
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+_WORDS = (
+    "the answer is in the document and it says that a wizard found a letter near "
+    "the castle while the owl waited by the lake before the feast began"
+).split()
+
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        # clients dropping idle keep-alive connections is not worth a traceback
+        if isinstance(sys.exc_info()[1], (ConnectionResetError, BrokenPipeError)):
+            return
+        super().handle_error(request, client_address)
+
+
+@dataclass
+class FakeOllamaConfig:
+    ttft: float = 0.2               # seconds before the first token, on top of waiting for a slot
+    tokens_per_s: float = 30.0      # decode rate of every generation
+    answer_tokens: int = 64         # tokens per answer
+    embed_dim: int = 768
+    embed_latency: float = 0.005    # seconds per embedded text
+    parallel: int = 4               # generations served at once, like OLLAMA_NUM_PARALLEL (0 = no limit)
+    error_rate: float = 0.0         # share of generation and embedding requests that fail
+    error_status: int = 500
+    seed: int = 0
+    models: list[str] = field(
+        default_factory=lambda: ["llama3:8b-instruct-q8_0", "nomic-embed-text:latest"]
+    )
+
+
+class FakeOllama:
+    """Stand-in Ollama server with a fixed speed, for load tests without a GPU.
+
+    Serves the endpoints the app uses (`/api/chat`, `/api/generate`,
+    `/api/embeddings`, `/api/embed`, `/api/tags`, `/api/pull`, `/api/version`).
+    Answers are made up, embeddings are derived from a hash of the text so the
+    same text always gets the same vector.
+    """
+
+    def __init__(self, config: FakeOllamaConfig | None = None) -> None:
+        self.config = config or FakeOllamaConfig()
+        self._models = list(self.config.models)
+        self._slots = threading.Semaphore(self.config.parallel) if self.config.parallel > 0 else None
+        self._rng = random.Random(self.config.seed)
+        self._lock = threading.Lock()
+        self._server: _Server | None = None
+        self._requests: dict[str, int] = {}
+        self._errors = 0
+        self._in_flight = 0
+        self._peak_in_flight = 0
+
+    # ---- behaviour
+    def _should_fail(self) -> bool:
+        with self._lock:
+            return self._rng.random() < self.config.error_rate
+
+    def _count(self, path: str, delta: int) -> None:
+        with self._lock:
+            if delta > 0:
+                self._requests[path] = self._requests.get(path, 0) + 1
+            self._in_flight += delta
+            self._peak_in_flight = max(self._peak_in_flight, self._in_flight)
+
+    def _answer(self, prompt: str) -> list[str]:
+        if "choice" in prompt:
+            # router selector prompt, expects a JSON list of choices
+            return ['[{"choice": 2, "reason": "The question is clear."}]']
+        rng = random.Random(len(prompt))
+        return [f" {rng.choice(_WORDS)}" for _ in range(self.config.answer_tokens)]
+
+    def embedding(self, text: str) -> list[float]:
+        seed = int.from_bytes(hashlib.blake2b(text.encode("utf-8"), digest_size=8).digest(), "big")
+        rng = random.Random(seed)
+        vector = [rng.gauss(0.0, 1.0) for _ in range(self.config.embed_dim)]
+        norm = sum(v * v for v in vector) ** 0.5 or 1.0
+        return [v / norm for v in vector]
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "requests": dict(self._requests),
+                "injected_errors": self._errors,
+                "peak_in_flight": self._peak_in_flight,
+            }
+
+    # ---- server
+    def _handler(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, format, *args):
+                pass
+
+            def _json(self, status: int, body: dict) -> None:
+                data = json.dumps(body).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def _start_stream(self) -> None:
+                self.send_response(200)
+                self.send_header("Content-Type", "application/x-ndjson")
+                self.send_header("Transfer-Encoding", "chunked")
+                self.end_headers()
+
+            def _chunk(self, body: dict | None) -> None:
+                data = (json.dumps(body) + "\n").encode("utf-8") if body is not None else b""
+                self.wfile.write(f"{len(data):x}\r\n".encode("ascii") + data + b"\r\n")
+                self.wfile.flush()
+
+            def _read_body(self) -> dict:
+                length = int(self.headers.get("Content-Length", 0) or 0)
+                return json.loads(self.rfile.read(length) or b"{}")
+
+            def do_GET(self):
+                path = self.path.split("?")[0]
+                if path == "/":
+                    data = b"Ollama is running"
+                    self.send_response(200)
+                    self.send_header("Content-Length", str(len(data)))
+                    self.end_headers()
+                    self.wfile.write(data)
+                elif path == "/api/version":
+                    self._json(200, {"version": "0.0.0-fake"})
+                elif path == "/api/tags":
+                    with fake._lock:
+                        models = list(fake._models)
+                    self._json(200, {"models": [{"name": m, "model": m, "size": 0} for m in models]})
+                else:
+                    self._json(404, {"error": f"{path} not found"})
+
+            def do_POST(self):
+                path = self.path.split("?")[0]
+                body = self._read_body()
+                routes = {
+                    "/api/chat": self._generate,
+                    "/api/generate": self._generate,
+                    "/api/embeddings": self._embeddings,
+                    "/api/embed": self._embeddings,
+                    "/api/pull": self._pull,
+                }
+                route = routes.get(path)
+                if route is None:
+                    self._json(404, {"error": f"{path} not found"})
+                    return
+                fake._count(path, 1)
+                try:
+                    route(path, body)
+                except (BrokenPipeError, ConnectionResetError):
+                    pass
+                finally:
+                    fake._count(path, -1)
+
+            def _fail(self) -> bool:
+                if not fake._should_fail():
+                    return False
+                with fake._lock:
+                    fake._errors += 1
+                self._json(fake.config.error_status, {"error": "injected failure"})
+                return True
+
+            def _generate(self, path: str, body: dict) -> None:
+                chat = path == "/api/chat"
+                model = body.get("model", "")
+                if chat:
+                    prompt = "\n".join(m.get("content") or "" for m in body.get("messages", []))
+                else:
+                    prompt = body.get("prompt")
+                    if prompt is None:
+                        # a model load request, see OllamaClient.load
+                        self._json(200, {"model": model, "response": "", "done": True, "done_reason": "load"})
+                        return
+                if self._fail():
+                    return
+                config = fake.config
+                start = time.perf_counter()
+                if fake._slots is not None:
+                    fake._slots.acquire()
+                try:
+                    time.sleep(config.ttft)
+                    prompt_done = time.perf_counter()
+                    tokens = fake._answer(prompt)
+
+                    def message(text: str, done: bool) -> dict:
+                        item = {
+                            "model": model,
+                            "created_at": datetime.now(timezone.utc).isoformat(),
+                            "done": done,
+                        }
+                        if chat:
+                            item["message"] = {"role": "assistant", "content": text}
+                        else:
+                            item["response"] = text
+                        return item
+
+                    def final(text: str) -> dict:
+                        end = time.perf_counter()
+                        return {
+                            **message(text, True),
+                            "done_reason": "stop",
+                            "total_duration": int((end - start) * 1e9),
+                            "load_duration": 0,
+                            "prompt_eval_count": len(prompt.split()),
+                            "prompt_eval_duration": int((prompt_done - start) * 1e9),
+                            "eval_count": len(tokens),
+                            "eval_duration": int((end - prompt_done) * 1e9),
+                        }
+
+                    if not body.get("stream", True):
+                        time.sleep(len(tokens) / config.tokens_per_s)
+                        self._json(200, final("".join(tokens)))
+                        return
+                    self._start_stream()
+                    for token in tokens:
+                        self._chunk(message(token, False))
+                        time.sleep(1 / config.tokens_per_s)
+                    self._chunk(final(""))
+                    self._chunk(None)
+                finally:
+                    if fake._slots is not None:
+                        fake._slots.release()
+
+            def _embeddings(self, path: str, body: dict) -> None:
+                if self._fail():
+                    return
+                if path == "/api/embeddings":
+                    time.sleep(fake.config.embed_latency)
+                    self._json(200, {"embedding": fake.embedding(body.get("prompt", ""))})
+                    return
+                texts = body.get("input", "")
+                texts = [texts] if isinstance(texts, str) else list(texts)
+                time.sleep(fake.config.embed_latency * len(texts))
+                self._json(
+                    200,
+                    {"model": body.get("model", ""), "embeddings": [fake.embedding(t) for t in texts]},
+                )
+
+            def _pull(self, path: str, body: dict) -> None:
+                name = body.get("name") or body.get("model") or ""
+                name = name if ":" in name else f"{name}:latest"
+                with fake._lock:
+                    if name not in fake._models:
+                        fake._models.append(name)
+                statuses = [{"status": "pulling manifest"}]
+                statuses += [
+                    {"status": f"pulling {name}", "digest": "sha256:fake", "total": 100, "completed": c}
+                    for c in (0, 50, 100)
+                ]
+                statuses += [{"status": "verifying sha256 digest"}, {"status": "success"}]
+                if not body.get("stream", True):
+                    self._json(200, statuses[-1])
+                    return
+                self._start_stream()
+                for status in statuses:
+                    self._chunk(status)
+                self._chunk(None)
+
+        return Handler
+
+    def start_in_thread(self, host: str = "127.0.0.1", port: int = 0) -> str:
+        """Serve in a background thread, returns the base URL (port 0 picks a free one)."""
+        self._server = _Server((host, port), self._handler())
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return f"http://{host}:{self._server.server_port}"
+
+    def stop(self) -> None:
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+
+def add_config_arguments(parser: argparse.ArgumentParser) -> None:
+    defaults = FakeOllamaConfig()
+    parser.add_argument("--ttft", type=float, default=defaults.ttft, help="Time to first token (s)")
+    parser.add_argument(
+        "--tokens-per-s", type=float, default=defaults.tokens_per_s, help="Decode rate"
+    )
+    parser.add_argument(
+        "--answer-tokens", type=int, default=defaults.answer_tokens, help="Tokens per answer"
+    )
+    parser.add_argument("--embed-dim", type=int, default=defaults.embed_dim, help="Embedding size")
+    parser.add_argument(
+        "--embed-latency", type=float, default=defaults.embed_latency, help="Seconds per embedded text"
+    )
+    parser.add_argument(
+        "--parallel", type=int, default=defaults.parallel,
+        help="Generations served at once, the rest wait (0 = no limit)",
+    )
+    parser.add_argument(
+        "--error-rate", type=float, default=defaults.error_rate,
+        help="Share of generation and embedding requests answered with --error-status",
+    )
+    parser.add_argument("--error-status", type=int, default=defaults.error_status)
+    parser.add_argument("--seed", type=int, default=defaults.seed, help="Seed of the error injection")
+
+
+def config_from_args(args) -> FakeOllamaConfig:
+    return FakeOllamaConfig(
+        ttft=args.ttft,
+        tokens_per_s=args.tokens_per_s,
+        answer_tokens=args.answer_tokens,
+        embed_dim=args.embed_dim,
+        embed_latency=args.embed_latency,
+        parallel=args.parallel,
+        error_rate=args.error_rate,
+        error_status=args.error_status,
+        seed=args.seed,
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fake Ollama server with a configurable speed")
+    parser.add_argument("--host", type=str, default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=11434)
+    add_config_arguments(parser)
+    args = parser.parse_args()
+
+    server = FakeOllama(config_from_args(args))
+    url = server.start_in_thread(args.host, args.port)
+    print(f"Fake Ollama serving on {url} (pid {os.getpid()}), Ctrl+C to stop")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.stop()
+        sys.exit(0)
@@ -0,0 +1,179 @@
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import argparse
+import tempfile
+import threading
+# Add project root to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_perf import make_pdf, offline_setting, use_stub_reranker
+from fake_ollama import FakeOllama, add_config_arguments, config_from_args
+
+_QUESTIONS = [
+    "What happened at the castle?",
+    "Who sent the letter?",
+    "Where did the owl wait?",
+    "What is said about the feast?",
+    "Why was the wizard near the lake?",
+    "Summarize the document.",
+]
+
+
+class ChatUser(threading.Thread):
+    """One simulated user asking `turns` questions in a row, like the chat UI."""
+
+    def __init__(self, pipeline, index: int, args, start_event: threading.Event) -> None:
+        super().__init__(name=f"user-{index}", daemon=True)
+        self._pipeline = pipeline
+        self._args = args
+        self._start_event = start_event
+        self._rng = random.Random(args.seed * 1000 + index)
+        self.turns: list[dict] = []
+
+    def run(self) -> None:
+        self._start_event.wait()
+        chatbot = []
+        for turn in range(self._args.turns):
+            question = f"{self._rng.choice(_QUESTIONS)} ({self.name} #{turn})"
+            start = time.perf_counter()
+            first_token = None
+            tokens = 0
+            answer = []
+            record = {}
+            try:
+                response = self._pipeline.query(self._args.mode, question, chatbot)
+                for token in response.response_gen:
+                    if first_token is None:
+                        first_token = time.perf_counter()
+                    tokens += 1
+                    answer.append(token)
+                end = time.perf_counter()
+                record = {
+                    "latency_s": end - start,
+                    "ttft_s": (first_token or end) - start,
+                    "tokens": tokens,
+                }
+                chatbot = chatbot + [
+                    {"role": "user", "content": question},
+                    {"role": "assistant", "content": "".join(answer)},
+                ]
+            except Exception as e:
+                record = {"error": f"{type(e).__name__}: {e}", "latency_s": time.perf_counter() - start}
+            self.turns.append(record)
+            if self._args.think > 0:
+                time.sleep(self._rng.uniform(0, 2 * self._args.think))
+
+
+def run_load(args, base_url: str) -> dict:
+    from src.eval.benchmark import PeakRSS, latency_summary
+    from src.pipeline import LocalRAGPipeline
+
+    setting = offline_setting(args.work_dir)
+    setting.ollama.endpoints = [base_url]
+    setting.ollama.llm = args.model
+    setting.ingestion.embed_llm = args.embed_model
+    use_stub_reranker(setting)
+
+    pipeline = LocalRAGPipeline(setting)
+    pipeline.set_model_name(args.model)
+    pipeline.switch_topic("load_test")
+    pdf = make_pdf(os.path.join(args.work_dir, "load_test.pdf"), args.pages, args.seed)
+    start = time.perf_counter()
+    pipeline.store_nodes([pdf])
+    ingest_s = time.perf_counter() - start
+    pipeline.set_chat_mode()
+
+    start_event = threading.Event()
+    users = [ChatUser(pipeline, i, args, start_event) for i in range(args.users)]
+    for user in users:
+        user.start()
+    with PeakRSS() as rss:
+        start = time.perf_counter()
+        start_event.set()
+        for user in users:
+            user.join()
+        elapsed = time.perf_counter() - start
+
+    turns = [turn for user in users for turn in user.turns]
+    ok = [turn for turn in turns if "error" not in turn]
+    errors = [turn["error"] for turn in turns if "error" in turn]
+    tokens = sum(turn["tokens"] for turn in ok)
+    return {
+        "users": args.users,
+        "turns": len(turns),
+        "errors": len(errors),
+        "error_samples": sorted(set(errors))[:5],
+        "ingest_s": round(ingest_s, 3),
+        "elapsed_s": round(elapsed, 3),
+        "turns_per_s": round(len(ok) / elapsed, 3) if elapsed else None,
+        "tokens_per_s": round(tokens / elapsed, 1) if elapsed else None,
+        "latency": latency_summary([turn["latency_s"] for turn in ok]),
+        "ttft": latency_summary([turn["ttft_s"] for turn in ok]),
+        "peak_rss_mb": rss.peak_mb,
+    }
+
+
+def report(result: dict) -> None:
+    print(f"\n{result['users']} users, {result['turns']} turns in {result['elapsed_s']}s")
+    print(f"  throughput   {result['turns_per_s']} turns/s, {result['tokens_per_s']} tokens/s")
+    for name in ("latency", "ttft"):
+        summary = result[name]
+        print(
+            f"  {name:<12} p50 {summary['p50_ms']} ms, p95 {summary['p95_ms']} ms, "
+            f"p99 {summary['p99_ms']} ms"
+        )
+    print(f"  errors       {result['errors']} {result['error_samples'] or ''}")
+    if "server" in result:
+        print(f"  server       {result['server']}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Simulate concurrent chat users against LocalRAGPipeline on a fake Ollama"
+    )
+    parser.add_argument("--users", type=int, default=8, help="Concurrent chat users")
+    parser.add_argument("--turns", type=int, default=5, help="Questions per user")
+    parser.add_argument(
+        "--think", type=float, default=0.0, help="Mean pause between a user's questions (s)"
+    )
+    parser.add_argument("--mode", type=str, default="chat", choices=["chat", "QA"])
+    parser.add_argument("--pages", type=int, default=16, help="Pages of the synthetic document")
+    parser.add_argument("--model", type=str, default="llama3:8b-instruct-q8_0")
+    parser.add_argument("--embed-model", type=str, default="nomic-embed-text")
+    parser.add_argument(
+        "--ollama-url", type=str, default=None,
+        help="Use a running server (e.g. fake_ollama.py) instead of starting a fake one",
+    )
+    parser.add_argument("--output", type=str, default=None, help="Write the result as JSON")
+    parser.add_argument(
+        "--work-dir", type=str, default=None, help="Keep the data here (default: temp dir)"
+    )
+    add_config_arguments(parser)
+    args = parser.parse_args()
+
+    server = None
+    base_url = args.ollama_url
+    if base_url is None:
+        server = FakeOllama(config_from_args(args))
+        base_url = server.start_in_thread()
+        print(f"Fake Ollama on {base_url}")
+    keep = args.work_dir is not None
+    args.work_dir = args.work_dir or tempfile.mkdtemp(prefix="rag-load-")
+    os.makedirs(args.work_dir, exist_ok=True)
+    try:
+        result = run_load(args, base_url)
+    finally:
+        if not keep:
+            shutil.rmtree(args.work_dir, ignore_errors=True)
+    if server is not None:
+        result["server"] = server.stats()
+        server.stop()
+
+    report(result)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(result, f, indent=2)
@@ -1,7 +1,8 @@
 from .pipeline import LocalRAGPipeline
-from .ollama import run_ollama_server
+from .ollama import run_ollama_server, run_ollama_servers
 
 __all__ = [
     "LocalRAGPipeline",
     "run_ollama_server",
+    "run_ollama_servers",
 ]
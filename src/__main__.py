@@ -25,7 +25,9 @@ from .ui.theme import JS_LIGHT_THEME, CSS
 import gradio as gr
 from .pipeline import LocalRAGPipeline
 from .logger import Logger
-from .ollama import run_ollama_server, is_port_open
+from .ollama import run_ollama_servers
+from .api import LocalAPIServer
+from .core import MetricsServer
 
 load_dotenv()
 
@@ -37,12 +39,14 @@ AVATAR_IMAGES = ["./assets/user.png", "./assets/bot.png"]
 # PARSER
 parser = argparse.ArgumentParser()
 parser.add_argument("--share", action="store_true", help="Share gradio app")
+parser.add_argument("--api", action="store_true", help="Also serve the HTTP API")
+parser.add_argument(
+    "--metrics", action="store_true", help="Serve Prometheus metrics on a local port"
+)
 args = parser.parse_args()
 
 # OLLAMA SERVER
-port_number = 11434
-if not is_port_open(port_number):
-    run_ollama_server()
+run_ollama_servers()
 
 # LOGGER
 
@@ -53,6 +57,14 @@ logger.reset_logs()
 # PIPELINE
 pipeline = LocalRAGPipeline()
 
+# METRICS
+if args.metrics:
+    MetricsServer().start_in_thread()
+
+# API
+if args.api:
+    LocalAPIServer(pipeline, data_dir=DATA_DIR).start_in_thread()
+
 # UI
 ui = LocalChatbotUI(
     pipeline=pipeline,
@@ -0,0 +1,5 @@
+from .server import LocalAPIServer
+
+__all__ = [
+    "LocalAPIServer",
+]
@@ -0,0 +1,40 @@
+import os
+import asyncio
+import argparse
+
+# Disable telemetry first
+os.environ["ANONYMIZED_TELEMETRY"] = "False"
+os.environ["CHROMA_TELEMETRY_ENABLED"] = "False"
+
+from dotenv import load_dotenv
+from .server import LocalAPIServer
+from ..pipeline import LocalRAGPipeline
+from ..ollama import run_ollama_servers
+from ..core import MetricsServer
+
+load_dotenv()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve the RAG pipeline over HTTP")
+    parser.add_argument("--host", type=str, default=None, help="Bind address")
+    parser.add_argument("--port", type=int, default=None, help="Port number")
+    parser.add_argument(
+        "--llm", type=str, default="llama3:8b-instruct-q8_0", help="Set LLM model"
+    )
+    parser.add_argument("--topic", type=str, default=None, help="Initial topic")
+    parser.add_argument(
+        "--metrics", action="store_true", help="Serve Prometheus metrics on a local port"
+    )
+    args = parser.parse_args()
+
+    run_ollama_servers()
+    if args.metrics:
+        MetricsServer().start_in_thread()
+
+    pipeline = LocalRAGPipeline()
+    if args.topic:
+        pipeline.switch_topic(args.topic)
+    pipeline.set_model_name(args.llm)
+    pipeline.set_chat_mode()
+
+    asyncio.run(LocalAPIServer(pipeline).serve(args.host, args.port))
@@ -0,0 +1,380 @@
+import asyncio
+import json
+import os
+import threading
+from contextlib import asynccontextmanager
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass, field
+from urllib.parse import parse_qs, urlsplit
+from ..pipeline import LocalRAGPipeline
+from ..setting import RAGSettings
+#------------------------------------------------------------------------------
+REASONS = {
+    200: "OK",
+    400: "Bad Request",
+    404: "Not Found",
+    405: "Method Not Allowed",
+    409: "Conflict",
+    413: "Payload Too Large",
+    500: "Internal Server Error",
+    503: "Service Unavailable",
+}
+#------------------------------------------------------------------------------
+class HTTPError(Exception):
+    def __init__(self, status: int, message: str) -> None:
+        super().__init__(message)
+        self.status = status
+        self.message = message
+#------------------------------------------------------------------------------
+@dataclass
+class Request:
+    method: str
+    path: str
+    version: str
+    headers: dict[str, str]
+    query: dict[str, list[str]] = field(default_factory=dict)
+    body: bytes = b""
+    #---
+    @property
+    def keep_alive(self) -> bool:
+        connection = self.headers.get("connection", "").lower()
+        if self.version == "HTTP/1.0":
+            return connection == "keep-alive"
+        return connection != "close"
+    #---
+    def json(self) -> dict:
+        if not self.body:
+            return {}
+        try:
+            return json.loads(self.body)
+        except json.JSONDecodeError as e:
+            raise HTTPError(400, f"Invalid JSON body: {e}")
+#------------------------------------------------------------------------------
+class LocalAPIServer:
+    """Minimal HTTP/1.1 server exposing a LocalRAGPipeline with streamed answers."""
+    def __init__(
+        self,
+        pipeline: LocalRAGPipeline,
+        data_dir: str = "data/data",
+        setting: RAGSettings | None = None,
+    ) -> None:
+        self._pipeline = pipeline
+        self._setting = setting or RAGSettings()
+        self._data_dir = os.path.join(os.getcwd(), data_dir)
+        self._max_body = self._setting.api.max_body_mb * 1024 * 1024
+        # blocking pipeline calls run here
+        self._executor = ThreadPoolExecutor(
+            max_workers=self._setting.api.max_streams, thread_name_prefix="api"
+        )
+        # token streams have their own threads, a long answer never holds up a blocking call;
+        # at most max_streams at a time, more chat requests are refused with 503
+        self._stream_executor = ThreadPoolExecutor(
+            max_workers=self._setting.api.max_streams, thread_name_prefix="api-stream"
+        )
+        self._streams = 0
+        # topic switches and ingestion change shared pipeline state, one at a time
+        self._state_lock = asyncio.Lock()
+        # requests currently retrieving from the current topic, no switch until they are done
+        self._topic_users = 0
+        self._routes = {
+            ("GET", "/health"): self._health,
+            ("GET", "/ready"): self._ready,
+            ("GET", "/topics"): self._get_topics,
+            ("POST", "/topics"): self._switch_topic,
+            ("POST", "/ingest"): self._ingest,
+            ("POST", "/chat"): self._chat,
+            ("GET", "/traces"): self._traces,
+            ("GET", "/jobs"): self._jobs,
+        }
+    #---
+    async def serve(self, host: str | None = None, port: int | None = None):
+        host = host or self._setting.api.host
+        port = port or self._setting.api.port
+        server = await asyncio.start_server(self._handle_connection, host, port)
+        print(f"API server listening on http://{host}:{port}")
+        async with server:
+            await server.serve_forever()
+    #---
+    def start_in_thread(self, host: str | None = None, port: int | None = None):
+        """Run the server on its own event loop next to another app (e.g. the Gradio UI)."""
+        thread = threading.Thread(
+            target=asyncio.run, args=(self.serve(host, port),), daemon=True
+        )
+        thread.start()
+        return thread
+    #---
+    async def _run(self, fn, *args):
+        return await asyncio.get_running_loop().run_in_executor(self._executor, fn, *args)
+    #---
+    async def _handle_connection(self, reader, writer):
+        try:
+            while True:
+                try:
+                    request = await self._read_request(reader)
+                except HTTPError as e:
+                    await self._send_json(writer, e.status, {"error": e.message}, False)
+                    break
+                if request is None:
+                    break
+                handler = self._routes.get((request.method, request.path))
+                try:
+                    if handler is None:
+                        known = any(path == request.path for _, path in self._routes)
+                        raise HTTPError(405 if known else 404, f"{request.method} {request.path}")
+                    result = await handler(request, writer)
+                    if result is not None:
+                        await self._send_json(writer, 200, result, request.keep_alive)
+                except HTTPError as e:
+                    await self._send_json(
+                        writer, e.status, {"error": e.message}, request.keep_alive
+                    )
+                except (ConnectionError, asyncio.IncompleteReadError):
+                    raise
+                except Exception as e:
+                    await self._send_json(
+                        writer, 500, {"error": f"{type(e).__name__}: {e}"}, request.keep_alive
+                    )
+                if not request.keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+    #---
+    async def _read_request(self, reader) -> Request | None:
+        try:
+            head = await reader.readuntil(b"\r\n\r\n")
+        except asyncio.IncompleteReadError:
+            return None
+        except asyncio.LimitOverrunError:
+            raise HTTPError(413, "Request header too large")
+        lines = head.decode("latin-1").split("\r\n")
+        try:
+            method, target, version = lines[0].split(" ", 2)
+        except ValueError:
+            raise HTTPError(400, "Malformed request line")
+        headers = {}
+        for line in lines[1:]:
+            if ":" in line:
+                name, value = line.split(":", 1)
+                headers[name.strip().lower()] = value.strip()
+        length = int(headers.get("content-length", 0) or 0)
+        if length > self._max_body:
+            raise HTTPError(413, "Request body too large")
+        body = await reader.readexactly(length) if length else b""
+        url = urlsplit(target)
+        return Request(
+            method=method.upper(),
+            path=url.path.rstrip("/") or "/",
+            version=version,
+            headers=headers,
+            query=parse_qs(url.query),
+            body=body,
+        )
+    #---
+    async def _send_json(self, writer, status: int, payload, keep_alive: bool):
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        writer.write(
+            (
+                f"HTTP/1.1 {status} {REASONS.get(status, '')}\r\n"
+                "Content-Type: application/json; charset=utf-8\r\n"
+                f"Content-Length: {len(body)}\r\n"
+                f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n"
+            ).encode("latin-1")
+            + body
+        )
+        await writer.drain()
+    #---
+    async def _start_stream(self, writer, content_type: str, keep_alive: bool):
+        writer.write(
+            (
+                "HTTP/1.1 200 OK\r\n"
+                f"Content-Type: {content_type}\r\n"
+                "Cache-Control: no-cache\r\n"
+                "Transfer-Encoding: chunked\r\n"
+                f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n"
+            ).encode("latin-1")
+        )
+        await writer.drain()
+    #---
+    async def _write_chunk(self, writer, data: str):
+        payload = data.encode("utf-8")
+        if payload:
+            writer.write(f"{len(payload):x}\r\n".encode("latin-1") + payload + b"\r\n")
+            await writer.drain()
+    #---
+    async def _end_stream(self, writer):
+        writer.write(b"0\r\n\r\n")
+        await writer.drain()
+    #---
+    @asynccontextmanager
+    async def _use_topic(self, topic: str | None):
+        """Switch to `topic` if given and keep the pipeline on it until the block ends.
+
+        The pipeline has one current topic, a request for another topic while
+        others still retrieve from the current one is refused with 409.
+        """
+        async with self._state_lock:
+            current = self._pipeline.get_current_topic()
+            if topic and topic != current:
+                if self._topic_users:
+                    raise HTTPError(
+                        409,
+                        f"Topic {current!r} is in use by {self._topic_users} request(s), "
+                        f"retry {topic!r} later",
+                    )
+                await self._run(self._pipeline.switch_topic, topic)
+            self._topic_users += 1
+        try:
+            yield
+        finally:
+            self._topic_users -= 1
+    #---
+    async def _health(self, request: Request, writer):
+        return {
+            "status": "ok",
+            "ready": self._pipeline.is_ready(),
+            "model": self._pipeline.get_model_name(),
+        }
+    #---
+    async def _ready(self, request: Request, writer):
+        if not self._pipeline.is_ready():
+            raise HTTPError(503, "Index is still loading")
+        return {"ready": True}
+    #---
+    async def _traces(self, request: Request, writer):
+        request_id = (request.query.get("request_id") or [None])[0]
+        return {"spans": self._pipeline.get_traces(request_id)}
+    #---
+    async def _get_topics(self, request: Request, writer):
+        return {
+            "topics": await self._run(self._pipeline.get_topics),
+            "current": self._pipeline.get_current_topic(),
+        }
+    #---
+    async def _switch_topic(self, request: Request, writer):
+        topic = request.json().get("topic")
+        if not topic:
+            raise HTTPError(400, "topic is required")
+        async with self._use_topic(topic):
+            pass
+        return {"current": self._pipeline.get_current_topic()}
+    #---
+    async def _ingest(self, request: Request, writer):
+        """JSON {"files": [paths], "topic": ...} or a raw upload with ?filename=...&topic=..."""
+        if request.headers.get("content-type", "").startswith("application/json"):
+            body = request.json()
+            files, topic = body.get("files") or [], body.get("topic")
+            profile = bool(body.get("profile"))
+            wait = body.get("wait", True) not in (False, 0, "0", "false")
+        else:
+            filename = os.path.basename((request.query.get("filename") or [""])[0])
+            if not filename or not request.body:
+                raise HTTPError(400, "filename and a request body are required")
+            os.makedirs(self._data_dir, exist_ok=True)
+            path = os.path.join(self._data_dir, filename)
+            with open(path, "wb") as f:
+                f.write(request.body)
+            files, topic = [path], (request.query.get("topic") or [None])[0]
+            profile = (request.query.get("profile") or ["0"])[0] not in ("", "0", "false")
+            wait = (request.query.get("wait") or ["1"])[0] not in ("", "0", "false")
+        missing = [f for f in files if not os.path.exists(f)]
+        if not files or missing:
+            raise HTTPError(400, f"No such files: {missing}" if missing else "files is required")
+        async with self._use_topic(topic):
+            # the job ingests into the topic that is current when it is submitted
+            job = self._pipeline.submit_ingestion(files, profile=profile)
+        if not wait:
+            return {"status": job.status, "job": job.to_dict()}
+        await self._run(job.wait)
+        if job.status == "failed":
+            raise HTTPError(500, f"Ingestion failed: {job.error}")
+        return {"status": "ok", "topic": job.topic, "files": files, "job": job.to_dict()}
+    #---
+    async def _jobs(self, request: Request, writer):
+        job_id = (request.query.get("id") or [None])[0]
+        if job_id is None:
+            return {"jobs": [job.to_dict() for job in self._pipeline.get_ingestion_jobs()]}
+        job = self._pipeline.get_ingestion_job(job_id)
+        if job is None:
+            raise HTTPError(404, f"No such job: {job_id}")
+        return job.to_dict()
+    #---
+    async def _chat(self, request: Request, writer):
+        body = request.json()
+        message = body.get("message")
+        if not message:
+            raise HTTPError(400, "message is required")
+        if self._pipeline.get_model_name() in [None, ""]:
+            raise HTTPError(503, "No LLM model selected")
+        if self._streams >= self._setting.api.max_streams:
+            raise HTTPError(503, "Too many answer streams, retry later")
+        self._streams += 1
+        try:
+            await self._stream_chat(request, writer, body, message)
+        finally:
+            self._streams -= 1
+    #---
+    async def _stream_chat(self, request: Request, writer, body: dict, message: str):
+        # retrieval is done once query returns, only the generation is streamed
+        async with self._use_topic(body.get("topic")):
+            response = await self._run(
+                self._pipeline.query,
+                body.get("mode", "QA"),
+                message,
+                body.get("history") or [],
+                bool(body.get("profile")),
+            )
+        sse = "text/event-stream" in request.headers.get("accept", "")
+        await self._start_stream(
+            writer,
+            "text/event-stream" if sse else "text/plain; charset=utf-8",
+            request.keep_alive,
+        )
+
+        loop = asyncio.get_running_loop()
+        queue = asyncio.Queue()
+        # set when the client went away, the pump stops reading tokens for it
+        stopped = threading.Event()
+
+        def pump():
+            try:
+                for token in response.response_gen:
+                    if stopped.is_set():
+                        return
+                    loop.call_soon_threadsafe(queue.put_nowait, ("token", token))
+                metrics = getattr(response, "metrics", None)
+                done = {
+                    "request_id": getattr(response, "request_id", None),
+                    "node_ids": [n.node.node_id for n in response.source_nodes],
+                    "metrics": asdict(metrics) if metrics is not None else None,
+                }
+                loop.call_soon_threadsafe(queue.put_nowait, ("done", done))
+            except Exception as e:
+                loop.call_soon_threadsafe(queue.put_nowait, ("error", f"{type(e).__name__}: {e}"))
+
+        self._stream_executor.submit(pump)
+        try:
+            while True:
+                kind, data = await queue.get()
+                if not sse:
+                    if kind == "token":
+                        await self._write_chunk(writer, data)
+                    elif kind == "error":
+                        await self._write_chunk(writer, f"\n[error] {data}")
+                elif kind == "token":
+                    await self._write_chunk(writer, f"data: {json.dumps({'token': data})}\n\n")
+                elif kind == "done":
+                    await self._write_chunk(writer, f"event: done\ndata: {json.dumps(data)}\n\n")
+                else:
+                    await self._write_chunk(writer, f"event: error\ndata: {json.dumps({'error': data})}\n\n")
+                if kind != "token":
+                    break
+            await self._end_stream(writer)
+        finally:
+            # also reached when a write fails because the client disconnected:
+            # cancel the generation, the pump may be waiting for Ollama's next token
+            stopped.set()
+            close = getattr(response, "close", None)
+            if close is not None:
+                close()
@@ -0,0 +1,5 @@
+from .runner import BatchQueryRunner
+
+__all__ = [
+    "BatchQueryRunner",
+]
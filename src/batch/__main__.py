@@ -0,0 +1,53 @@
+import os
+import json
+import argparse
+
+# Disable telemetry first
+os.environ["ANONYMIZED_TELEMETRY"] = "False"
+os.environ["CHROMA_TELEMETRY_ENABLED"] = "False"
+
+from dotenv import load_dotenv
+from .runner import BatchQueryRunner
+from ..pipeline import LocalRAGPipeline
+from ..ollama import run_ollama_servers
+
+load_dotenv()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Answer a JSONL file of questions without the UI")
+    parser.add_argument("--input", type=str, required=True, help="JSONL file with questions")
+    parser.add_argument("--output", type=str, required=True, help="JSONL file for answers")
+    parser.add_argument("--topic", type=str, default=None, help="Topic to query")
+    parser.add_argument(
+        "--mode", type=str, default="QA", choices=["QA", "chat"], help="Chat mode"
+    )
+    parser.add_argument(
+        "--llm", type=str, default="llama3:8b-instruct-q8_0", help="Set LLM model"
+    )
+    parser.add_argument(
+        "--language", type=str, default="eng", choices=["vi", "eng", "ger"], help="Language"
+    )
+    parser.add_argument("--workers", type=int, default=4, help="Number of parallel queries")
+    parser.add_argument(
+        "--no-resume",
+        action="store_true",
+        help=(
+            "Overwrite the output instead of skipping already answered questions. "
+            "Resuming matches answers by the question's 'id', or by a hash of the "
+            "question text when it has none, so the input order may change"
+        ),
+    )
+    args = parser.parse_args()
+
+    run_ollama_servers()
+
+    pipeline = LocalRAGPipeline()
+    if args.topic:
+        pipeline.switch_topic(args.topic)
+    pipeline.set_language(args.language)
+    pipeline.set_model_name(args.llm)
+    pipeline.set_chat_mode()
+
+    runner = BatchQueryRunner(pipeline, mode=args.mode, workers=args.workers)
+    summary = runner.run(args.input, args.output, resume=not args.no_resume)
+    print(json.dumps(summary))
@@ -0,0 +1,130 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from dataclasses import asdict
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from tqdm import tqdm
+from ..pipeline import LocalRAGPipeline
+
+
+def question_id(question: str) -> str:
+    """Id of a question without one: a hash of its text, stable when the input is reordered."""
+    return "q-" + hashlib.sha256(question.strip().encode("utf-8")).hexdigest()[:16]
+
+
+def read_questions(path: str) -> list[dict]:
+    """Read {"id": ..., "question": ...} records, the id defaults to `question_id`."""
+    questions = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            record = json.loads(line)
+            question = record.get("question") or record.get("query") or record.get("message")
+            if record.get("id") is not None:
+                id_ = str(record["id"])
+            else:
+                id_ = question_id(question or "")
+            questions.append({"id": id_, "question": question})
+    return questions
+
+
+def read_done_ids(path: str) -> set[str]:
+    """Ids that already have an answer in the output file (a truncated last line is ignored)."""
+    done = set()
+    if not os.path.exists(path):
+        return done
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            if "error" not in record:
+                done.add(record["id"])
+    return done
+
+
+def _ends_with_newline(path: str) -> bool:
+    with open(path, "rb") as f:
+        f.seek(-1, os.SEEK_END)
+        return f.read(1) == b"\n"
+
+
+class BatchQueryRunner:
+    def __init__(
+        self,
+        pipeline: LocalRAGPipeline,
+        mode: str = "QA",
+        workers: int = 4,
+    ) -> None:
+        self._pipeline = pipeline
+        self._mode = mode
+        self._workers = workers
+        self._write_lock = threading.Lock()
+
+    def _answer(self, item: dict) -> dict:
+        record = {"id": item["id"], "question": item["question"]}
+        start = time.perf_counter()
+        try:
+            response = self._pipeline.query(self._mode, item["question"], [])
+            retrieved = time.perf_counter()
+            first_token = None
+            answer = []
+            for token in response.response_gen:
+                if first_token is None:
+                    first_token = time.perf_counter()
+                answer.append(token)
+            end = time.perf_counter()
+            first_token = first_token or end
+            record["answer"] = "".join(answer).strip()
+            record["node_ids"] = [n.node.node_id for n in response.source_nodes]
+            record["timings"] = {
+                "retrieve_s": round(retrieved - start, 4),
+                "first_token_s": round(first_token - start, 4),
+                "generate_s": round(end - retrieved, 4),
+                "total_s": round(end - start, 4),
+            }
+            metrics = getattr(response, "metrics", None)
+            if metrics is not None:
+                record["generation"] = asdict(metrics)
+        except Exception as e:
+            record["error"] = f"{type(e).__name__}: {e}"
+            record["timings"] = {"total_s": round(time.perf_counter() - start, 4)}
+        return record
+
+    def _write(self, f, record: dict) -> None:
+        with self._write_lock:
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+            f.flush()
+
+    def run(self, input_path: str, output_path: str, resume: bool = True) -> dict:
+        questions = read_questions(input_path)
+        done = read_done_ids(output_path) if resume else set()
+        todo = [q for q in questions if q["id"] not in done]
+        print(f"{len(questions)} questions, {len(done)} already answered, {len(todo)} to run")
+
+        errors = 0
+        start = time.perf_counter()
+        with open(output_path, "a" if resume else "w", encoding="utf-8") as f:
+            if resume and f.tell() > 0 and not _ends_with_newline(output_path):
+                # the previous run died in the middle of a line
+                f.write("\n")
+            with ThreadPoolExecutor(max_workers=self._workers) as executor:
+                # write every answer as soon as it is done, so a crash loses only in-flight work
+                futures = [executor.submit(self._answer, q) for q in todo]
+                for future in tqdm(as_completed(futures), total=len(todo), desc="Answering"):
+                    record = future.result()
+                    errors += "error" in record
+                    self._write(f, record)
+        elapsed = time.perf_counter() - start
+        return {
+            "answered": len(todo) - errors,
+            "errors": errors,
+            "skipped": len(done),
+            "elapsed_s": round(elapsed, 2),
+            "qps": round(len(todo) / elapsed, 3) if elapsed > 0 else 0.0,
+        }
@@ -1,15 +1,45 @@
+from .client import OllamaClient
 from .embedding import LocalEmbedding
-from .model import LocalRAGModel
-from .ingestion import LocalDataIngestion
+from .model import LocalRAGModel, LocalOllama
+from .ingestion import LocalDataIngestion, IngestionJob, IngestionQueue
 from .vector_store import LocalVectorStore
-from .engine import LocalChatEngine
+from .engine import LocalChatEngine, QueryCoalescer, warmup_retriever
+from .cache import AnswerCache, RecordingResponse
+from .metrics import (
+    GenerationRecorder,
+    GenerationStats,
+    MeteredResponse,
+    MetricsServer,
+    REGISTRY,
+    RequestProfiler,
+    Trace,
+    Tracer,
+    span,
+)
 from .prompt import get_system_prompt
 
 __all__ = [
+    "OllamaClient",
     "LocalEmbedding",
     "LocalRAGModel",
+    "LocalOllama",
     "LocalDataIngestion",
+    "IngestionJob",
+    "IngestionQueue",
     "LocalVectorStore",
     "LocalChatEngine",
+    "QueryCoalescer",
+    "warmup_retriever",
+    "AnswerCache",
+    "RecordingResponse",
+    "GenerationRecorder",
+    "GenerationStats",
+    "MeteredResponse",
+    "MetricsServer",
+    "REGISTRY",
+    "RequestProfiler",
+    "Trace",
+    "Tracer",
+    "span",
     "get_system_prompt",
 ]
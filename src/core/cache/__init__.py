@@ -0,0 +1,6 @@
+from .answer_cache import AnswerCache, RecordingResponse
+
+__all__ = [
+    "AnswerCache",
+    "RecordingResponse",
+]
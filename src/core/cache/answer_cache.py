@@ -0,0 +1,221 @@
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from typing import Callable, Generator, List
+from llama_index.core.schema import NodeWithScore, TextNode
+from ..metrics.registry import CACHE_REQUESTS
+from ...setting import RAGSettings
+
+_HITS = CACHE_REQUESTS.labels("answer", "hit")
+_MISSES = CACHE_REQUESTS.labels("answer", "miss")
+
+
+class CachedResponse:
+    """Replays a cached answer with the interface of StreamingAgentChatResponse."""
+
+    def __init__(self, answer: str, source_nodes: List[NodeWithScore]) -> None:
+        self.response = answer
+        self.source_nodes = source_nodes
+        self.sources = []
+        self.from_cache = True
+        self.metrics = None
+
+    @property
+    def response_gen(self) -> Generator[str, None, None]:
+        for token in re.findall(r"\s*\S+", self.response):
+            yield token
+
+    def __str__(self) -> str:
+        return self.response
+
+
+class RecordingResponse:
+    """Wraps a streaming response and reports the full answer once it was streamed completely.
+
+    A closed response is cut short: `on_close` is called instead of `on_complete`.
+    """
+
+    def __init__(
+        self,
+        response,
+        on_complete: Callable[[str, list], None],
+        on_close: Callable[[], None] | None = None,
+    ) -> None:
+        self._response = response
+        self._on_complete = on_complete
+        self._on_close = on_close
+        self._closed = False
+
+    def __getattr__(self, name):
+        return getattr(self._response, name)
+
+    def close(self) -> None:
+        if self._closed:
+            return
+        self._closed = True
+        close = getattr(self._response, "close", None)
+        if close is not None:
+            close()
+        if self._on_close is not None:
+            self._on_close()
+
+    @property
+    def response_gen(self) -> Generator[str, None, None]:
+        answer = []
+        for token in self._response.response_gen:
+            answer.append(token)
+            yield token
+        if not self._closed:
+            self._on_complete("".join(answer).strip(), self._response.source_nodes)
+
+    def __str__(self) -> str:
+        return str(self._response)
+
+
+class AnswerCache:
+    """Size-bounded LRU of answers keyed by (topic, index version, model, system prompt, question)."""
+
+    def __init__(self, setting: RAGSettings | None = None) -> None:
+        self._setting = setting or RAGSettings()
+        self._max_bytes = self._setting.cache.answer_cache_max_mb * 1024 * 1024
+        os.makedirs(self._setting.cache.cache_dir, exist_ok=True)
+        path = os.path.join(self._setting.cache.cache_dir, "answers.sqlite3")
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._conn:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS answers ("
+                "key TEXT PRIMARY KEY, topic TEXT, model TEXT, answer TEXT, "
+                "nodes TEXT, size INTEGER, last_access REAL)"
+            )
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS versions (topic TEXT PRIMARY KEY, version INTEGER)"
+            )
+
+    # ----
+    def get_version(self, topic: str) -> int:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT version FROM versions WHERE topic = ?", (topic,)
+            ).fetchone()
+        return row[0] if row else 0
+
+    def make_key(
+        self,
+        topic: str,
+        model: str,
+        system_prompt: str,
+        question: str,
+        version: int | None = None,
+    ) -> str:
+        if version is None:
+            version = self.get_version(topic)
+        payload = json.dumps([topic, version, model, system_prompt, question.strip()])
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    # ----
+    def get(self, key: str) -> CachedResponse | None:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT answer, nodes FROM answers WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                _MISSES.inc()
+                return None
+            _HITS.inc()
+            with self._conn:
+                self._conn.execute(
+                    "UPDATE answers SET last_access = ? WHERE key = ?", (time.time(), key)
+                )
+        nodes = [
+            NodeWithScore(
+                node=TextNode(id_=n["id"], text=n["text"], metadata=n["metadata"]),
+                score=n["score"],
+            )
+            for n in json.loads(row[1])
+        ]
+        return CachedResponse(row[0], nodes)
+
+    def put(
+        self,
+        key: str,
+        topic: str,
+        model: str,
+        answer: str,
+        source_nodes: list,
+        version: int | None = None,
+    ) -> None:
+        """Store an answer; with the topic version it was generated at, a stale one is dropped."""
+        if not answer:
+            return
+        nodes = json.dumps(
+            [
+                {
+                    "id": n.node.node_id,
+                    "text": n.node.get_content(),
+                    "metadata": n.node.metadata,
+                    "score": n.score,
+                }
+                for n in source_nodes
+            ]
+        )
+        size = len(answer.encode("utf-8")) + len(nodes)
+        with self._lock, self._conn:
+            if version is not None:
+                # the topic was re-indexed while the answer was generated
+                row = self._conn.execute(
+                    "SELECT version FROM versions WHERE topic = ?", (topic,)
+                ).fetchone()
+                if (row[0] if row else 0) != version:
+                    return
+            self._conn.execute(
+                "INSERT OR REPLACE INTO answers VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (key, topic, model, answer, nodes, size, time.time()),
+            )
+            self._evict()
+
+    def record(
+        self, key: str, topic: str, model: str, response, version: int | None = None
+    ) -> RecordingResponse:
+        return RecordingResponse(
+            response,
+            on_complete=lambda answer, nodes: self.put(
+                key, topic, model, answer, nodes, version
+            ),
+        )
+
+    def _evict(self) -> None:
+        total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM answers").fetchone()[0]
+        if total <= self._max_bytes:
+            return
+        for key, size in self._conn.execute(
+            "SELECT key, size FROM answers ORDER BY last_access"
+        ).fetchall():
+            self._conn.execute("DELETE FROM answers WHERE key = ?", (key,))
+            total -= size
+            if total <= self._max_bytes:
+                break
+
+    # ----
+    def invalidate_topic(self, topic: str) -> None:
+        """Bump the index version of a topic and drop its answers."""
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT INTO versions VALUES (?, 1) "
+                "ON CONFLICT(topic) DO UPDATE SET version = version + 1",
+                (topic,),
+            )
+            self._conn.execute("DELETE FROM answers WHERE topic = ?", (topic,))
+
+    def invalidate_model(self, model: str) -> None:
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM answers WHERE model = ?", (model,))
+
+    def clear(self) -> None:
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM answers")
+            self._conn.execute("UPDATE versions SET version = version + 1")
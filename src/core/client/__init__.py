@@ -0,0 +1,8 @@
+from .client import OllamaClient
+from .balancer import OllamaBalancer, get_endpoints
+
+__all__ = [
+    "OllamaClient",
+    "OllamaBalancer",
+    "get_endpoints",
+]
@@ -0,0 +1,215 @@
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Generator
+import requests
+from .client import OllamaClient, PullResponse
+from ..metrics import REGISTRY
+from ...setting import RAGSettings
+
+OUTSTANDING = REGISTRY.gauge(
+    "rag_ollama_outstanding_requests", "Requests in flight per Ollama server", ["endpoint"]
+)
+HEALTHY = REGISTRY.gauge(
+    "rag_ollama_healthy", "1 if the Ollama server passed its last health check", ["endpoint"]
+)
+
+
+def get_endpoints(setting: RAGSettings | None = None) -> list[str]:
+    """Configured Ollama servers, or `num_servers` local ones on consecutive ports."""
+    setting = setting or RAGSettings()
+    if setting.ollama.endpoints:
+        return [
+            (e if "://" in e else f"http://{e}").rstrip("/")
+            for e in setting.ollama.endpoints
+        ]
+    return [
+        f"http://localhost:{setting.ollama.port + i}"
+        for i in range(max(1, setting.ollama.num_servers))
+    ]
+
+
+class OllamaBalancer:
+    """Spreads Ollama requests over several servers, least outstanding requests first.
+
+    Has the interface of OllamaClient. A server that refuses a connection is
+    skipped until the background health check sees it again.
+    """
+
+    _balancers: dict[tuple[str, ...], "OllamaBalancer"] = {}
+    _balancers_lock = threading.Lock()
+
+    def __init__(self, endpoints: list[str], setting: RAGSettings | None = None) -> None:
+        setting = setting or RAGSettings()
+        self._clients = [OllamaClient.get(setting, base_url=e) for e in endpoints]
+        self._outstanding = [0] * len(self._clients)
+        self._healthy = [True] * len(self._clients)
+        self._next = 0
+        self._lock = threading.Lock()
+        self._health_interval = setting.ollama.health_interval
+        if len(self._clients) > 1 and self._health_interval > 0:
+            threading.Thread(target=self._health_loop, daemon=True).start()
+
+    @classmethod
+    def get(cls, setting: RAGSettings | None = None) -> "OllamaBalancer":
+        setting = setting or RAGSettings()
+        endpoints = tuple(get_endpoints(setting))
+        with cls._balancers_lock:
+            balancer = cls._balancers.get(endpoints)
+            if balancer is None:
+                balancer = cls(list(endpoints), setting)
+                cls._balancers[endpoints] = balancer
+        return balancer
+
+    @property
+    def base_url(self) -> str:
+        return self._clients[0].base_url
+
+    def status(self) -> list[dict]:
+        with self._lock:
+            return [
+                {"url": c.base_url, "healthy": h, "outstanding": o}
+                for c, h, o in zip(self._clients, self._healthy, self._outstanding)
+            ]
+
+    # ----
+    def _health_loop(self) -> None:
+        while True:
+            time.sleep(self._health_interval)
+            for index, client in enumerate(self._clients):
+                healthy = client.ping()
+                with self._lock:
+                    self._healthy[index] = healthy
+
+    def _mark_down(self, index: int) -> None:
+        with self._lock:
+            self._healthy[index] = False
+
+    def _pick(self, exclude: set[int]) -> int:
+        with self._lock:
+            candidates = [
+                i for i in range(len(self._clients)) if i not in exclude and self._healthy[i]
+            ]
+            # all marked down: the health check may lag behind, try the rest anyway
+            candidates = candidates or [
+                i for i in range(len(self._clients)) if i not in exclude
+            ]
+            if not candidates:
+                raise requests.ConnectionError("No Ollama server is reachable")
+            # ties go round robin, so an idle cluster still spreads the load
+            start = self._next
+            index = min(
+                candidates,
+                key=lambda i: (self._outstanding[i], (i - start) % len(self._clients)),
+            )
+            self._next = (index + 1) % len(self._clients)
+            self._outstanding[index] += 1
+            return index
+
+    @contextmanager
+    def _acquire(self, exclude: set[int]):
+        index = self._pick(exclude)
+        try:
+            yield index, self._clients[index]
+        finally:
+            with self._lock:
+                self._outstanding[index] -= 1
+
+    def _call(self, fn: Callable[[OllamaClient], Any]) -> Any:
+        tried = set()
+        while True:
+            with self._acquire(tried) as (index, client):
+                try:
+                    return fn(client)
+                except requests.ConnectionError:
+                    self._mark_down(index)
+                    tried.add(index)
+                    if len(tried) == len(self._clients):
+                        raise
+
+    # ----
+    def post(self, path: str, payload: dict, timeout: float | None = None) -> dict:
+        return self._call(lambda client: client.post(path, payload, timeout))
+
+    def embed(self, payload: dict, timeout: float | None = None) -> list[float]:
+        return self._call(lambda client: client.embed(payload, timeout))
+
+    def stream(
+        self, path: str, payload: dict, timeout: float | None = None
+    ) -> Generator[dict, None, None]:
+        tried = set()
+        while True:
+            with self._acquire(tried) as (index, client):
+                started = False
+                try:
+                    for chunk in client.stream(path, payload, timeout):
+                        started = True
+                        yield chunk
+                    return
+                except requests.ConnectionError:
+                    self._mark_down(index)
+                    tried.add(index)
+                    # a half streamed answer cannot be replayed on another server
+                    if started or len(tried) == len(self._clients):
+                        raise
+
+    # ----
+    def list_models(self, refresh: bool = False) -> list[str]:
+        """Models installed on every reachable server."""
+        inventories = []
+        for index, client in enumerate(self._clients):
+            try:
+                inventories.append(client.list_models(refresh))
+            except requests.ConnectionError:
+                self._mark_down(index)
+        if not inventories:
+            raise requests.ConnectionError("No Ollama server is reachable")
+        return [m for m in inventories[0] if all(m in models for models in inventories[1:])]
+
+    def invalidate_models(self) -> None:
+        for client in self._clients:
+            client.invalidate_models()
+
+    def has_model(self, model_name: str) -> bool:
+        return OllamaClient.match_model(self.list_models(), model_name)
+
+    def pull(self, model_name: str) -> PullResponse:
+        """Pull on one server with progress, then on the others in the background."""
+        with self._lock:
+            healthy = [c for c, h in zip(self._clients, self._healthy) if h] or self._clients
+        primary, rest = healthy[0], healthy[1:]
+
+        def pull_rest():
+            for client in rest:
+                try:
+                    for _ in client.pull(model_name).iter_lines():
+                        pass
+                except requests.RequestException as e:
+                    print(f"Pulling {model_name} on {client.base_url} failed: {e}")
+
+        def on_close():
+            if rest:
+                threading.Thread(target=pull_rest, daemon=True).start()
+
+        return PullResponse(primary.pull(model_name), on_close=on_close)
+
+    def load(self, model_name: str, keep_alive: str | None = None) -> None:
+        for index, client in enumerate(self._clients):
+            try:
+                client.load(model_name, keep_alive)
+            except requests.ConnectionError:
+                self._mark_down(index)
+
+
+def _collect(field: str) -> dict[tuple, float]:
+    with OllamaBalancer._balancers_lock:
+        balancers = list(OllamaBalancer._balancers.values())
+    return {
+        (server["url"],): float(server[field])
+        for balancer in balancers
+        for server in balancer.status()
+    }
+
+
+OUTSTANDING.set_function(lambda: _collect("outstanding"))
+HEALTHY.set_function(lambda: _collect("healthy"))
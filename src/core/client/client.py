@@ -0,0 +1,161 @@
+import json
+import threading
+import time
+from typing import Callable, Generator
+import requests
+from requests.adapters import HTTPAdapter
+from ...setting import RAGSettings
+
+
+class PullResponse:
+    """Streamed `/api/pull` response that reports when the pull has been read to the end."""
+
+    def __init__(self, response: requests.Response, on_close: Callable[[], None]) -> None:
+        self._response = response
+        self._on_close = on_close
+
+    def __getattr__(self, name):
+        return getattr(self._response, name)
+
+    def iter_lines(self, *args, **kwargs) -> Generator[bytes, None, None]:
+        try:
+            yield from self._response.iter_lines(*args, **kwargs)
+        finally:
+            self._response.close()
+            self._on_close()
+
+
+class OllamaClient:
+    """Pooled keep-alive HTTP client for one Ollama server.
+
+    Every call has a timeout, and the installed model list (`/api/tags`) is
+    cached for `inventory_ttl` seconds and dropped after a pull.
+    """
+
+    _clients: dict[str, "OllamaClient"] = {}
+    _clients_lock = threading.Lock()
+
+    def __init__(self, base_url: str, setting: RAGSettings | None = None) -> None:
+        setting = setting or RAGSettings()
+        self.base_url = base_url.rstrip("/")
+        self._connect_timeout = setting.ollama.connect_timeout
+        self._read_timeout = setting.ollama.request_timeout
+        self._inventory_timeout = setting.ollama.inventory_timeout
+        self._inventory_ttl = setting.ollama.inventory_ttl
+        self._session = requests.Session()
+        adapter = HTTPAdapter(
+            pool_connections=1, pool_maxsize=setting.ollama.pool_size
+        )
+        self._session.mount("http://", adapter)
+        self._session.mount("https://", adapter)
+        self._models: list[str] | None = None
+        self._models_expire = 0.0
+        self._models_lock = threading.Lock()
+
+    @classmethod
+    def get(
+        cls, setting: RAGSettings | None = None, base_url: str | None = None
+    ) -> "OllamaClient":
+        """Shared client for `base_url` (default: the local server from the settings)."""
+        setting = setting or RAGSettings()
+        base_url = (base_url or f"http://localhost:{setting.ollama.port}").rstrip("/")
+        with cls._clients_lock:
+            client = cls._clients.get(base_url)
+            if client is None:
+                client = cls(base_url, setting)
+                cls._clients[base_url] = client
+        return client
+
+    # ----
+    def _timeout(self, read_timeout: float | None) -> tuple[float, float]:
+        return (self._connect_timeout, read_timeout or self._read_timeout)
+
+    def post(self, path: str, payload: dict, timeout: float | None = None) -> dict:
+        response = self._session.post(
+            f"{self.base_url}{path}", json=payload, timeout=self._timeout(timeout)
+        )
+        response.raise_for_status()
+        return response.json()
+
+    def stream(
+        self, path: str, payload: dict, timeout: float | None = None
+    ) -> Generator[dict, None, None]:
+        """POST and yield the JSON lines of a streamed response."""
+        with self._session.post(
+            f"{self.base_url}{path}",
+            json=payload,
+            stream=True,
+            timeout=self._timeout(timeout),
+        ) as response:
+            response.raise_for_status()
+            for line in response.iter_lines():
+                if line:
+                    yield json.loads(line)
+
+    def ping(self) -> bool:
+        try:
+            response = self._session.get(
+                f"{self.base_url}/api/version",
+                timeout=(self._connect_timeout, self._connect_timeout),
+            )
+            return response.status_code == 200
+        except requests.RequestException:
+            return False
+
+    # ----
+    def list_models(self, refresh: bool = False) -> list[str]:
+        """Names of the installed models, raises if the server cannot be reached."""
+        with self._models_lock:
+            if not refresh and self._models is not None and time.monotonic() < self._models_expire:
+                return list(self._models)
+        response = self._session.get(
+            f"{self.base_url}/api/tags", timeout=self._timeout(self._inventory_timeout)
+        )
+        response.raise_for_status()
+        models = [d["name"] for d in response.json().get("models") or []]
+        with self._models_lock:
+            self._models = models
+            self._models_expire = time.monotonic() + self._inventory_ttl
+        return list(models)
+
+    def invalidate_models(self) -> None:
+        with self._models_lock:
+            self._models = None
+
+    @staticmethod
+    def match_model(models: list[str], model_name: str) -> bool:
+        # "phi4-mini" matches "phi4-mini:latest"
+        return model_name in models or any(
+            model.startswith(model_name + ":") for model in models
+        )
+
+    def has_model(self, model_name: str) -> bool:
+        return self.match_model(self.list_models(), model_name)
+
+    def pull(self, model_name: str) -> PullResponse:
+        self.invalidate_models()
+        response = self._session.post(
+            f"{self.base_url}/api/pull",
+            json={"name": model_name},
+            stream=True,
+            timeout=self._timeout(None),
+        )
+        return PullResponse(response, on_close=self.invalidate_models)
+
+    def load(self, model_name: str, keep_alive: str | None = None) -> None:
+        """Ask the server to load a model now instead of on its first request."""
+        payload = {"model": model_name}
+        if keep_alive is not None:
+            payload["keep_alive"] = keep_alive
+        self.post("/api/generate", payload)
+
+    def embed(self, payload: dict, timeout: float | None = None) -> list[float]:
+        response = self._session.post(
+            f"{self.base_url}/api/embeddings", json=payload, timeout=self._timeout(timeout)
+        )
+        if response.status_code != 200:
+            raise ValueError(
+                f"Ollama call failed with status code {response.status_code}."
+                f" Details: {response.text}"
+            )
+        return response.json()["embedding"]
@@ -1,15 +1,46 @@
+import asyncio
 import os
-import torch
-import requests
-from llama_index.embeddings.huggingface import HuggingFaceEmbedding
+from typing import List
+from llama_index.core.bridge.pydantic import Field, PrivateAttr
 from llama_index.embeddings.ollama import OllamaEmbedding
-from llama_index.embeddings.openai import OpenAIEmbedding
-from transformers import AutoModel, AutoTokenizer
+from ..client import OllamaBalancer, OllamaClient
 from ...setting import RAGSettings
 from dotenv import load_dotenv
 
 load_dotenv()
 
+
+class LocalOllamaEmbedding(OllamaEmbedding):
+    """OllamaEmbedding on the shared pooled client, sends keep_alive so the model stays loaded."""
+
+    keep_alive: str | None = Field(
+        default=None, description="How long Ollama keeps the model loaded after a request."
+    )
+    _client: OllamaBalancer | OllamaClient | None = PrivateAttr(default=None)
+
+    @property
+    def client(self) -> OllamaBalancer | OllamaClient:
+        if self._client is None:
+            self._client = OllamaClient.get(base_url=self.base_url)
+        return self._client
+
+    def _request_body(self, prompt: str) -> dict:
+        body = {
+            "prompt": prompt,
+            "model": self.model_name,
+            "options": self.ollama_additional_kwargs,
+        }
+        if self.keep_alive is not None:
+            body["keep_alive"] = self.keep_alive
+        return body
+
+    def get_general_text_embedding(self, prompt: str) -> List[float]:
+        return self.client.embed(self._request_body(prompt))
+
+    async def aget_general_text_embedding(self, prompt: str) -> List[float]:
+        return await asyncio.to_thread(self.get_general_text_embedding, prompt)
+
+
 class LocalEmbedding:
     @staticmethod
     def set(setting: RAGSettings | None = None, **kwargs):
@@ -17,6 +48,8 @@ class LocalEmbedding:
         model_name = setting.ingestion.embed_llm
         
         if model_name == "text-embedding-ada-002":
+            from llama_index.embeddings.openai import OpenAIEmbedding
+
             return OpenAIEmbedding()
         elif "/" not in model_name:
             # Assume local/Ollama model if no slash (e.g. "nomic-embed-text")
@@ -24,15 +57,25 @@ class LocalEmbedding:
             if ":" not in model_name:
                 model_name = f"{model_name}:latest"
             
-            ollama_url = f"http://localhost:11434"
+            client = OllamaBalancer.get(setting)
+            ollama_url = client.base_url
             print(f"[DEBUG] Connecting to Ollama at: {ollama_url} with model: {model_name}")
             
-            return OllamaEmbedding(
+            embed_model = LocalOllamaEmbedding(
                 model_name=model_name,
                 base_url=ollama_url,
                 ollama_additional_kwargs={"mirostat": 0}
             )
+            # OllamaEmbedding.__init__ drops unknown keyword arguments
+            embed_model.keep_alive = setting.ollama.keep_alive
+            embed_model._client = client
+            return embed_model
         else:
+            # torch and transformers take seconds to import, only pay for them when needed
+            import torch
+            from llama_index.embeddings.huggingface import HuggingFaceEmbedding
+            from transformers import AutoModel, AutoTokenizer
+
             return HuggingFaceEmbedding(
                 model=AutoModel.from_pretrained(
                     model_name, torch_dtype=torch.float16, trust_remote_code=True
@@ -46,24 +89,11 @@ class LocalEmbedding:
             )
 
     @staticmethod
-    def pull(**kwargs):
-        setting = RAGSettings()
-        payload = {"name": setting.ingestion.embed_llm}
-        return requests.post(f"http://localhost:11434/api/pull", json=payload, stream=True)
+    def pull(model_name: str | None = None, setting: RAGSettings | None = None):
+        setting = setting or RAGSettings()
+        return OllamaBalancer.get(setting).pull(model_name or setting.ingestion.embed_llm)
 
     @staticmethod
-    def check_model_exist(**kwargs) -> bool:
-        setting = RAGSettings()
-        data = requests.get(f"http://localhost:11434/api/tags").json()
-        list_model = [d["name"] for d in data["models"]]
-        
-        # Check exact match first
-        if setting.ingestion.embed_llm in list_model:
-            return True
-        
-        # Check if model name matches without tag (e.g., "nomic-embed-text" matches "nomic-embed-text:latest")
-        for model in list_model:
-            if model.startswith(setting.ingestion.embed_llm + ":"):
-                return True
-        
-        return False
+    def check_model_exist(model_name: str | None = None, setting: RAGSettings | None = None) -> bool:
+        setting = setting or RAGSettings()
+        return OllamaBalancer.get(setting).has_model(model_name or setting.ingestion.embed_llm)
@@ -1,4 +1,5 @@
 from .engine import LocalChatEngine
-from .retriever import LocalRetriever
+from .retriever import LocalRetriever, get_reranker, warmup_retriever
+from .coalesce import QueryCoalescer
 
-__all__ = ["LocalChatEngine", "LocalRetriever"]
+__all__ = ["LocalChatEngine", "LocalRetriever", "QueryCoalescer", "get_reranker", "warmup_retriever"]
@@ -0,0 +1,195 @@
+import threading
+from typing import Any, Callable, Generator, Hashable, List
+from ..metrics.registry import CACHE_REQUESTS
+
+_JOINED = CACHE_REQUESTS.labels("coalesce", "hit")
+_LED = CACHE_REQUESTS.labels("coalesce", "miss")
+
+
+class SharedResponse:
+    """Token stream of one chat response that any number of readers can replay.
+
+    Once every reader has left before the end, the stream is abandoned: it is
+    no longer read and the response is closed, which cancels the generation.
+    """
+
+    def __init__(self) -> None:
+        self._tokens: List[str] = []
+        self._done = False
+        self._started = False
+        self._readers = 0
+        self._abandoned = False
+        self._exception: Exception | None = None
+        self._response = None
+        self._cond = threading.Condition()
+
+    def start(self, response, on_done: Callable[[], None] | None = None) -> None:
+        """Attach the leader's streaming response and pump it in the background."""
+        with self._cond:
+            self._response = response
+            self._started = True
+            self._cond.notify_all()
+        threading.Thread(
+            target=self._pump, args=(response, on_done), daemon=True
+        ).start()
+
+    def fail(self, exception: Exception) -> None:
+        with self._cond:
+            self._exception = exception
+            self._started = True
+            self._done = True
+            self._cond.notify_all()
+
+    def _pump(self, response, on_done: Callable[[], None] | None) -> None:
+        try:
+            for token in response.response_gen:
+                with self._cond:
+                    if self._abandoned:
+                        break
+                    self._tokens.append(token)
+                    self._cond.notify_all()
+            if self._abandoned:
+                close = getattr(response, "close", None)
+                if close is not None:
+                    close()
+        except Exception as e:
+            self._exception = e
+        finally:
+            with self._cond:
+                self._done = True
+                self._cond.notify_all()
+            if on_done is not None:
+                on_done()
+
+    def wait_started(self):
+        with self._cond:
+            self._cond.wait_for(lambda: self._started)
+            if self._response is None and self._exception is not None:
+                raise self._exception
+            return self._response
+
+    def iter_tokens(self) -> Generator[str, None, None]:
+        index = 0
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: index < len(self._tokens) or self._done)
+                tokens = self._tokens[index:]
+                done = self._done
+            for token in tokens:
+                yield token
+            index += len(tokens)
+            if done and index >= len(self._tokens):
+                break
+        if self._exception is not None:
+            raise self._exception
+
+    @property
+    def abandoned(self) -> bool:
+        return self._abandoned
+
+    def subscribe(self) -> "CoalescedResponse":
+        with self._cond:
+            self._readers += 1
+        return CoalescedResponse(self)
+
+    def unsubscribe(self) -> None:
+        response = None
+        with self._cond:
+            self._readers -= 1
+            if self._readers > 0 or self._done:
+                return
+            self._abandoned = True
+            response = self._response
+        # stops the generation now instead of at the pump's next token
+        close = getattr(response, "close", None)
+        if close is not None:
+            close()
+
+
+class CoalescedResponse:
+    """Reader of a SharedResponse that quacks like StreamingAgentChatResponse."""
+
+    def __init__(self, shared: SharedResponse) -> None:
+        self._shared = shared
+        self._closed = False
+        self.response = ""
+
+    @property
+    def source_nodes(self) -> list:
+        return self._shared.wait_started().source_nodes
+
+    @property
+    def sources(self) -> list:
+        return self._shared.wait_started().sources
+
+    @property
+    def request_id(self):
+        return getattr(self._shared.wait_started(), "request_id", None)
+
+    @property
+    def metrics(self):
+        return getattr(self._shared.wait_started(), "metrics", None)
+
+    @property
+    def response_gen(self) -> Generator[str, None, None]:
+        answer = []
+        try:
+            for token in self._shared.iter_tokens():
+                answer.append(token)
+                yield token
+        finally:
+            # also when the reader stops early (generator closed or collected)
+            self.close()
+        self.response = "".join(answer).strip()
+
+    def close(self) -> None:
+        """Stop reading; the generation is cancelled once no reader is left."""
+        if not self._closed:
+            self._closed = True
+            self._shared.unsubscribe()
+
+    def __str__(self) -> str:
+        if not self.response:
+            self.response = "".join(self._shared.iter_tokens()).strip()
+        return self.response
+
+
+class QueryCoalescer:
+    """Singleflight: identical requests in flight share one computation and token stream."""
+
+    def __init__(self) -> None:
+        self._inflight: dict[Hashable, SharedResponse] = {}
+        self._lock = threading.Lock()
+
+    def run(self, key: Hashable, fn: Callable[[], Any]) -> CoalescedResponse:
+        with self._lock:
+            shared = self._inflight.get(key)
+            # an abandoned stream is cut short, a new request starts over
+            leader = shared is None or shared.abandoned
+            if leader:
+                shared = SharedResponse()
+                self._inflight[key] = shared
+        if not leader:
+            _JOINED.inc()
+            return shared.subscribe()
+        _LED.inc()
+
+        # subscribed before the pump starts, so it is not abandoned right away
+        subscription = shared.subscribe()
+        try:
+            response = fn()
+        except Exception as e:
+            self._forget(key, shared)
+            shared.fail(e)
+            raise
+        shared.start(response, on_done=lambda: self._forget(key, shared))
+        return subscription
+
+    def _forget(self, key: Hashable, shared: SharedResponse) -> None:
+        with self._lock:
+            if self._inflight.get(key) is shared:
+                del self._inflight[key]
+
+    def inflight(self) -> int:
+        with self._lock:
+            return len(self._inflight)
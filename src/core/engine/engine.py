@@ -1,12 +1,138 @@
+import copy
+import threading
+from collections import OrderedDict
+from llama_index.core import Settings
+from llama_index.core.bridge.pydantic import PrivateAttr
 from llama_index.core.chat_engine import CondensePlusContextChatEngine, SimpleChatEngine
 from llama_index.core.memory import ChatMemoryBuffer
 from llama_index.core.llms.llm import LLM
+from llama_index.core.prompts import ChatMessage
 from llama_index.core.schema import BaseNode
 from typing import List
 from .retriever import LocalRetriever
+from ..metrics import span
+from ..metrics.registry import CACHE_REQUESTS
 from ...setting import RAGSettings
 
 
+class CachedChatMemoryBuffer(ChatMemoryBuffer):
+    """ChatMemoryBuffer that tokenizes every message only once while trimming."""
+
+    _token_counts: OrderedDict = PrivateAttr(default_factory=OrderedDict)
+    _max_cached: int = PrivateAttr(default=1024)
+
+    @classmethod
+    def class_name(cls) -> str:
+        return "CachedChatMemoryBuffer"
+
+    def _message_token_count(self, message: ChatMessage) -> int:
+        content = str(message.content)
+        count = self._token_counts.get(content)
+        if count is None:
+            count = len(self.tokenizer_fn(content))
+            self._token_counts[content] = count
+            if len(self._token_counts) > self._max_cached:
+                self._token_counts.popitem(last=False)
+        return count
+
+    def _token_count_for_messages(self, messages: List[ChatMessage]) -> int:
+        if len(messages) <= 0:
+            return 0
+        # the base class joins the messages with a space, count one token per separator
+        return sum(self._message_token_count(m) for m in messages) + len(messages) - 1
+
+
+_CONDENSE_HITS = CACHE_REQUESTS.labels("condense", "hit")
+_CONDENSE_MISSES = CACHE_REQUESTS.labels("condense", "miss")
+
+
+class CondenseCache:
+    """Thread-safe LRU of (model, history, message) -> condensed question."""
+
+    def __init__(self, max_size: int = 256) -> None:
+        self._max_size = max_size
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            value = self._items.get(key)
+            if value is not None:
+                self._items.move_to_end(key)
+        (_CONDENSE_MISSES if value is None else _CONDENSE_HITS).inc()
+        return value
+
+    def put(self, key, value) -> None:
+        if self._max_size <= 0:
+            return
+        with self._lock:
+            self._items[key] = value
+            self._items.move_to_end(key)
+            while len(self._items) > self._max_size:
+                self._items.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._items.clear()
+
+
+class LocalCondensePlusContextChatEngine(CondensePlusContextChatEngine):
+    """CondensePlusContextChatEngine with a shared memo for condensed questions."""
+
+    def __init__(self, *args, condense_cache: CondenseCache | None = None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._condense_cache = condense_cache
+
+    def _condense_key(self, chat_history: List[ChatMessage], latest_message: str):
+        return (
+            getattr(self._llm, "model", type(self._llm).__name__),
+            tuple((m.role.value, str(m.content)) for m in chat_history),
+            latest_message,
+        )
+
+    def _condense_question(
+        self, chat_history: List[ChatMessage], latest_message: str
+    ) -> str:
+        if self._skip_condense or len(chat_history) == 0:
+            return latest_message
+        with span("condense") as attrs:
+            if self._condense_cache is None:
+                return super()._condense_question(chat_history, latest_message)
+            key = self._condense_key(chat_history, latest_message)
+            condensed = self._condense_cache.get(key)
+            attrs["cached"] = condensed is not None
+            if condensed is None:
+                condensed = super()._condense_question(chat_history, latest_message)
+                self._condense_cache.put(key, condensed)
+            return condensed
+
+    async def _acondense_question(
+        self, chat_history: List[ChatMessage], latest_message: str
+    ) -> str:
+        if self._skip_condense or len(chat_history) == 0:
+            return latest_message
+        if self._condense_cache is None:
+            return await super()._acondense_question(chat_history, latest_message)
+        key = self._condense_key(chat_history, latest_message)
+        condensed = self._condense_cache.get(key)
+        if condensed is None:
+            condensed = await super()._acondense_question(chat_history, latest_message)
+            self._condense_cache.put(key, condensed)
+        return condensed
+
+
+    def _retrieve_context(self, message: str):
+        with span("retrieve") as attrs:
+            context_str, nodes = super()._retrieve_context(message)
+            attrs["nodes"] = len(nodes)
+        return context_str, nodes
+
+    def _run_c3(self, message: str, chat_history: List[ChatMessage] | None = None):
+        # condensation, retrieval and building the prompt within the memory limit
+        with span("context"):
+            return super()._run_c3(message, chat_history)
+
+
 class LocalChatEngine:
     def __init__(
         self, setting: RAGSettings | None = None
@@ -14,6 +140,37 @@ class LocalChatEngine:
         super().__init__()
         self._setting = setting or RAGSettings()
         self._retriever = LocalRetriever(self._setting)
+        self._condense_cache = CondenseCache(self._setting.ollama.condense_cache_size)
+
+    def clear_cache(self):
+        self._condense_cache.clear()
+
+    def standalone(
+        self, engine: CondensePlusContextChatEngine | SimpleChatEngine
+    ) -> CondensePlusContextChatEngine | SimpleChatEngine:
+        """Copy of an engine with its own empty memory, so concurrent standalone questions don't mix."""
+        engine = copy.copy(engine)
+        engine._memory = CachedChatMemoryBuffer(
+            token_limit=self._setting.ollama.chat_token_limit
+        )
+        return engine
+
+    @staticmethod
+    def has_documents(nodes: List[BaseNode], vector_index=None) -> bool:
+        """Whether there is anything to retrieve from: the given nodes, the
+        index docstore, or the Chroma collection behind the index, which keeps
+        the chunks itself (a restarted app has no nodes and an empty docstore)."""
+        if len(nodes) > 0:
+            return True
+        if vector_index is None:
+            return False
+        try:
+            if len(vector_index.docstore.docs) > 0:
+                return True
+            collection = getattr(vector_index.vector_store, "_collection", None)
+            return collection is not None and collection.count() > 0
+        except Exception:
+            return False
 
     def set_engine(
         self,
@@ -23,32 +180,26 @@ class LocalChatEngine:
         vector_index=None,
     ) -> CondensePlusContextChatEngine | SimpleChatEngine:
         # Normal chat engine
-        # Only use simple chat if no nodes provided AND (no vector index OR empty vector index)
-        has_docs = len(nodes) > 0
-        if not has_docs and vector_index is not None:
-             try:
-                 # Check if index has nodes in docstore
-                 has_docs = len(vector_index.docstore.docs) > 0
-             except:
-                 has_docs = False
-
-        if not has_docs:
+        # Only use simple chat if there are no documents to retrieve from
+        if not self.has_documents(nodes, vector_index):
             return SimpleChatEngine.from_defaults(
                 llm=llm,
-                memory=ChatMemoryBuffer(
+                memory=CachedChatMemoryBuffer(
                     token_limit=self._setting.ollama.chat_token_limit
                 ),
             )
 
         # Chat engine with documents
         retriever = self._retriever.get_retrievers(
-            llm=llm, 
-            language=language, 
+            llm=llm,
+            language=language,
             nodes=nodes,
             vector_index=vector_index
         )
-        return CondensePlusContextChatEngine.from_defaults(
+        return LocalCondensePlusContextChatEngine(
             retriever=retriever,
             llm=llm,
-            memory=ChatMemoryBuffer(token_limit=self._setting.ollama.chat_token_limit),
+            memory=CachedChatMemoryBuffer(token_limit=self._setting.ollama.chat_token_limit),
+            callback_manager=Settings.callback_manager,
+            condense_cache=self._condense_cache,
         )
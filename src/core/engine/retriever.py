@@ -1,3 +1,4 @@
+import threading
 from typing import List
 from dotenv import load_dotenv
 from llama_index.core.retrievers import (
@@ -11,17 +12,108 @@ from llama_index.core.retrievers.fusion_retriever import FUSION_MODES
 from llama_index.core.postprocessor import SentenceTransformerRerank
 from llama_index.core.tools import RetrieverTool
 from llama_index.core.selectors import LLMSingleSelector
-from llama_index.core.schema import BaseNode, NodeWithScore, QueryBundle, IndexNode
+from llama_index.core.schema import BaseNode, NodeWithScore, QueryBundle, IndexNode, TextNode
 from llama_index.core.llms.llm import LLM
+from llama_index.core.vector_stores.utils import metadata_dict_to_node
 from llama_index.retrievers.bm25 import BM25Retriever
 from llama_index.core import Settings, VectorStoreIndex
+from ..metrics import span
 from ..prompt import get_query_gen_prompt
 from ...setting import RAGSettings
 
 load_dotenv()
 
+# default of the bm25_retriever arguments: build one, while None means "without BM25"
+_BUILD_BM25 = object()
 
-class TwoStageRetriever(QueryFusionRetriever):
+_rerankers: dict[tuple[str, int], SentenceTransformerRerank] = {}
+_rerankers_lock = threading.Lock()
+
+
+def get_reranker(
+    setting: RAGSettings | None = None, top_n: int | None = None
+) -> SentenceTransformerRerank:
+    """Cross-encoder reranker, loaded once per model and top_n and shared by all retrievers."""
+    setting = setting or RAGSettings()
+    key = (setting.retriever.rerank_llm, top_n or setting.retriever.top_k_rerank)
+    with _rerankers_lock:
+        reranker = _rerankers.get(key)
+        if reranker is None:
+            reranker = SentenceTransformerRerank(top_n=key[1], model=key[0])
+            _rerankers[key] = reranker
+    return reranker
+
+
+def warmup_retriever(
+    retriever: BaseRetriever | None, query: str, setting: RAGSettings | None = None
+) -> None:
+    """Run the searches inside `retriever` and the reranker once.
+
+    Router selection and query generation are skipped, they need the LLM,
+    so only the vector and BM25 retrievers under them are called directly.
+    """
+    pending = [retriever] if retriever is not None else []
+    seen = set()
+    results = []
+    while pending:
+        current = pending.pop()
+        if id(current) in seen:
+            continue
+        seen.add(id(current))
+        if isinstance(current, (RouterRetriever, QueryFusionRetriever)):
+            pending.extend(current._retrievers)
+        else:
+            results.extend(current.retrieve(query))
+    # loads the cross-encoder even before any document is ingested
+    results = results or [NodeWithScore(node=TextNode(text=query), score=0.0)]
+    get_reranker(setting).postprocess_nodes(results, query_str=query)
+
+
+class LocalVectorIndexRetriever(VectorIndexRetriever):
+    def _retrieve(self, query_bundle: QueryBundle) -> List[NodeWithScore]:
+        with span("retrieve.vector") as attrs:
+            nodes = super()._retrieve(query_bundle)
+            attrs["nodes"] = len(nodes)
+        return nodes
+
+
+class LocalBM25Retriever(BM25Retriever):
+    def _retrieve(self, query_bundle: QueryBundle) -> List[NodeWithScore]:
+        with span("retrieve.bm25") as attrs:
+            nodes = super()._retrieve(query_bundle)
+            attrs["nodes"] = len(nodes)
+        return nodes
+
+
+class LocalSingleSelector(LLMSingleSelector):
+    def _select(self, choices, query):
+        with span("router.select"):
+            return super()._select(choices, query)
+
+
+class LocalFusionRetriever(QueryFusionRetriever):
+    """QueryFusionRetriever that traces query generation and fusion."""
+
+    def _get_queries(self, original_query: str) -> List[QueryBundle]:
+        with span("fusion.generate_queries") as attrs:
+            queries = super()._get_queries(original_query)
+            attrs["queries"] = len(queries)
+        return queries
+
+    def _reciprocal_rerank_fusion(self, results):
+        with span("fusion", mode="reciprocal_rerank"):
+            return super()._reciprocal_rerank_fusion(results)
+
+    def _relative_score_fusion(self, results, dist_based: bool = False):
+        with span("fusion", mode="dist_based_score" if dist_based else "relative_score"):
+            return super()._relative_score_fusion(results, dist_based)
+
+    def _simple_fusion(self, results):
+        with span("fusion", mode="simple"):
+            return super()._simple_fusion(results)
+
+
+class TwoStageRetriever(LocalFusionRetriever):
     def __init__(
         self,
         retrievers: List[BaseRetriever],
@@ -53,10 +145,7 @@ class TwoStageRetriever(QueryFusionRetriever):
             retriever_weights,
         )
         self._setting = setting or RAGSettings()
-        self._rerank_model = SentenceTransformerRerank(
-            top_n=self._setting.retriever.top_k_rerank,
-            model=self._setting.retriever.rerank_llm,
-        )
+        self._rerank_model = get_reranker(self._setting)
 
     def _retrieve(self, query_bundle: QueryBundle) -> List[NodeWithScore]:
         queries: List[QueryBundle] = [query_bundle]
@@ -68,7 +157,8 @@ class TwoStageRetriever(QueryFusionRetriever):
         else:
             results = self._run_sync_queries(queries)
         results = self._simple_fusion(results)
-        return self._rerank_model.postprocess_nodes(results, query_bundle)
+        with span("rerank", candidates=len(results)):
+            return self._rerank_model.postprocess_nodes(results, query_bundle)
 
     async def _aretrieve(self, query_bundle: QueryBundle) -> List[NodeWithScore]:
         queries: List[QueryBundle] = [query_bundle]
@@ -77,7 +167,8 @@ class TwoStageRetriever(QueryFusionRetriever):
 
         results = await self._run_async_queries(queries)
         results = self._simple_fusion(results)
-        return self._rerank_model.postprocess_nodes(results, query_bundle)
+        with span("rerank", candidates=len(results)):
+            return self._rerank_model.postprocess_nodes(results, query_bundle)
 
 
 class LocalRetriever:
@@ -86,6 +177,9 @@ class LocalRetriever:
     ):
         super().__init__()
         self._setting = setting or RAGSettings()
+        # BM25 over the current Chroma collection and the collection state it was built for
+        self._collection_bm25: tuple[tuple, BM25Retriever] | None = None
+        self._collection_bm25_lock = threading.Lock()
 
     def _get_normal_retriever(
         self,
@@ -94,44 +188,86 @@ class LocalRetriever:
         language: str = "eng",
     ):
         llm = llm or Settings.llm
-        return VectorIndexRetriever(
+        return LocalVectorIndexRetriever(
             index=vector_index,
             similarity_top_k=self._setting.retriever.similarity_top_k,
             embed_model=Settings.embed_model,
             verbose=True,
         )
 
+    def get_bm25_retriever(self, vector_index: VectorStoreIndex) -> BM25Retriever | None:
+        """BM25 over the index nodes, None if it cannot be built (e.g. no nodes)."""
+        try:
+            if len(vector_index.docstore.docs) > 0:
+                return LocalBM25Retriever.from_defaults(
+                    index=vector_index,
+                    similarity_top_k=self._setting.retriever.similarity_top_k,
+                    verbose=True,
+                )
+            return self._get_collection_bm25(vector_index)
+        except Exception as e:
+            print(f"Warning: Failed to initialize BM25Retriever: {e}. Falling back to VectorRetriever only.")
+            return None
+
+    def _get_collection_bm25(self, vector_index: VectorStoreIndex) -> BM25Retriever:
+        """BM25 over a Chroma collection, which keeps the chunks instead of the docstore.
+
+        Reading and indexing the whole collection takes as long as the corpus
+        is large, so the retriever is reused until the collection changes:
+        ingestion changes its count, deleting a topic recreates it with a new id.
+        Only the current collection is kept, switching back to a topic rebuilds it.
+        """
+        collection = getattr(vector_index.vector_store, "_collection", None)
+        if collection is None:
+            raise ValueError("the index has no nodes")
+        top_k = self._setting.retriever.similarity_top_k
+        key = (collection.id, collection.count(), top_k)
+        with self._collection_bm25_lock:
+            if self._collection_bm25 is not None and self._collection_bm25[0] == key:
+                return self._collection_bm25[1]
+            self._collection_bm25 = None
+            if key[1] == 0:
+                raise ValueError("the collection is empty")
+            result = collection.get(include=["documents", "metadatas"])
+            nodes = []
+            for text, metadata in zip(result["documents"], result["metadatas"]):
+                node = metadata_dict_to_node(metadata)
+                node.set_content(text)
+                nodes.append(node)
+            retriever = LocalBM25Retriever.from_defaults(
+                nodes=nodes, similarity_top_k=top_k, verbose=True
+            )
+            self._collection_bm25 = (key, retriever)
+            return retriever
+
     def _get_hybrid_retriever(
         self,
         vector_index: VectorStoreIndex,
         llm: LLM | None = None,
         language: str = "eng",
         gen_query: bool = True,
+        bm25_retriever: BM25Retriever | None = _BUILD_BM25,
     ):
         # VECTOR INDEX RETRIEVER
-        vector_retriever = VectorIndexRetriever(
+        vector_retriever = LocalVectorIndexRetriever(
             index=vector_index,
             similarity_top_k=self._setting.retriever.similarity_top_k,
             embed_model=Settings.embed_model,
             verbose=True,
         )
 
-        try:
-            bm25_retriever = BM25Retriever.from_defaults(
-                index=vector_index,
-                similarity_top_k=self._setting.retriever.similarity_top_k,
-                verbose=True,
-            )
+        if bm25_retriever is _BUILD_BM25:
+            bm25_retriever = self.get_bm25_retriever(vector_index)
+        if bm25_retriever is not None:
             retrievers = [bm25_retriever, vector_retriever]
             weights = self._setting.retriever.retriever_weights
-        except Exception as e:
-            print(f"Warning: Failed to initialize BM25Retriever: {e}. Falling back to VectorRetriever only.")
+        else:
             retrievers = [vector_retriever]
             weights = [1.0]
 
         # FUSION RETRIEVER
         if gen_query:
-            hybrid_retriever = QueryFusionRetriever(
+            hybrid_retriever = LocalFusionRetriever(
                 retrievers=retrievers,
                 retriever_weights=weights,
                 llm=llm,
@@ -162,24 +298,28 @@ class LocalRetriever:
         vector_index: VectorStoreIndex,
         llm: LLM | None = None,
         language: str = "eng",
+        bm25_retriever: BM25Retriever | None = _BUILD_BM25,
     ):
+        # both tools search the same nodes, build (or fail to build) BM25 once for them
+        if bm25_retriever is _BUILD_BM25:
+            bm25_retriever = self.get_bm25_retriever(vector_index)
         fusion_tool = RetrieverTool.from_defaults(
             retriever=self._get_hybrid_retriever(
-                vector_index, llm, language, gen_query=True
+                vector_index, llm, language, gen_query=True, bm25_retriever=bm25_retriever
             ),
             description="Use this tool when the user's query is ambiguous or unclear.",
             name="Fusion Retriever with BM25 and Vector Retriever and LLM Query Generation.",
         )
         two_stage_tool = RetrieverTool.from_defaults(
             retriever=self._get_hybrid_retriever(
-                vector_index, llm, language, gen_query=False
+                vector_index, llm, language, gen_query=False, bm25_retriever=bm25_retriever
             ),
             description="Use this tool when the user's query is clear and unambiguous.",
             name="Two Stage Retriever with BM25 and Vector Retriever and LLM Rerank.",
         )
 
         return RouterRetriever.from_defaults(
-            selector=LLMSingleSelector.from_defaults(llm=llm),
+            selector=LocalSingleSelector.from_defaults(llm=llm),
             retriever_tools=[fusion_tool, two_stage_tool],
             llm=llm,
         )
@@ -190,6 +330,7 @@ class LocalRetriever:
         llm: LLM | None = None,
         language: str = "eng",
         vector_index: VectorStoreIndex | None = None,
+        bm25_retriever: BM25Retriever | None = _BUILD_BM25,
     ):
         if vector_index is None:
             vector_index = VectorStoreIndex(nodes=nodes)
@@ -210,7 +351,9 @@ class LocalRetriever:
         if has_docs:
             # Only use complex retrievers if we actually have data
             if len(nodes) > self._setting.retriever.top_k_rerank or vector_index is not None:
-                retriever = self._get_router_retriever(vector_index, llm, language)
+                retriever = self._get_router_retriever(
+                    vector_index, llm, language, bm25_retriever
+                )
             else:
                 retriever = self._get_normal_retriever(vector_index, llm, language)
         else:
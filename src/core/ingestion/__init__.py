@@ -1,5 +1,8 @@
 from .ingestion import LocalDataIngestion
+from .jobs import IngestionJob, IngestionQueue
 
 __all__ = [
     "LocalDataIngestion",
+    "IngestionJob",
+    "IngestionQueue",
 ]
@@ -1,22 +1,39 @@
 import re
+import time
 import fitz
 from llama_index.core import Document, Settings
 from llama_index.core.schema import BaseNode
 from llama_index.core.node_parser import SentenceSplitter
 from dotenv import load_dotenv
-from typing import Any, List
+from typing import Any, Callable, List
 from tqdm import tqdm
+from ..metrics import REGISTRY
+from .node_store import NodeStore, file_hash
 from ...setting import RAGSettings
 
 load_dotenv()
 
+PAGES = REGISTRY.counter("rag_ingested_pages_total", "PDF pages read during ingestion")
+CHUNKS = REGISTRY.counter("rag_ingested_chunks_total", "Chunks produced during ingestion")
+EMBEDDINGS = REGISTRY.counter("rag_embeddings_total", "Chunks embedded during ingestion")
+PAGES_PER_S = REGISTRY.gauge(
+    "rag_ingestion_pages_per_second", "Page reading throughput of the last ingested file"
+)
+EMBEDDINGS_PER_S = REGISTRY.gauge(
+    "rag_ingestion_embeddings_per_second", "Embedding throughput of the last ingested file"
+)
+
 
 class LocalDataIngestion:
     def __init__(self, setting: RAGSettings | None = None) -> None:
         self._setting = setting or RAGSettings()
-        self._node_store = {}
+        self._node_store = NodeStore(self._setting.ingestion.node_cache_mb * 2**20)
         self._ingested_file = []
 
+    def set_node_loader(self, load: Callable[[list[str]], List[BaseNode]] | None) -> None:
+        """Where node bodies dropped from memory are read back from, by node id."""
+        self._node_store.set_loader(load)
+
     def _filter_text(self, text):
         # Define the regex pattern.
         pattern = r'[a-zA-Z0-9 \u00C0-\u01B0\u1EA0-\u1EF9`~!@#$%^&*()_\-+=\[\]{}|\\;:\'",.<>/?]+'
@@ -33,54 +50,93 @@ class LocalDataIngestion:
         input_files: list[str],
         embed_nodes: bool = True,
         embed_model: Any | None = None,
+        progress: Callable[[str, int], None] | None = None,
     ) -> List[BaseNode]:
+        """Parse, split and embed the files; `progress(counter, n)` is told about
+        the pages, chunks and embeddings done so far."""
         return_nodes = []
-        self._ingested_file = []
+        ingested_files = []
         if len(input_files) == 0:
+            self._ingested_file = ingested_files
             return return_nodes
-        splitter = SentenceSplitter.from_defaults(
-            chunk_size=self._setting.ingestion.chunk_size,
-            chunk_overlap=self._setting.ingestion.chunk_overlap,
-            paragraph_separator=self._setting.ingestion.paragraph_sep,
-            secondary_chunking_regex=self._setting.ingestion.chunking_regex,
-        )
+        progress = progress or (lambda counter, count: None)
+        splitter = self.get_splitter()
         if embed_nodes:
             Settings.embed_model = embed_model or Settings.embed_model
         for input_file in tqdm(input_files, desc="Ingesting data"):
             file_name = input_file.strip().split("/")[-1]
-            self._ingested_file.append(file_name)
-            if file_name in self._node_store:
-                return_nodes.extend(self._node_store[file_name])
+            ingested_files.append(file_name)
+            digest = file_hash(input_file)
+            if self._node_store.lookup(file_name, digest) is not None:
+                return_nodes.extend(self._node_store.nodes([file_name]))
             else:
-                document = fitz.open(input_file)
-                all_text = ""
-                for doc_idx, page in enumerate(document):
-                    page_text = page.get_text("text")
-                    page_text = self._filter_text(page_text)
-                    all_text += " " + page_text
-                document = Document(
-                    text=all_text.strip(),
-                    metadata={
-                        "file_name": file_name,
-                    },
-                )
-
+                document = self.read_document(input_file, progress)
                 nodes = splitter([document], show_progress=True)
+                CHUNKS.inc(len(nodes))
+                progress("chunks", len(nodes))
                 if embed_nodes:
-                    nodes = Settings.embed_model(nodes, show_progress=True)
-                self._node_store[file_name] = nodes
+                    start = time.perf_counter()
+                    nodes = self._embed(nodes, progress)
+                    elapsed = time.perf_counter() - start
+                    EMBEDDINGS.inc(len(nodes))
+                    if elapsed > 0 and nodes:
+                        EMBEDDINGS_PER_S.set(len(nodes) / elapsed)
+                self._node_store.add(file_name, digest, nodes)
                 return_nodes.extend(nodes)
+        # published once complete, concurrent jobs should use the returned nodes
+        self._ingested_file = ingested_files
         return return_nodes
 
+    def get_splitter(self) -> SentenceSplitter:
+        return SentenceSplitter.from_defaults(
+            chunk_size=self._setting.ingestion.chunk_size,
+            chunk_overlap=self._setting.ingestion.chunk_overlap,
+            paragraph_separator=self._setting.ingestion.paragraph_sep,
+            secondary_chunking_regex=self._setting.ingestion.chunking_regex,
+        )
+
+    def read_document(
+        self, input_file: str, progress: Callable[[str, int], None] | None = None
+    ) -> Document:
+        """Filtered text of all pages of a PDF as one Document."""
+        progress = progress or (lambda counter, count: None)
+        start = time.perf_counter()
+        page_texts = []
+        with fitz.open(input_file) as pdf:
+            for page in pdf:
+                page_texts.append(self._filter_text(page.get_text("text")))
+                PAGES.inc()
+                progress("pages", 1)
+        elapsed = time.perf_counter() - start
+        if elapsed > 0 and page_texts:
+            PAGES_PER_S.set(len(page_texts) / elapsed)
+        # joined once, instead of growing a copy of the text per page
+        return Document(
+            text=" ".join(page_texts).strip(),
+            metadata={
+                "file_name": input_file.strip().split("/")[-1],
+            },
+        )
+
+    def _embed(self, nodes: List[BaseNode], progress: Callable[[str, int], None]):
+        # a few batches per call, so progress is reported while a large file is embedded
+        step = max(1, self._setting.ingestion.embed_batch_size) * 4
+        embedded = []
+        with tqdm(total=len(nodes), desc="Embedding") as bar:
+            for i in range(0, len(nodes), step):
+                batch = Settings.embed_model(nodes[i : i + step])
+                embedded.extend(batch)
+                bar.update(len(batch))
+                progress("embeddings", len(batch))
+        return embedded
+
     def reset(self):
-        self._node_store = {}
+        self._node_store.clear()
         self._ingested_file = []
 
     def check_nodes_exist(self):
-        return len(self._node_store.values()) > 0
+        return len(self._node_store) > 0
 
-    def get_ingested_nodes(self):
-        return_nodes = []
-        for file in self._ingested_file:
-            return_nodes.extend(self._node_store[file])
-        return return_nodes
+    def get_ingested_nodes(self, fetch: bool = True):
+        """Nodes of the last ingested files; with `fetch=False` only those still in memory."""
+        return self._node_store.nodes(self._ingested_file, fetch=fetch)
@@ -0,0 +1,112 @@
+import queue
+import threading
+import time
+import traceback
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass, field, fields
+from typing import Callable
+
+
+@dataclass
+class IngestionJob:
+    """Ingestion of a set of files into one topic, with its progress counters."""
+
+    files: list[str]
+    topic: str
+    profile: bool = False
+    id: str = field(default_factory=lambda: uuid.uuid4().hex[:12])
+    status: str = "queued"  # queued, running, done, failed
+    pages: int = 0
+    chunks: int = 0
+    embeddings: int = 0
+    upserts: int = 0
+    error: str | None = None
+    submitted: float = field(default_factory=time.time)
+    started: float | None = None
+    finished: float | None = None
+    _done: threading.Event = field(default_factory=threading.Event, repr=False)
+
+    def update(self, counter: str, count: int = 1) -> None:
+        """Progress callback of LocalDataIngestion.store_nodes (pages, chunks, embeddings, upserts)."""
+        setattr(self, counter, getattr(self, counter) + count)
+
+    def wait(self, timeout: float | None = None) -> bool:
+        return self._done.wait(timeout)
+
+    def to_dict(self) -> dict:
+        return {f.name: getattr(self, f.name) for f in fields(self) if not f.name.startswith("_")}
+
+    def status_text(self) -> str:
+        if self.status == "queued":
+            return f"Ingestion of {len(self.files)} file(s) queued ..."
+        if self.status == "failed":
+            return f"Ingestion failed: {self.error}"
+        text = (
+            f"{self.pages} pages, {self.chunks} chunks, "
+            f"{self.embeddings}/{self.chunks} embedded, {self.upserts} stored"
+        )
+        if self.status == "done":
+            return f"Processing documents 📄 completed! {text} in {self.finished - self.started:.1f}s"
+        return f"Processing documents 📄 ... {text}"
+
+
+class IngestionQueue:
+    """Runs ingestion jobs on background worker threads, in submission order."""
+
+    def __init__(
+        self,
+        run: Callable[[IngestionJob], None],
+        workers: int = 1,
+        history: int = 100,
+    ) -> None:
+        self._run = run
+        self._history = history
+        self._jobs: OrderedDict[str, IngestionJob] = OrderedDict()
+        self._lock = threading.Lock()
+        self._queue: queue.Queue[IngestionJob] = queue.Queue()
+        for i in range(max(1, workers)):
+            threading.Thread(
+                target=self._work, name=f"ingestion-{i}", daemon=True
+            ).start()
+
+    def submit(self, files: list[str], topic: str, profile: bool = False) -> IngestionJob:
+        job = IngestionJob(files=list(files), topic=topic, profile=profile)
+        with self._lock:
+            self._jobs[job.id] = job
+            # forget the oldest finished jobs
+            while len(self._jobs) > self._history:
+                oldest = next(iter(self._jobs.values()))
+                if oldest.status not in ("done", "failed"):
+                    break
+                self._jobs.popitem(last=False)
+        self._queue.put(job)
+        return job
+
+    def get(self, job_id: str) -> IngestionJob | None:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def jobs(self) -> list[IngestionJob]:
+        with self._lock:
+            return list(self._jobs.values())
+
+    def pending(self) -> int:
+        with self._lock:
+            return sum(1 for j in self._jobs.values() if j.status in ("queued", "running"))
+
+    def _work(self) -> None:
+        while True:
+            job = self._queue.get()
+            job.status = "running"
+            job.started = time.time()
+            try:
+                self._run(job)
+                job.status = "done"
+            except Exception as e:
+                traceback.print_exc()
+                job.error = str(e)
+                job.status = "failed"
+            finally:
+                job.finished = time.time()
+                job._done.set()
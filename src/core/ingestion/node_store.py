@@ -0,0 +1,121 @@
+import hashlib
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Callable
+from llama_index.core.schema import BaseNode
+
+# list of float objects: a pointer plus the float itself per dimension
+_BYTES_PER_DIM = 32
+_BYTES_PER_NODE = 1024
+
+
+def file_hash(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def node_size(node: BaseNode) -> int:
+    """Rough in-memory size of a node with its text and embedding."""
+    return (
+        _BYTES_PER_NODE
+        + len(node.get_content())
+        + _BYTES_PER_DIM * len(node.embedding or ())
+    )
+
+
+@dataclass
+class IngestedFile:
+    file_hash: str
+    node_ids: list[str]
+    nodes: list[BaseNode] | None = None  # None once the bodies were dropped
+    size: int = 0
+
+
+class NodeStore:
+    """Ingested files as node id references, with node bodies cached up to `max_bytes`.
+
+    The bodies of the least recently used files are dropped beyond the cap,
+    `load(node_ids)` reads them back (from the vector store) when asked for.
+    """
+
+    def __init__(
+        self,
+        max_bytes: int,
+        load: Callable[[list[str]], list[BaseNode]] | None = None,
+    ) -> None:
+        self._max_bytes = max_bytes
+        self._load = load
+        self._files: OrderedDict[str, IngestedFile] = OrderedDict()
+        self._resident = 0
+        self._lock = threading.Lock()
+
+    def set_loader(self, load: Callable[[list[str]], list[BaseNode]] | None) -> None:
+        self._load = load
+
+    def __len__(self) -> int:
+        return len(self._files)
+
+    def __contains__(self, file_name: str) -> bool:
+        return file_name in self._files
+
+    @property
+    def resident_bytes(self) -> int:
+        return self._resident
+
+    def lookup(self, file_name: str, file_hash: str) -> IngestedFile | None:
+        """The entry of an already ingested file, None if unknown or its content changed."""
+        with self._lock:
+            entry = self._files.get(file_name)
+            if entry is None or entry.file_hash != file_hash:
+                return None
+            self._files.move_to_end(file_name)
+            return entry
+
+    def add(self, file_name: str, file_hash: str, nodes: list[BaseNode]) -> None:
+        size = sum(node_size(node) for node in nodes)
+        with self._lock:
+            old = self._files.pop(file_name, None)
+            if old is not None and old.nodes is not None:
+                self._resident -= old.size
+            self._files[file_name] = IngestedFile(
+                file_hash, [node.node_id for node in nodes], list(nodes), size
+            )
+            self._resident += size
+            self._evict()
+
+    def _evict(self) -> None:
+        for entry in self._files.values():
+            if self._resident <= self._max_bytes:
+                break
+            if entry.nodes is not None:
+                entry.nodes = None
+                self._resident -= entry.size
+
+    def nodes(self, file_names: list[str], fetch: bool = True) -> list[BaseNode]:
+        """Nodes of the files in order; dropped bodies are loaded unless `fetch` is False."""
+        parts = []
+        with self._lock:
+            for name in file_names:
+                entry = self._files.get(name)
+                if entry is None:
+                    continue
+                if entry.nodes is not None:
+                    parts.append(entry.nodes)
+                elif fetch and self._load is not None:
+                    parts.append(entry.node_ids)
+        result = []
+        for part in parts:
+            if part and isinstance(part[0], str):
+                # not cached again, that would only evict the bodies of other files
+                part = self._load(part)
+            result.extend(part)
+        return result
+
+    def clear(self) -> None:
+        with self._lock:
+            self._files.clear()
+            self._resident = 0
@@ -0,0 +1,30 @@
+from .generation import (
+    GenerationMetrics,
+    GenerationRecorder,
+    GenerationStats,
+    MeteredResponse,
+    current_recorder,
+)
+from .exporter import MetricsServer
+from .profiling import RequestProfiler
+from .registry import REGISTRY, Counter, Gauge, Histogram, MetricsRegistry
+from .tracing import Trace, Tracer, current_trace, span
+
+__all__ = [
+    "GenerationMetrics",
+    "GenerationRecorder",
+    "GenerationStats",
+    "MeteredResponse",
+    "current_recorder",
+    "MetricsServer",
+    "RequestProfiler",
+    "REGISTRY",
+    "Counter",
+    "Gauge",
+    "Histogram",
+    "MetricsRegistry",
+    "Trace",
+    "Tracer",
+    "current_trace",
+    "span",
+]
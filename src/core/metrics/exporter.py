@@ -0,0 +1,57 @@
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from .registry import REGISTRY, MetricsRegistry
+from ...setting import RAGSettings
+
+
+class MetricsServer:
+    """Serves a metrics registry in Prometheus text format on `GET /metrics`."""
+
+    CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+    def __init__(
+        self,
+        registry: MetricsRegistry | None = None,
+        setting: RAGSettings | None = None,
+    ) -> None:
+        self._registry = registry or REGISTRY
+        self._setting = setting or RAGSettings()
+        self._server: ThreadingHTTPServer | None = None
+
+    def _handler(self):
+        registry = self._registry
+        content_type = self.CONTENT_TYPE
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] not in ("/", "/metrics"):
+                    self.send_error(404)
+                    return
+                body = registry.render().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                # scraped every few seconds, keep it out of the console
+                pass
+
+        return Handler
+
+    def start_in_thread(self, host: str | None = None, port: int | None = None):
+        host = host or self._setting.metrics.host
+        port = port if port is not None else self._setting.metrics.port
+        self._server = ThreadingHTTPServer((host, port), self._handler())
+        self._server.daemon_threads = True
+        thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        thread.start()
+        print(f"Metrics served on http://{host}:{self._server.server_port}/metrics")
+        return thread
+
+    def stop(self) -> None:
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
@@ -0,0 +1,180 @@
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import asdict, dataclass
+from typing import Callable, Generator
+from ...setting import RAGSettings
+
+_recorder: ContextVar["GenerationRecorder | None"] = ContextVar(
+    "generation_recorder", default=None
+)
+
+
+def current_recorder() -> "GenerationRecorder | None":
+    """Recorder of the query running in this context, if any."""
+    return _recorder.get()
+
+
+def _rate(count: int | None, duration_ns: int | None) -> float | None:
+    if not count or not duration_ns:
+        return None
+    return round(count / (duration_ns / 1e9), 2)
+
+
+@dataclass
+class GenerationMetrics:
+    model: str
+    total_s: float
+    ttft_s: float | None = None
+    prompt_tokens: int | None = None
+    prompt_tps: float | None = None
+    generated_tokens: int | None = None
+    decode_tps: float | None = None
+    load_s: float | None = None
+
+    def status(self) -> str:
+        parts = []
+        if self.ttft_s is not None:
+            parts.append(f"TTFT {self.ttft_s:.2f}s")
+        if self.prompt_tokens is not None:
+            rate = f" @ {self.prompt_tps:.0f} tok/s" if self.prompt_tps else ""
+            parts.append(f"prompt {self.prompt_tokens} tok{rate}")
+        if self.generated_tokens is not None:
+            rate = f" @ {self.decode_tps:.1f} tok/s" if self.decode_tps else ""
+            parts.append(f"answer {self.generated_tokens} tok{rate}")
+        parts.append(f"total {self.total_s:.2f}s")
+        return " | ".join(parts)
+
+
+class GenerationRecorder:
+    """Receives the final Ollama chunk (with the eval counters) of a streamed answer.
+
+    Also carries the cancellation of the request: the stream stops reading from
+    Ollama once `cancel` was called.
+    """
+
+    def __init__(self) -> None:
+        self.raw: dict | None = None
+        self.cancelled = threading.Event()
+
+    def __call__(self, chunk: dict) -> None:
+        self.raw = chunk
+
+    def cancel(self) -> None:
+        self.cancelled.set()
+
+    @contextmanager
+    def active(self):
+        token = _recorder.set(self)
+        try:
+            yield self
+        finally:
+            _recorder.reset(token)
+
+    def metrics(
+        self, model: str, start: float, first_token: float | None, end: float
+    ) -> GenerationMetrics:
+        raw = self.raw or {}
+        load_ns = raw.get("load_duration")
+        return GenerationMetrics(
+            model=model,
+            total_s=round(end - start, 4),
+            ttft_s=round(first_token - start, 4) if first_token is not None else None,
+            # Ollama leaves out prompt_eval_count when the whole prompt was cached
+            prompt_tokens=raw.get("prompt_eval_count", 0 if raw else None),
+            prompt_tps=_rate(raw.get("prompt_eval_count"), raw.get("prompt_eval_duration")),
+            generated_tokens=raw.get("eval_count"),
+            decode_tps=_rate(raw.get("eval_count"), raw.get("eval_duration")),
+            load_s=round(load_ns / 1e9, 4) if load_ns else None,
+        )
+
+
+class MeteredResponse:
+    """Wraps a streaming response and measures it once it was streamed completely."""
+
+    def __init__(
+        self,
+        response,
+        recorder: GenerationRecorder,
+        model: str,
+        start: float,
+        on_complete: Callable[[GenerationMetrics], None] | None = None,
+        request_id: str | None = None,
+    ) -> None:
+        self._response = response
+        self._recorder = recorder
+        self._model = model
+        self._start = start
+        self._on_complete = on_complete
+        self.request_id = request_id
+        self.metrics: GenerationMetrics | None = None
+
+    def __getattr__(self, name):
+        return getattr(self._response, name)
+
+    def close(self) -> None:
+        """Cancel the generation, safe to call from another thread than the reader's."""
+        self._recorder.cancel()
+
+    @property
+    def response_gen(self) -> Generator[str, None, None]:
+        first_token = None
+        for token in self._response.response_gen:
+            if first_token is None:
+                first_token = time.perf_counter()
+            yield token
+        self.metrics = self._recorder.metrics(
+            self._model, self._start, first_token, time.perf_counter()
+        )
+        if self._on_complete is not None:
+            self._on_complete(self.metrics)
+
+    def __str__(self) -> str:
+        return str(self._response)
+
+
+class GenerationStats:
+    """Per-model aggregates of generation metrics, every query is appended to a JSONL log."""
+
+    _FIELDS = ["total_s", "ttft_s", "prompt_tokens", "prompt_tps", "generated_tokens", "decode_tps"]
+
+    def __init__(self, setting: RAGSettings | None = None) -> None:
+        self._setting = setting or RAGSettings()
+        self._log_file = self._setting.metrics.generation_log
+        self._lock = threading.Lock()
+        self._models: dict[str, dict[str, list[float]]] = {}
+        if self._log_file:
+            os.makedirs(os.path.dirname(self._log_file) or ".", exist_ok=True)
+
+    def record(self, metrics: GenerationMetrics, **context) -> None:
+        with self._lock:
+            # [sum, count] per field, fields Ollama did not report are skipped
+            totals = self._models.setdefault(
+                metrics.model, {field: [0.0, 0] for field in self._FIELDS}
+            )
+            for field in self._FIELDS:
+                value = getattr(metrics, field)
+                if value is not None:
+                    totals[field][0] += value
+                    totals[field][1] += 1
+            if self._log_file:
+                record = {"time": time.time(), **context, **asdict(metrics)}
+                with open(self._log_file, "a", encoding="utf-8") as f:
+                    f.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+    def summary(self) -> dict[str, dict[str, float]]:
+        """Per model: number of queries, mean of each metric, total tokens."""
+        with self._lock:
+            summary = {}
+            for model, totals in self._models.items():
+                stats = {"queries": totals["total_s"][1]}
+                for field, (total, count) in totals.items():
+                    if count:
+                        stats[f"mean_{field}"] = round(total / count, 4)
+                stats["prompt_tokens"] = int(totals["prompt_tokens"][0])
+                stats["generated_tokens"] = int(totals["generated_tokens"][0])
+                summary[model] = stats
+            return summary
@@ -0,0 +1,79 @@
+import cProfile
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from ...setting import RAGSettings
+
+
+class RequestProfiler:
+    """Profiles a single request and saves the result under its request id.
+
+    "sample" mode samples the stacks of all threads every `profile_interval_ms`
+    and writes collapsed stacks (`<request_id>.collapsed`, for flamegraph.pl
+    or speedscope), so streaming threads are covered too. "cprofile" mode
+    profiles the calling thread deterministically (`<request_id>.pstats`).
+    """
+
+    def __init__(self, request_id: str, setting: RAGSettings | None = None) -> None:
+        setting = setting or RAGSettings()
+        self.request_id = request_id
+        self.mode = setting.metrics.profile_mode
+        self._dir = setting.metrics.profile_dir
+        self._interval = setting.metrics.profile_interval_ms / 1000
+        self._max_s = setting.metrics.profile_max_s
+        self._stacks: Counter = Counter()
+        self._profile: cProfile.Profile | None = None
+        self._thread: threading.Thread | None = None
+        self._stopped = threading.Event()
+        self._lock = threading.Lock()
+        self.path: str | None = None
+
+    def start(self) -> "RequestProfiler":
+        if self.mode == "cprofile":
+            self._profile = cProfile.Profile()
+            self._profile.enable()
+        else:
+            self._thread = threading.Thread(target=self._sample, daemon=True)
+            self._thread.start()
+        return self
+
+    def _sample(self) -> None:
+        own = threading.get_ident()
+        deadline = time.monotonic() + self._max_s
+        while not self._stopped.wait(self._interval) and time.monotonic() < deadline:
+            names = {t.ident: t.name for t in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == own:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(
+                        f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+                    )
+                    frame = frame.f_back
+                stack.append(names.get(ident, str(ident)))
+                self._stacks[";".join(reversed(stack))] += 1
+
+    def stop(self) -> str | None:
+        """Stop profiling and save the result, returns its path (safe to call twice)."""
+        with self._lock:
+            if self.path is not None or self._stopped.is_set():
+                return self.path
+            self._stopped.set()
+        os.makedirs(self._dir, exist_ok=True)
+        if self._profile is not None:
+            # cProfile hooks the thread that enabled it, stop from that thread
+            self._profile.disable()
+            self.path = os.path.join(self._dir, f"{self.request_id}.pstats")
+            self._profile.dump_stats(self.path)
+        else:
+            self._thread.join()
+            self.path = os.path.join(self._dir, f"{self.request_id}.collapsed")
+            with open(self.path, "w", encoding="utf-8") as f:
+                for stack, count in self._stacks.most_common():
+                    f.write(f"{stack} {count}\n")
+        print(f"Profile of request {self.request_id} saved to {self.path}")
+        return self.path
@@ -0,0 +1,313 @@
+import math
+import threading
+import weakref
+from bisect import bisect_left
+from typing import Callable, Iterable
+
+# Seconds, from a cached lookup up to a slow generation
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: tuple[str, ...], values: tuple[str, ...], extra: str = "") -> str:
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class _Metric:
+    """Metric family, one child per combination of label values."""
+
+    kind = ""
+
+    def __init__(self, name: str, help: str, labelnames: Iterable[str] = ()) -> None:
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._children: dict[tuple[str, ...], object] = {}
+        self._lock = threading.Lock()
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def labels(self, *values, **labels):
+        if labels:
+            values = tuple(str(labels[n]) for n in self.labelnames)
+        else:
+            values = tuple(str(v) for v in values)
+        if len(values) != len(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}")
+        # children are only created under the lock, lookups of existing ones are lock-free
+        child = self._children.get(values)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(values, self._new_child())
+        return child
+
+    def _default(self):
+        if self.labelnames:
+            raise ValueError(f"{self.name} has labels, use .labels(...)")
+        return self.labels()
+
+    def samples(self) -> list[tuple[str, str, float]]:
+        """(suffix, labels, value) of every child."""
+        raise NotImplementedError
+
+
+class _SlotOwner:
+    """Lives in a thread's locals, its finalizer runs once the thread is gone."""
+
+    __slots__ = ("__weakref__",)
+
+
+class _ThreadSlots:
+    """One slot (a list of numbers) per thread, only its own thread writes it, so no lock.
+
+    When a thread ends, its slot is added to a base slot and dropped: threads that
+    come and go (e.g. one per ingestion job) do not pile up slots.
+    """
+
+    def __init__(self, size: int) -> None:
+        self._size = size
+        self._local = threading.local()
+        self._slots: dict[int, list] = {}
+        self._base = [0] * size
+        self._lock = threading.Lock()
+
+    def get(self) -> list:
+        try:
+            return self._local.slot
+        except AttributeError:
+            return self._add()
+
+    def _add(self) -> list:
+        slot = [0] * self._size
+        owner = _SlotOwner()
+        self._local.slot = slot
+        self._local.owner = owner
+        with self._lock:
+            self._slots[id(slot)] = slot
+        weakref.finalize(owner, self._retire, slot)
+        return slot
+
+    def _retire(self, slot: list) -> None:
+        with self._lock:
+            for i, value in enumerate(slot):
+                self._base[i] += value
+            del self._slots[id(slot)]
+
+    def __len__(self) -> int:
+        return len(self._slots)
+
+    def totals(self) -> list:
+        with self._lock:
+            totals = list(self._base)
+            for slot in self._slots.values():
+                for i, value in enumerate(list(slot)):
+                    totals[i] += value
+        return totals
+
+
+class _CounterChild:
+    def __init__(self) -> None:
+        self._slots = _ThreadSlots(1)
+
+    def inc(self, amount: float = 1.0) -> None:
+        self._slots.get()[0] += amount
+
+    def get(self) -> float:
+        return self._slots.totals()[0]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def _new_child(self):
+        return _CounterChild()
+
+    def inc(self, amount: float = 1.0) -> None:
+        self._default().inc(amount)
+
+    def samples(self):
+        return [
+            ("", _format_labels(self.labelnames, values), child.get())
+            for values, child in list(self._children.items())
+        ]
+
+
+class _GaugeChild:
+    def __init__(self) -> None:
+        self._value = 0.0
+        self._lock = threading.Lock()
+
+    def set(self, value: float) -> None:
+        self._value = value
+
+    def inc(self, amount: float = 1.0) -> None:
+        with self._lock:
+            self._value += amount
+
+    def dec(self, amount: float = 1.0) -> None:
+        self.inc(-amount)
+
+    def get(self) -> float:
+        return self._value
+
+
+class Gauge(_Metric):
+    """Gauge that is either set directly or read from a callback at scrape time."""
+
+    kind = "gauge"
+
+    def __init__(self, name: str, help: str, labelnames: Iterable[str] = ()) -> None:
+        super().__init__(name, help, labelnames)
+        self._callback: Callable[[], dict[tuple, float]] | None = None
+
+    def _new_child(self):
+        return _GaugeChild()
+
+    def set(self, value: float) -> None:
+        self._default().set(value)
+
+    def set_function(self, callback: Callable[[], dict[tuple, float]]) -> None:
+        """`callback` returns {label values: value}, it replaces a previous one."""
+        self._callback = callback
+
+    def samples(self):
+        if self._callback is not None:
+            items = [
+                (tuple(str(v) for v in values), value)
+                for values, value in self._callback().items()
+            ]
+        else:
+            items = [(values, child.get()) for values, child in list(self._children.items())]
+        return [("", _format_labels(self.labelnames, values), value) for values, value in items]
+
+
+class _HistogramChild:
+    def __init__(self, bounds: tuple[float, ...]) -> None:
+        self._bounds = bounds
+        # per thread: a count per bucket (the last one is +Inf), then the sum
+        self._shards = _ThreadSlots(len(bounds) + 2)
+
+    def observe(self, value: float) -> None:
+        shard = self._shards.get()
+        shard[bisect_left(self._bounds, value)] += 1
+        shard[-1] += value
+
+    def get(self) -> tuple[list[int], float]:
+        """Non-cumulative bucket counts and the sum over all threads."""
+        totals = self._shards.totals()
+        return totals[:-1], totals[-1]
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        labelnames: Iterable[str] = (),
+        buckets: Iterable[float] = DEFAULT_BUCKETS,
+    ) -> None:
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(sorted(float(b) for b in buckets if b != math.inf))
+
+    def _new_child(self):
+        return _HistogramChild(self.buckets)
+
+    def observe(self, value: float) -> None:
+        self._default().observe(value)
+
+    def samples(self):
+        samples = []
+        for values, child in list(self._children.items()):
+            counts, total = child.get()
+            cumulative = 0
+            for bound, count in zip(self.buckets + (math.inf,), counts):
+                cumulative += count
+                le = f'le="{_format_value(bound)}"'
+                samples.append(
+                    ("_bucket", _format_labels(self.labelnames, values, le), cumulative)
+                )
+            labels = _format_labels(self.labelnames, values)
+            samples.append(("_sum", labels, total))
+            samples.append(("_count", labels, cumulative))
+        return samples
+
+
+class MetricsRegistry:
+    """In-process counters, gauges and fixed-bucket histograms in Prometheus text format.
+
+    Updates write to a per-thread slot of the metric without taking a lock,
+    the slots are only added up when the registry is rendered.
+    """
+
+    def __init__(self) -> None:
+        self._metrics: dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def _get_or_create(self, cls, name: str, *args, **kwargs):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, *args, **kwargs)
+                if not metric.labelnames:
+                    # exported as 0 before the first update
+                    metric.labels()
+            elif not isinstance(metric, cls):
+                raise ValueError(f"Metric {name} is already a {metric.kind}")
+            return metric
+
+    def counter(self, name: str, help: str, labelnames: Iterable[str] = ()) -> Counter:
+        return self._get_or_create(Counter, name, help, labelnames)
+
+    def gauge(self, name: str, help: str, labelnames: Iterable[str] = ()) -> Gauge:
+        return self._get_or_create(Gauge, name, help, labelnames)
+
+    def histogram(
+        self,
+        name: str,
+        help: str,
+        labelnames: Iterable[str] = (),
+        buckets: Iterable[float] = DEFAULT_BUCKETS,
+    ) -> Histogram:
+        return self._get_or_create(Histogram, name, help, labelnames, buckets)
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            try:
+                samples = metric.samples()
+            except Exception as e:
+                # a failing callback (e.g. the vector store being cleared) skips one metric
+                print(f"Metric {metric.name} failed: {e}")
+                continue
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for suffix, labels, value in samples:
+                lines.append(f"{metric.name}{suffix}{labels} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = MetricsRegistry()
+
+# shared by the answer cache, the condense cache and the query coalescer
+CACHE_REQUESTS = REGISTRY.counter(
+    "rag_cache_requests_total", "Cache lookups by cache and result (hit, miss)", ["cache", "result"]
+)
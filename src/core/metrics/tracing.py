@@ -0,0 +1,104 @@
+import json
+import threading
+import time
+import uuid
+from collections import deque
+from contextlib import contextmanager, nullcontext
+from contextvars import ContextVar
+from .registry import REGISTRY
+
+_trace: ContextVar["Trace | None"] = ContextVar("trace", default=None)
+_parent: ContextVar[str | None] = ContextVar("trace_parent", default=None)
+
+STAGE_SECONDS = REGISTRY.histogram(
+    "rag_stage_seconds", "Latency of request stages (retrieve, rerank, ...)", ["stage"]
+)
+
+
+def current_trace() -> "Trace | None":
+    """Trace of the request running in this context, if any."""
+    return _trace.get()
+
+
+def span(name: str, **attrs):
+    """Time a stage of the current request, a no-op outside of a traced request."""
+    trace = _trace.get()
+    if trace is None:
+        # callers may still set attributes on the span
+        return nullcontext({})
+    return trace.span(name, **attrs)
+
+
+class Trace:
+    """Spans of one request, all timed with the monotonic perf_counter."""
+
+    def __init__(self, tracer: "Tracer", request_id: str | None = None) -> None:
+        self.tracer = tracer
+        self.request_id = request_id or uuid.uuid4().hex[:12]
+        self.start = time.perf_counter()
+        self.wall_start = time.time()
+
+    @contextmanager
+    def active(self):
+        token = _trace.set(self)
+        try:
+            yield self
+        finally:
+            _trace.reset(token)
+
+    @contextmanager
+    def span(self, name: str, **attrs):
+        start = time.perf_counter()
+        parent = _parent.get()
+        token = _parent.set(name)
+        try:
+            yield attrs
+        finally:
+            _parent.reset(token)
+            self.record(name, start, time.perf_counter(), parent=parent, **attrs)
+
+    def record(self, name: str, start: float, end: float, parent: str | None = None, **attrs):
+        """Add a span measured elsewhere, e.g. in a thread without this context."""
+        STAGE_SECONDS.labels(name).observe(end - start)
+        self.tracer.add(
+            {
+                "request_id": self.request_id,
+                "name": name,
+                "parent": parent,
+                "offset_ms": round((start - self.start) * 1000, 3),
+                "duration_ms": round((end - start) * 1000, 3),
+                "time": self.wall_start + (start - self.start),
+                "thread": threading.current_thread().name,
+                **attrs,
+            }
+        )
+
+
+class Tracer:
+    """Bounded ring buffer of the spans of recent requests."""
+
+    def __init__(self, capacity: int = 10000) -> None:
+        self._spans: deque[dict] = deque(maxlen=capacity)
+
+    def start(self, request_id: str | None = None) -> Trace:
+        return Trace(self, request_id)
+
+    def add(self, span: dict) -> None:
+        # deque.append is atomic, no lock on the hot path
+        self._spans.append(span)
+
+    def spans(self, request_id: str | None = None) -> list[dict]:
+        spans = list(self._spans)
+        if request_id is not None:
+            spans = [s for s in spans if s["request_id"] == request_id]
+        return spans
+
+    def export_jsonl(self, path: str, request_id: str | None = None) -> int:
+        spans = self.spans(request_id)
+        with open(path, "w", encoding="utf-8") as f:
+            for s in spans:
+                f.write(json.dumps(s, ensure_ascii=False) + "\n")
+        return len(spans)
+
+    def clear(self) -> None:
+        self._spans.clear()
@@ -1,5 +1,6 @@
-from .model import LocalRAGModel
+from .model import LocalRAGModel, LocalOllama
 
 __all__ = [
     "LocalRAGModel",
+    "LocalOllama",
 ]
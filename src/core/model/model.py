@@ -1,12 +1,214 @@
+import asyncio
+import time
+from typing import Any, AsyncGenerator, Generator, Sequence
+from llama_index.core.base.llms.types import (
+    ChatMessage,
+    ChatResponse,
+    ChatResponseAsyncGen,
+    ChatResponseGen,
+    CompletionResponse,
+    CompletionResponseAsyncGen,
+    CompletionResponseGen,
+    MessageRole,
+)
+from llama_index.core.bridge.pydantic import Field, PrivateAttr
+from llama_index.core.llms.callbacks import llm_chat_callback, llm_completion_callback
 from llama_index.llms.ollama import Ollama
-from llama_index.llms.openai import OpenAI
+from llama_index.llms.ollama.base import get_additional_kwargs
+from ..client import OllamaBalancer, OllamaClient
+from ..metrics import current_recorder, current_trace
 from ...setting import RAGSettings
 from dotenv import load_dotenv
-import requests
 
 load_dotenv()
 
 
+async def _aiterate(generator: Generator) -> AsyncGenerator:
+    """Step a blocking generator in worker threads."""
+    done = object()
+    while True:
+        item = await asyncio.to_thread(next, generator, done)
+        if item is done:
+            break
+        yield item
+
+
+def _observe(responses: Generator, recorder, trace, start: float) -> Generator:
+    first_token = None
+    for response in responses:
+        if recorder is not None and recorder.cancelled.is_set():
+            # closes the HTTP stream, Ollama stops generating
+            responses.close()
+            return
+        if first_token is None:
+            first_token = time.perf_counter()
+            if trace is not None:
+                trace.record("llm.first_token", start, first_token)
+        # the last chunk carries the eval counters
+        if recorder is not None and response.raw.get("done"):
+            recorder(response.raw)
+        yield response
+    if trace is not None:
+        trace.record("llm.completion", start, time.perf_counter())
+
+
+class LocalOllama(Ollama):
+    """Ollama LLM on the shared pooled client, sends keep_alive so the model stays loaded."""
+
+    keep_alive: str | None = Field(
+        default=None, description="How long Ollama keeps the model loaded after a request."
+    )
+    _client: OllamaBalancer | OllamaClient | None = PrivateAttr(default=None)
+
+    @property
+    def client(self) -> OllamaBalancer | OllamaClient:
+        if self._client is None:
+            self._client = OllamaClient.get(base_url=self.base_url)
+        return self._client
+
+    def _payload(self, stream: bool, kwargs: dict[str, Any]) -> dict[str, Any]:
+        payload = {
+            "model": self.model,
+            "options": self._model_kwargs,
+            "stream": stream,
+            **kwargs,
+        }
+        if self.keep_alive is not None:
+            payload.setdefault("keep_alive", self.keep_alive)
+        if self.json_mode:
+            payload["format"] = "json"
+        return payload
+
+    def _chat_payload(
+        self, messages: Sequence[ChatMessage], stream: bool, kwargs: dict[str, Any]
+    ) -> dict[str, Any]:
+        messages = [
+            {
+                "role": message.role.value,
+                "content": message.content,
+                **message.additional_kwargs,
+            }
+            for message in messages
+        ]
+        return self._payload(stream, {"messages": messages, **kwargs})
+
+    # ----
+    def _chat(self, messages: Sequence[ChatMessage], kwargs: dict[str, Any]) -> ChatResponse:
+        raw = self.client.post(
+            "/api/chat", self._chat_payload(messages, False, kwargs), self.request_timeout
+        )
+        message = raw["message"]
+        return ChatResponse(
+            message=ChatMessage(
+                content=message.get("content"),
+                role=MessageRole(message.get("role")),
+                additional_kwargs=get_additional_kwargs(message, ("content", "role")),
+            ),
+            raw=raw,
+            additional_kwargs=get_additional_kwargs(raw, ("message",)),
+        )
+
+    def _stream_chat(
+        self, messages: Sequence[ChatMessage], kwargs: dict[str, Any]
+    ) -> ChatResponseGen:
+        text = ""
+        for chunk in self.client.stream(
+            "/api/chat", self._chat_payload(messages, True, kwargs), self.request_timeout
+        ):
+            message = chunk["message"]
+            delta = message.get("content")
+            text += delta
+            yield ChatResponse(
+                message=ChatMessage(
+                    content=text,
+                    role=MessageRole(message.get("role")),
+                    additional_kwargs=get_additional_kwargs(message, ("content", "role")),
+                ),
+                delta=delta,
+                raw=chunk,
+                additional_kwargs=get_additional_kwargs(chunk, ("message",)),
+            )
+            if chunk.get("done"):
+                break
+
+    def _complete(self, prompt: str, kwargs: dict[str, Any]) -> CompletionResponse:
+        raw = self.client.post(
+            "/api/generate",
+            self._payload(False, {self.prompt_key: prompt, **kwargs}),
+            self.request_timeout,
+        )
+        return CompletionResponse(
+            text=raw.get("response"),
+            raw=raw,
+            additional_kwargs=get_additional_kwargs(raw, ("response",)),
+        )
+
+    def _stream_complete(self, prompt: str, kwargs: dict[str, Any]) -> CompletionResponseGen:
+        text = ""
+        for chunk in self.client.stream(
+            "/api/generate",
+            self._payload(True, {self.prompt_key: prompt, **kwargs}),
+            self.request_timeout,
+        ):
+            delta = chunk.get("response")
+            text += delta
+            yield CompletionResponse(
+                delta=delta,
+                text=text,
+                raw=chunk,
+                additional_kwargs=get_additional_kwargs(chunk, ("response",)),
+            )
+
+    def _observed(self, responses: Generator) -> Generator:
+        """Report a stream to the metrics recorder and trace of the calling request."""
+        # generators run later, possibly in another thread: look both up now
+        recorder, trace = current_recorder(), current_trace()
+        if recorder is None and trace is None:
+            return responses
+        return _observe(responses, recorder, trace, time.perf_counter())
+
+    # ----
+    @llm_chat_callback()
+    def chat(self, messages: Sequence[ChatMessage], **kwargs: Any) -> ChatResponse:
+        return self._chat(messages, kwargs)
+
+    @llm_chat_callback()
+    def stream_chat(self, messages: Sequence[ChatMessage], **kwargs: Any) -> ChatResponseGen:
+        return self._observed(self._stream_chat(messages, kwargs))
+
+    @llm_chat_callback()
+    async def achat(self, messages: Sequence[ChatMessage], **kwargs: Any) -> ChatResponse:
+        return await asyncio.to_thread(self._chat, messages, kwargs)
+
+    @llm_chat_callback()
+    async def astream_chat(
+        self, messages: Sequence[ChatMessage], **kwargs: Any
+    ) -> ChatResponseAsyncGen:
+        return _aiterate(self._observed(self._stream_chat(messages, kwargs)))
+
+    @llm_completion_callback()
+    def complete(self, prompt: str, formatted: bool = False, **kwargs: Any) -> CompletionResponse:
+        return self._complete(prompt, kwargs)
+
+    @llm_completion_callback()
+    def stream_complete(
+        self, prompt: str, formatted: bool = False, **kwargs: Any
+    ) -> CompletionResponseGen:
+        return self._observed(self._stream_complete(prompt, kwargs))
+
+    @llm_completion_callback()
+    async def acomplete(
+        self, prompt: str, formatted: bool = False, **kwargs: Any
+    ) -> CompletionResponse:
+        return await asyncio.to_thread(self._complete, prompt, kwargs)
+
+    @llm_completion_callback()
+    async def astream_complete(
+        self, prompt: str, formatted: bool = False, **kwargs: Any
+    ) -> CompletionResponseAsyncGen:
+        return _aiterate(self._observed(self._stream_complete(prompt, kwargs)))
+
+
 class LocalRAGModel:
     def __init__(self) -> None:
         pass
@@ -19,6 +221,8 @@ class LocalRAGModel:
     ):
         setting = setting or RAGSettings()
         if model_name in ["gpt-3.5-turbo", "gpt-4", "gpt-4o", "gpt-4-turbo"]:
+            from llama_index.llms.openai import OpenAI
+
             return OpenAI(model=model_name, temperature=setting.ollama.temperature)
         else:
             settings_kwargs = {
@@ -28,53 +232,38 @@ class LocalRAGModel:
                 "repeat_last_n": setting.ollama.repeat_last_n,
                 "repeat_penalty": setting.ollama.repeat_penalty,
             }
-            return Ollama(
+            client = OllamaBalancer.get(setting)
+            llm = LocalOllama(
                 model=model_name,
                 system_prompt=system_prompt,
-                base_url=f"http://localhost:{setting.ollama.port}",
+                base_url=client.base_url,
                 temperature=setting.ollama.temperature,
                 context_window=setting.ollama.context_window,
                 request_timeout=setting.ollama.request_timeout,
                 additional_kwargs=settings_kwargs,
+                keep_alive=setting.ollama.keep_alive,
             )
+            llm._client = client
+            return llm
 
     @staticmethod
-    def pull(model_name: str):
-        setting = RAGSettings()
-        payload = {"name": model_name}
-        return requests.post(
-            f"http://localhost:{setting.ollama.port}/api/pull", json=payload, stream=True
-        )
+    def load(model_name: str, setting: RAGSettings | None = None) -> None:
+        """Ask Ollama to load the model now instead of on the first request."""
+        setting = setting or RAGSettings()
+        OllamaBalancer.get(setting).load(model_name, keep_alive=setting.ollama.keep_alive)
+
+    @staticmethod
+    def pull(model_name: str, setting: RAGSettings | None = None):
+        return OllamaBalancer.get(setting).pull(model_name)
 
     @staticmethod
-    def get_installed_models() -> list[str]:
-        setting = RAGSettings()
+    def get_installed_models(setting: RAGSettings | None = None) -> list[str]:
         try:
-            response = requests.get(f"http://localhost:{setting.ollama.port}/api/tags")
-            if response.status_code == 200:
-                data = response.json()
-                if data["models"] is not None:
-                    return [d["name"] for d in data["models"]]
+            return OllamaBalancer.get(setting).list_models()
         except Exception:
-            pass
-        return []
+            return []
 
     # ------------------------------------------------------------------------------
     @staticmethod
-    def check_model_exist(model_name: str) -> bool:
-        setting = RAGSettings()
-        data = requests.get(f"http://localhost:{setting.ollama.port}/api/tags").json()
-        if data["models"] is None:
-            return False
-        list_model = [d["name"] for d in data["models"]]
-        
-        # Check exact match first
-        if model_name in list_model:
-            return True
-        
-        # Check if model_name matches without tag (e.g., "phi4-mini" matches "phi4-mini:latest")
-        for model in list_model:
-            if model.startswith(model_name + ":"):
-                return True
-        
-        return False
+    def check_model_exist(model_name: str, setting: RAGSettings | None = None) -> bool:
+        return OllamaBalancer.get(setting).has_model(model_name)
@@ -1,9 +1,12 @@
 from llama_index.core import VectorStoreIndex
 from dotenv import load_dotenv
+from ..metrics import REGISTRY
 from ...setting import RAGSettings
 
 load_dotenv()
 
+INDEX_SIZE = REGISTRY.gauge("rag_index_nodes", "Embedded chunks per topic", ["topic"])
+
 
 # ------------------------------------------------------------------------------
 class LocalVectorStore:
@@ -28,12 +31,21 @@ class LocalVectorStore:
     self._collection = self._client.get_or_create_collection(
       name=self._current_topic
     )
+    INDEX_SIZE.set_function(self.get_topic_sizes)
 
   # ----------------------------------------------------------------------------
   def get_topics(self) -> list[str]:
     """List all available collections (topics) in ChromaDB."""
     return [c.name for c in self._client.list_collections()]
 
+  # ----------------------------------------------------------------------------
+  def get_topic_sizes(self) -> dict[tuple, int]:
+    """Number of embedded chunks per collection (topic)."""
+    client = self._client
+    if client is None:
+      return {}
+    return {(c.name,): c.count() for c in client.list_collections()}
+
   # ----------------------------------------------------------------------------
   def change_topic(self, topicName: str):
     """Switch to a different collection."""
@@ -52,6 +64,26 @@ class LocalVectorStore:
       return baseDir
     return os.path.join(baseDir, self._current_topic)
 
+  # ----------------------------------------------------------------------------
+  def get_nodes(self, node_ids: list[str], batch_size: int = 500) -> list:
+    """Nodes of the current topic by id, with text, metadata and embedding."""
+    from llama_index.core.vector_stores.utils import metadata_dict_to_node
+
+    nodesById = {}
+    for i in range(0, len(node_ids), batch_size):
+      result = self._collection.get(
+        ids=list(node_ids[i : i + batch_size]),
+        include=["documents", "metadatas", "embeddings"],
+      )
+      for nodeId, text, metadata, embedding in zip(
+        result["ids"], result["documents"], result["metadatas"], result["embeddings"]
+      ):
+        node = metadata_dict_to_node(metadata)
+        node.set_content(text)
+        node.embedding = list(embedding)
+        nodesById[nodeId] = node
+    return [nodesById[i] for i in node_ids if i in nodesById]
+
   # ----------------------------------------------------------------------------
   def get_index(self, nodes=None):
     from llama_index.vector_stores.chroma import ChromaVectorStore
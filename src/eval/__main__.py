@@ -1,13 +1,20 @@
 import asyncio
 import json
 import argparse
+import os
+import time
 import pandas as pd
+from typing import List
 from dotenv import load_dotenv
-from tqdm.asyncio import tqdm_asyncio
-from llama_index.core import VectorStoreIndex, Settings
-from llama_index.core.retrievers import VectorIndexRetriever
-from llama_index.retrievers.bm25 import BM25Retriever
-from llama_index.core.postprocessor import SentenceTransformerRerank
+from tqdm import tqdm
+from llama_index.core import (
+    Settings,
+    StorageContext,
+    VectorStoreIndex,
+    load_index_from_storage,
+)
+from llama_index.core.retrievers import BaseRetriever, VectorIndexRetriever
+from llama_index.core.schema import NodeWithScore, QueryBundle
 from llama_index.core.evaluation import (
     RetrieverEvaluator,
     FaithfulnessEvaluator,
@@ -15,15 +22,32 @@ from llama_index.core.evaluation import (
     ContextRelevancyEvaluator,
 )
 from llama_index.core.evaluation import EmbeddingQAFinetuneDataset
+from llama_index.core.evaluation.retrieval.base import RetrievalEvalMode
 from llama_index.core.storage.docstore import DocumentStore
-from ..core.engine import LocalChatEngine, LocalRetriever
+from ..core.engine import LocalChatEngine, LocalRetriever, get_reranker
+from ..core.embedding import LocalEmbedding
 from ..core.model import LocalRAGModel
+from .qa_generator import EMBEDDING_INFO_FILE
+from .benchmark import PeakRSS, latency_summary
+from .rate_limit import AdaptiveLimiter
 from ..setting import RAGSettings
-from ..ollama import is_port_open, run_ollama_server
+from ..ollama import run_ollama_servers
 
 load_dotenv()
 
 
+class TopKRetriever(BaseRetriever):
+    """First `top_k` results of another retriever, so one BM25 index serves several k."""
+
+    def __init__(self, retriever: BaseRetriever, top_k: int) -> None:
+        super().__init__()
+        self._retriever = retriever
+        self._top_k = top_k
+
+    def _retrieve(self, query_bundle: QueryBundle) -> List[NodeWithScore]:
+        return self._retriever.retrieve(query_bundle)[: self._top_k]
+
+
 class RAGPipelineEvaluator:
     def __init__(
         self,
@@ -31,8 +55,15 @@ class RAGPipelineEvaluator:
         teacher: str | None = None,
         dataset_path: str = "val_dataset/dataset.json",
         docstore_path: str = "val_dataset/docstore.json",
+        workers: int = 8,
+        embed_model: str | None = None,
+        cache_index: bool = False,
     ) -> None:
         self._setting = RAGSettings()
+        self._setting.ingestion.embed_llm = embed_model or self._setting.ingestion.embed_llm
+        self._workers = max(1, workers)
+        self._llm_name = llm
+        self._dataset_path = dataset_path
         if llm not in ["gpt-3.5-turbo", "gpt-4", "gpt-4o", "gpt-4-turbo"]:
             print("Pulling LLM model")
             LocalRAGModel.pull(model_name=llm)
@@ -41,31 +72,30 @@ class RAGPipelineEvaluator:
         self._teacher = LocalRAGModel.set(model_name=teacher)
         self._engine = LocalChatEngine()
         Settings.llm = self._llm
-        # Settings.embed_model = LocalEmbedding.set()
+        # queries have to be embedded by the model the docstore was embedded with
+        Settings.embed_model = LocalEmbedding.set(self._setting)
 
         # dataset
-        docstore = DocumentStore.from_persist_path(docstore_path)
-        nodes = list(docstore.docs.values())
-        self._index = VectorStoreIndex(nodes=nodes)
+        self._index, nodes = self._load_index(docstore_path, cache_index)
         self._dataset = EmbeddingQAFinetuneDataset.from_json(dataset_path)
         self._top_k = self._setting.retriever.similarity_top_k
         self._top_k_rerank = self._setting.retriever.top_k_rerank
 
+        # index, BM25 and reranker are built once and shared by all configurations
+        local_retriever = LocalRetriever(self._setting)
+        bm25 = local_retriever.get_bm25_retriever(self._index)
+        self._reranker = get_reranker(self._setting, top_n=self._top_k_rerank)
         self._retriever = {
             "base": VectorIndexRetriever(
                 index=self._index, similarity_top_k=self._top_k_rerank, verbose=True
             ),
-            "bm25": BM25Retriever.from_defaults(
-                index=self._index, similarity_top_k=self._top_k_rerank, verbose=True
-            ),
+            "bm25": TopKRetriever(bm25, self._top_k_rerank),
             "base_rerank": VectorIndexRetriever(
                 index=self._index, similarity_top_k=self._top_k, verbose=True
             ),
-            "bm25_rerank": BM25Retriever.from_defaults(
-                index=self._index, similarity_top_k=self._top_k, verbose=True
-            ),
-            "router": LocalRetriever().get_retrievers(
-                llm=self._llm, nodes=nodes
+            "bm25_rerank": bm25,
+            "router": local_retriever.get_retrievers(
+                llm=self._llm, nodes=nodes, vector_index=self._index, bm25_retriever=bm25
             ),
         }
 
@@ -79,22 +109,12 @@ class RAGPipelineEvaluator:
             "base_rerank": RetrieverEvaluator.from_metric_names(
                 ["mrr", "hit_rate"],
                 retriever=self._retriever["base_rerank"],
-                node_postprocessors=[
-                    SentenceTransformerRerank(
-                        top_n=self._top_k_rerank,
-                        model=self._setting.retriever.rerank_llm,
-                    )
-                ],
+                node_postprocessors=[self._reranker],
             ),
             "bm25_rerank": RetrieverEvaluator.from_metric_names(
                 ["mrr", "hit_rate"],
                 retriever=self._retriever["bm25_rerank"],
-                node_postprocessors=[
-                    SentenceTransformerRerank(
-                        top_n=self._top_k_rerank,
-                        model=self._setting.retriever.rerank_llm,
-                    )
-                ],
+                node_postprocessors=[self._reranker],
             ),
             "router": RetrieverEvaluator.from_metric_names(
                 ["mrr", "hit_rate"], retriever=self._retriever["router"]
@@ -111,65 +131,292 @@ class RAGPipelineEvaluator:
             "context_relevancy": ContextRelevancyEvaluator(llm=self._teacher),
         }
 
+    def _load_index(self, docstore_path: str, cache_index: bool = False):
+        """Index over the docstore nodes, reusing the embeddings stored with them.
+
+        With `cache_index`, the built index is persisted next to the docstore
+        and loaded from there while docstore and embedding model are unchanged.
+        """
+        stat = os.stat(docstore_path)
+        fingerprint = {
+            "docstore_size": stat.st_size,
+            "docstore_mtime": stat.st_mtime,
+            "embed_model": self._setting.ingestion.embed_llm,
+        }
+        cache_dir = os.path.join(os.path.dirname(docstore_path) or ".", "eval_index")
+        fingerprint_path = os.path.join(cache_dir, "fingerprint.json")
+        if cache_index and os.path.exists(fingerprint_path):
+            with open(fingerprint_path, "r", encoding="utf-8") as f:
+                if json.load(f) == fingerprint:
+                    print(f"Loading cached eval index from {cache_dir}")
+                    index = load_index_from_storage(
+                        StorageContext.from_defaults(persist_dir=cache_dir)
+                    )
+                    return index, list(index.docstore.docs.values())
+
+        docstore = DocumentStore.from_persist_path(docstore_path)
+        nodes = list(docstore.docs.values())
+        self._check_embeddings(nodes, docstore_path)
+        # nodes that carry an embedding are not embedded again
+        index = VectorStoreIndex(nodes=nodes, show_progress=True)
+        if cache_index:
+            index.storage_context.persist(persist_dir=cache_dir)
+            with open(fingerprint_path, "w", encoding="utf-8") as f:
+                json.dump(fingerprint, f)
+            print(f"Cached eval index in {cache_dir}")
+        return index, nodes
+
+    def _check_embeddings(self, nodes, docstore_path: str) -> None:
+        """Refuse stored embeddings of another model, their scores would be meaningless."""
+        configured = self._setting.ingestion.embed_llm
+        info_path = os.path.join(os.path.dirname(docstore_path) or ".", EMBEDDING_INFO_FILE)
+        if os.path.exists(info_path):
+            with open(info_path, "r", encoding="utf-8") as f:
+                stored_model = json.load(f).get("model")
+            if stored_model and stored_model != configured:
+                raise ValueError(
+                    f"{docstore_path} was embedded with '{stored_model}' but the embedding "
+                    f"model is '{configured}', use --embed {stored_model}"
+                )
+        embedded = [n for n in nodes if n.embedding]
+        if embedded:
+            dim = len(Settings.embed_model.get_query_embedding("dimension check"))
+            stored_dims = {len(n.embedding) for n in embedded}
+            if stored_dims != {dim}:
+                raise ValueError(
+                    f"{docstore_path} holds embeddings of size {sorted(stored_dims)}, "
+                    f"'{configured}' produces {dim}"
+                )
+        missing = len(nodes) - len(embedded)
+        if missing:
+            print(f"{missing} of {len(nodes)} nodes have no stored embedding, embedding them now")
+
     async def eval_retriever(self):
-        result = {}
-        for retriever_name in self._retriever_evaluator.keys():
-            print(f"Running {retriever_name} retriever")
-            result[retriever_name] = self._process_retriever_result(
-                retriever_name,
-                await self._retriever_evaluator[retriever_name].aevaluate_dataset(
-                    self._dataset, show_progress=True
-                ),
+        """Evaluate all configurations at once, at most `workers` queries in flight.
+
+        The retrievers and the reranker are synchronous, so every query runs in
+        a worker thread. Results are collected in dataset order per
+        configuration, the metrics are the same as a sequential run.
+        """
+        semaphore = asyncio.Semaphore(self._workers)
+        mode = RetrievalEvalMode.from_str(self._dataset.mode)
+        items = [
+            (query, self._dataset.relevant_docs[query_id])
+            for query_id, query in self._dataset.queries.items()
+        ]
+        progress = tqdm(total=len(items) * len(self._retriever_evaluator), desc="retrievers")
+
+        async def evaluate(name, query, expected_ids):
+            async with semaphore:
+                eval_result = await asyncio.to_thread(
+                    self._retriever_evaluator[name].evaluate,
+                    query,
+                    expected_ids=expected_ids,
+                    mode=mode,
+                )
+            progress.update(1)
+            return eval_result
+
+        async def evaluate_retriever(name):
+            return await asyncio.gather(
+                *[evaluate(name, query, expected_ids) for query, expected_ids in items]
             )
-        return result
 
-    async def _query_with_delay(self, query_engine, q, delay):
-        await asyncio.sleep(delay)
-        return await query_engine.aquery(q)
+        names = list(self._retriever_evaluator.keys())
+        print(f"Running {', '.join(names)} retrievers with {self._workers} workers")
+        try:
+            eval_results = await asyncio.gather(*[evaluate_retriever(n) for n in names])
+        finally:
+            progress.close()
+        return {
+            name: self._process_retriever_result(name, results)
+            for name, results in zip(names, eval_results)
+        }
+
+    async def _timed_evaluate(self, name, items, concurrency, mode):
+        """Evaluate `items` with `concurrency` queries in flight.
+
+        Returns the results in dataset order, the latency of each query
+        (measured in its worker thread, without queueing) and the wall time.
+        """
+        semaphore = asyncio.Semaphore(concurrency)
+        evaluator = self._retriever_evaluator[name]
+
+        def timed(query, expected_ids):
+            start = time.perf_counter()
+            eval_result = evaluator.evaluate(query, expected_ids=expected_ids, mode=mode)
+            return eval_result, time.perf_counter() - start
+
+        async def evaluate(query, expected_ids):
+            async with semaphore:
+                return await asyncio.to_thread(timed, query, expected_ids)
+
+        start = time.perf_counter()
+        timed_results = await asyncio.gather(
+            *[evaluate(query, expected_ids) for query, expected_ids in items]
+        )
+        wall = time.perf_counter() - start
+        return [r for r, _ in timed_results], [t for _, t in timed_results], wall
+
+    async def benchmark_retriever(
+        self, concurrency: tuple[int, ...] = (1, 4, 8), max_queries: int | None = None
+    ):
+        """Latency, throughput and peak memory of every retriever configuration,
+        next to its hit rate and MRR.
+
+        Configurations run one after another so their timings and memory do not
+        mix. Latency percentiles are those of the first concurrency level.
+        """
+        mode = RetrievalEvalMode.from_str(self._dataset.mode)
+        items = [
+            (query, self._dataset.relevant_docs[query_id])
+            for query_id, query in self._dataset.queries.items()
+        ][:max_queries]
+        report = {
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "dataset": self._dataset_path,
+            "queries": len(items),
+            "concurrency": list(concurrency),
+            "llm": self._llm_name,
+            "embed_model": self._setting.ingestion.embed_llm,
+            "rerank_model": self._setting.retriever.rerank_llm,
+            "similarity_top_k": self._top_k,
+            "top_k_rerank": self._top_k_rerank,
+            "retrievers": {},
+        }
+        for name in self._retriever_evaluator.keys():
+            print(f"Benchmarking {name} retriever")
+            # load models and warm caches outside of the measurement
+            await self._timed_evaluate(name, items[:1], 1, mode)
+            levels = []
+            quality = None
+            with PeakRSS() as rss:
+                for level in concurrency:
+                    results, latencies, wall = await self._timed_evaluate(
+                        name, items, level, mode
+                    )
+                    if quality is None:
+                        quality = self._process_retriever_result(name, results)
+                    levels.append(
+                        {
+                            "concurrency": level,
+                            "qps": round(len(items) / wall, 3) if wall > 0 else None,
+                            **latency_summary(latencies),
+                        }
+                    )
+            report["retrievers"][name] = {
+                "hit_rate": quality["hit_rate"],
+                "mrr": quality["mrr"],
+                **{k: v for k, v in levels[0].items() if k.endswith("_ms")},
+                "peak_rss_mb": rss.peak_mb,
+                "levels": levels,
+            }
+        return report
+
+    def benchmark_table(self, report) -> pd.DataFrame:
+        """One row per retriever: quality, latency, QPS per concurrency level, memory."""
+        rows = []
+        for name, r in report["retrievers"].items():
+            row = {
+                "retriever": name,
+                "hit_rate": r["hit_rate"],
+                "mrr": r["mrr"],
+                "p50_ms": r["p50_ms"],
+                "p95_ms": r["p95_ms"],
+                "p99_ms": r["p99_ms"],
+            }
+            for level in r["levels"]:
+                row[f"qps@{level['concurrency']}"] = level["qps"]
+            row["peak_rss_mb"] = r["peak_rss_mb"]
+            rows.append(row)
+        return pd.DataFrame(rows)
 
-    async def eval_generator(self):
-        queries = list(self._dataset.queries.values())[:3]
-        context = list(self._dataset.corpus.values())[:3]
+    async def eval_generator(
+        self,
+        max_queries: int | None = None,
+        rate: float | None = None,
+        timeout: float | None = None,
+    ):
+        """Answer every dataset query and judge it, one pipeline per query.
+
+        Generation and each judge run through their own adaptive limiter, so a
+        fast backend is kept busy and a slow or failing one is backed off from
+        instead of being paced by fixed sleeps. A bounded pool of workers takes
+        the queries from a queue, only as many pipelines as can make progress
+        exist at a time.
+        """
+        query_ids = list(self._dataset.queries)[:max_queries]
         query_engine = self._index.as_query_engine(
             llm=self._llm,
         )
-        response = []
-        for i in range(0, len(queries), 10):
-            print(f"Running queries {i} to {i+10}")
-            task = [query_engine.aquery(q) for q in queries[i : i + 10]]
-            response += await tqdm_asyncio.gather(*task, desc="querying")
-            await asyncio.sleep(5)
-
-        response = [str(r) for r in response]
-
-        faithful_task = []
-        answer_relevancy_task = []
-        context_relevancy_task = []
-        for q, r, c in zip(queries, response, context):
-            faithful_task.append(
-                self._generator_evaluator["faithfulness"].aevaluate(
-                    response=r, contexts=[c]
-                )
-            )
-            answer_relevancy_task.append(
-                self._generator_evaluator["answer_relevancy"].aevaluate(
-                    query=q, response=r
-                )
-            )
-            context_relevancy_task.append(
-                self._generator_evaluator["context_relevancy"].aevaluate(
-                    query=q, contexts=[c]
-                )
+        generation = AdaptiveLimiter(
+            "generation", max_concurrency=self._workers, rate=rate, timeout=timeout
+        )
+        # the judges ask different questions with different latencies, one limiter each
+        judges = {
+            name: AdaptiveLimiter(name, max_concurrency=self._workers, rate=rate, timeout=timeout)
+            for name in ("faithfulness", "answer_relevancy", "context_relevancy")
+        }
+
+        async def evaluate(query_id):
+            query = self._dataset.queries[query_id]
+            # judged against the chunks the question was generated from
+            contexts = [
+                self._dataset.corpus[node_id]
+                for node_id in self._dataset.relevant_docs.get(query_id, [])
+            ]
+            response = str(await generation.run(lambda: query_engine.aquery(query)))
+            return await asyncio.gather(
+                judges["faithfulness"].run(
+                    lambda: self._generator_evaluator["faithfulness"].aevaluate(
+                        response=response, contexts=contexts
+                    )
+                ),
+                judges["answer_relevancy"].run(
+                    lambda: self._generator_evaluator["answer_relevancy"].aevaluate(
+                        query=query, response=response
+                    )
+                ),
+                judges["context_relevancy"].run(
+                    lambda: self._generator_evaluator["context_relevancy"].aevaluate(
+                        query=query, contexts=contexts
+                    )
+                ),
             )
 
-        faithful_result = await tqdm_asyncio.gather(*faithful_task, desc="faithfulness")
-        answer_relevancy_result = await tqdm_asyncio.gather(
-            *answer_relevancy_task, desc="answer_relevancy"
-        )
-        context_relevancy_result = await tqdm_asyncio.gather(
-            *context_relevancy_task, desc="context_relevancy"
+        queue = asyncio.Queue()
+        for index, query_id in enumerate(query_ids):
+            queue.put_nowait((index, query_id))
+        results = [None] * len(query_ids)
+        progress = tqdm(total=len(query_ids), desc="generator")
+
+        async def worker():
+            while not queue.empty():
+                index, query_id = queue.get_nowait()
+                try:
+                    results[index] = await evaluate(query_id)
+                except Exception as e:
+                    print(f"Query {query_id} failed: {type(e).__name__}: {e}")
+                progress.update(1)
+
+        # enough pipelines to fill generation and the judges while others wait
+        start = time.perf_counter()
+        try:
+            await asyncio.gather(*[worker() for _ in range(2 * self._workers)])
+        finally:
+            progress.close()
+        elapsed = time.perf_counter() - start
+        results = [r for r in results if r is not None]
+        faithful_result, answer_relevancy_result, context_relevancy_result = (
+            [list(r) for r in zip(*results)] if results else ([], [], [])
         )
 
+        judge_stats = {name: judge.stats() for name, judge in judges.items()}
+        print(f"Evaluated {len(results)}/{len(query_ids)} queries in {elapsed:.1f}s")
+        for name, stats in judge_stats.items():
+            print(
+                f"  {name}: {stats['calls_per_s']} calls/s at concurrency <= {stats['peak_limit']}"
+            )
         return {
             "faithfulness": self._process_generator_result(
                 "faithfulness", faithful_result
@@ -180,6 +427,14 @@ class RAGPipelineEvaluator:
             "context_relevancy": self._process_generator_result(
                 "context_relevancy", context_relevancy_result
             ),
+            "throughput": {
+                "queries": len(query_ids),
+                "failed": len(query_ids) - len(results),
+                "elapsed_s": round(elapsed, 3),
+                "queries_per_s": round(len(results) / elapsed, 3) if elapsed else None,
+                "generation": generation.stats(),
+                "judges": judge_stats,
+            },
         }
 
     def _process_retriever_result(self, name, eval_results):
@@ -212,8 +467,8 @@ if __name__ == "__main__":
         "--type",
         type=str,
         default="retriever",
-        choices=["retriever", "generator"],
-        help="Set type to retriever or generator",
+        choices=["retriever", "generator", "benchmark"],
+        help="Set type to retriever, generator or benchmark (retriever speed and quality)",
     )
     parser.add_argument(
         "--llm",
@@ -239,22 +494,65 @@ if __name__ == "__main__":
         default="harry_potter_dataset/docstore.json",
         help="Set docstore path",
     )
+    parser.add_argument(
+        "--embed",
+        type=str,
+        default=None,
+        help="Embedding model the docstore was embedded with (default: setting)",
+    )
+    parser.add_argument(
+        "--cache-index",
+        action="store_true",
+        help="Keep the built eval index next to the docstore and reuse it",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=8,
+        help="Max retriever queries evaluated, or generator/judge calls in flight, at the same time",
+    )
+    parser.add_argument(
+        "--concurrency",
+        type=str,
+        default="1,4,8",
+        help="Benchmark: comma separated concurrency levels to measure QPS at",
+    )
+    parser.add_argument(
+        "--max-queries",
+        type=int,
+        default=None,
+        help="Benchmark and generator: only use the first N dataset queries",
+    )
+    parser.add_argument(
+        "--rate",
+        type=float,
+        default=None,
+        help="Generator: max LLM calls started per second per backend (default: no cap)",
+    )
+    parser.add_argument(
+        "--timeout",
+        type=float,
+        default=None,
+        help="Generator: seconds before an LLM call counts as failed (default: no limit)",
+    )
     args = parser.parse_args()
     
-    port_number = 11434
-    if not is_port_open(port_number) and args.llm not in [
+    if args.llm not in [
         "gpt-3.5-turbo",
         "gpt-4",
         "gpt-4o",
         "gpt-4-turbo",
     ]:
-        run_ollama_server()
+        run_ollama_servers()
         
     evaluator = RAGPipelineEvaluator(
         llm=args.llm,
         teacher=args.teacher,
         dataset_path=args.dataset,
         docstore_path=args.docstore,
+        workers=args.workers,
+        embed_model=args.embed,
+        cache_index=args.cache_index,
     )
 
     async def eval_retriever():
@@ -265,12 +563,23 @@ if __name__ == "__main__":
             json.dump(retriever_result, f)
 
     async def eval_generator():
-        generator_result = await evaluator.eval_generator()
+        generator_result = await evaluator.eval_generator(
+            args.max_queries, args.rate, args.timeout
+        )
         # save results
         with open(f"generator_result_{args.llm}.json", "w", encoding="utf-8") as f:
             json.dump(generator_result, f)
 
+    async def benchmark():
+        concurrency = [int(c) for c in args.concurrency.split(",") if c.strip()]
+        report = await evaluator.benchmark_retriever(concurrency, args.max_queries)
+        print(evaluator.benchmark_table(report).to_string(index=False))
+        with open("benchmark_result.json", "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
     if args.type == "retriever":
         asyncio.run(eval_retriever())
+    elif args.type == "benchmark":
+        asyncio.run(benchmark())
     else:
         asyncio.run(eval_generator())
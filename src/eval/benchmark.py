@@ -0,0 +1,67 @@
+import math
+import os
+import threading
+
+try:
+    import psutil
+except ImportError:  # memory is not reported then
+    psutil = None
+
+
+def percentile(values: list[float], q: float) -> float | None:
+    """q-th percentile (0-100) with linear interpolation between ranks."""
+    if not values:
+        return None
+    values = sorted(values)
+    rank = (len(values) - 1) * q / 100
+    low, high = math.floor(rank), math.ceil(rank)
+    return values[low] + (values[high] - values[low]) * (rank - low)
+
+
+def latency_summary(latencies_s: list[float]) -> dict[str, float | None]:
+    ms = [latency * 1000 for latency in latencies_s]
+    return {
+        "p50_ms": _round(percentile(ms, 50)),
+        "p95_ms": _round(percentile(ms, 95)),
+        "p99_ms": _round(percentile(ms, 99)),
+        "mean_ms": _round(sum(ms) / len(ms)) if ms else None,
+    }
+
+
+def _round(value: float | None) -> float | None:
+    return round(value, 3) if value is not None else None
+
+
+class PeakRSS:
+    """Peak resident memory of this process while the block runs.
+
+    The RSS is sampled with psutil every `interval` seconds. `peak_mb` stays
+    None without psutil: the OS only keeps the peak since process start,
+    which says nothing about the block.
+    """
+
+    def __init__(self, interval: float = 0.05) -> None:
+        self._interval = interval
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+        self.peak_mb: float | None = None
+
+    def __enter__(self) -> "PeakRSS":
+        if psutil is not None:
+            process = psutil.Process(os.getpid())
+            self._peak = process.memory_info().rss
+            self._thread = threading.Thread(
+                target=self._sample, args=(process,), daemon=True
+            )
+            self._thread.start()
+        return self
+
+    def _sample(self, process) -> None:
+        while not self._stop.wait(self._interval):
+            self._peak = max(self._peak, process.memory_info().rss)
+
+    def __exit__(self, *exc) -> None:
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join()
+            self.peak_mb = round(self._peak / 2**20, 1)
@@ -1,9 +1,12 @@
+import asyncio
+import hashlib
+import json
 import random
 import re
 import os
 import uuid
 from typing import List
-from tqdm import tqdm
+from tqdm.asyncio import tqdm_asyncio
 from llama_index.core.llms.utils import LLM
 from llama_index.core.schema import MetadataMode, TextNode
 from llama_index.core.storage.docstore import DocumentStore
@@ -13,6 +16,9 @@ from ..core.embedding import LocalEmbedding
 from ..core.ingestion import LocalDataIngestion
 from ..setting import RAGSettings
 
+# written next to docstore.json, the evaluator checks it against its embedding model
+EMBEDDING_INFO_FILE = "embedding.json"
+
 
 DEFAULT_QA_GENERATE_PROMPT_TMPL = """\
 Context information is below.
@@ -32,35 +38,114 @@ Only provide the questions, not the answers.\"
 """
 
 
-# generate queries as a convenience function
-def generate_question_context_pairs(
+def _checkpoint_header(
+    llm: LLM, qa_generate_prompt_tmpl: str, num_questions_per_chunk: int
+) -> dict:
+    """What the questions depend on, a checkpoint made with anything else is not resumed."""
+    return {
+        "num_questions_per_chunk": num_questions_per_chunk,
+        "llm": llm.metadata.model_name,
+        "prompt_sha256": hashlib.sha256(qa_generate_prompt_tmpl.encode("utf-8")).hexdigest(),
+    }
+
+
+def _load_checkpoint(path: str, header: dict) -> dict[str, list[str]]:
+    """Questions per node id of an earlier, interrupted run."""
+    done = {}
+    if not os.path.exists(path):
+        return done
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                # the last line of a crashed run may be cut off
+                continue
+            if "num_questions_per_chunk" in record:
+                if record != header:
+                    print(f"Checkpoint {path} was made with other settings, starting over")
+                    return {}
+                continue
+            done[record["node_id"]] = record["questions"]
+    return done
+
+
+async def agenerate_question_context_pairs(
     nodes: List[TextNode],
     llm: LLM,
     qa_generate_prompt_tmpl: str = DEFAULT_QA_GENERATE_PROMPT_TMPL,
     num_questions_per_chunk: int = 2,
+    workers: int = 4,
+    checkpoint_path: str | None = None,
 ) -> EmbeddingQAFinetuneDataset:
-    """Generate examples given a set of nodes."""
+    """Generate examples given a set of nodes, at most `workers` LLM calls at a time.
+
+    With `checkpoint_path`, the questions of every node are appended to that
+    JSONL file as soon as they are generated, and nodes found there are
+    skipped. Question ids are derived from the node id, so a resumed run
+    yields the same dataset as an uninterrupted one. Nodes whose generation
+    failed are left out of the dataset and tried again on resume.
+    """
     node_dict = {
         node.node_id: node.get_content(metadata_mode=MetadataMode.NONE)
         for node in nodes
     }
 
-    queries = {}
-    relevant_docs = {}
-    for node_id, text in tqdm(node_dict.items()):
+    done = {}
+    failed = []
+    checkpoint = None
+    if checkpoint_path:
+        header = _checkpoint_header(llm, qa_generate_prompt_tmpl, num_questions_per_chunk)
+        done = _load_checkpoint(checkpoint_path, header)
+        if done:
+            print(f"Resuming from {checkpoint_path}: {len(done)} nodes already done")
+        checkpoint = open(checkpoint_path, "a" if done else "w", encoding="utf-8")
+        if not done:
+            checkpoint.write(json.dumps(header) + "\n")
+            checkpoint.flush()
+
+    semaphore = asyncio.Semaphore(max(1, workers))
+
+    async def generate(node_id: str, text: str):
         query = qa_generate_prompt_tmpl.format(
             context_str=text, num_questions_per_chunk=num_questions_per_chunk
         )
-        response = llm.complete(query)
+        async with semaphore:
+            try:
+                response = await llm.acomplete(query)
+            except Exception as e:
+                # not checkpointed, so the node is tried again on resume
+                print(f"Generating questions for node {node_id} failed: {e}")
+                failed.append(node_id)
+                return
 
         result = str(response).strip().split("\n")
         questions = [
             re.sub(r"^\d+[\).\s]", "", question).strip() for question in result
         ]
         questions = [question for question in questions if len(question) > 0]
+        done[node_id] = questions
+        if checkpoint is not None:
+            checkpoint.write(json.dumps({"node_id": node_id, "questions": questions}) + "\n")
+            checkpoint.flush()
+
+    try:
+        await tqdm_asyncio.gather(
+            *[generate(node_id, text) for node_id, text in node_dict.items() if node_id not in done],
+            desc="Generating questions",
+        )
+    finally:
+        if checkpoint is not None:
+            checkpoint.close()
+    if failed:
+        print(f"No questions for {len(failed)} of {len(node_dict)} nodes, generating them failed")
 
-        for question in questions:
-            question_id = str(uuid.uuid4())
+    # in node order, independent of the order the answers came in
+    queries = {}
+    relevant_docs = {}
+    for node_id in node_dict:
+        for i, question in enumerate(done.get(node_id, [])):
+            question_id = str(uuid.uuid5(uuid.NAMESPACE_URL, f"{node_id}/{i}"))
             queries[question_id] = question
             relevant_docs[question_id] = [node_id]
 
@@ -70,6 +155,28 @@ def generate_question_context_pairs(
     )
 
 
+# generate queries as a convenience function
+def generate_question_context_pairs(
+    nodes: List[TextNode],
+    llm: LLM,
+    qa_generate_prompt_tmpl: str = DEFAULT_QA_GENERATE_PROMPT_TMPL,
+    num_questions_per_chunk: int = 2,
+    workers: int = 4,
+    checkpoint_path: str | None = None,
+) -> EmbeddingQAFinetuneDataset:
+    """Generate examples given a set of nodes."""
+    return asyncio.run(
+        agenerate_question_context_pairs(
+            nodes,
+            llm,
+            qa_generate_prompt_tmpl,
+            num_questions_per_chunk,
+            workers,
+            checkpoint_path,
+        )
+    )
+
+
 class QAGenerator:
     def __init__(
         self,
@@ -78,6 +185,7 @@ class QAGenerator:
     ) -> None:
         setting = RAGSettings()
         setting.ingestion.embed_llm = embed_model or setting.ingestion.embed_llm
+        self._embed_model_name = setting.ingestion.embed_llm
         self._embed_model = LocalEmbedding.set(setting)
         self._llm = LocalRAGModel.set(model_name=llm or setting.ollama.llm)
         self._ingestion = LocalDataIngestion()
@@ -88,25 +196,67 @@ class QAGenerator:
         output_dir: str = "val_dataset",
         max_nodes: int = 100,
         num_questions_per_chunk=2,
+        workers: int = 4,
+        seed: int | None = 42,
     ) -> None:
+        """Generate `output_dir`/dataset.json from up to `max_nodes` sampled nodes.
+
+        The nodes are saved to docstore.json first and reused by later runs,
+        so with the same `seed` an interrupted run resumes from
+        qa_checkpoint.jsonl with the same sample of nodes.
+        """
         if not os.path.exists(output_dir):
             os.makedirs(output_dir)
 
-        if os.path.exists(os.path.join(output_dir, "docstore.json")):
+        docstore_path = os.path.join(output_dir, "docstore.json")
+        checkpoint_path = os.path.join(output_dir, "qa_checkpoint.jsonl")
+        if os.path.exists(docstore_path):
             print("Docstore already exist! Skip ingestion.")
+            nodes = list(DocumentStore.from_persist_path(docstore_path).docs.values())
+        else:
+            nodes = self._ingestion.store_nodes(
+                input_files, embed_nodes=True, embed_model=self._embed_model
+            )
+            # save nodes, with the model their embeddings came from
+            docstore = DocumentStore()
+            docstore.add_documents(nodes)
+            docstore.persist(persist_path=docstore_path)
+            embedded = [n for n in nodes if n.embedding]
+            with open(os.path.join(output_dir, EMBEDDING_INFO_FILE), "w", encoding="utf-8") as f:
+                json.dump(
+                    {
+                        "model": self._embed_model_name,
+                        "dim": len(embedded[0].embedding) if embedded else None,
+                        "nodes": len(embedded),
+                    },
+                    f,
+                )
+            # new node ids, an old checkpoint does not apply
+            if os.path.exists(checkpoint_path):
+                os.remove(checkpoint_path)
 
-        nodes = self._ingestion.store_nodes(input_files, embed_nodes=True)
-        random.shuffle(nodes)
+        sample = list(nodes)
+        random.Random(seed).shuffle(sample)
+        sample = sample[:max_nodes]
         dataset = generate_question_context_pairs(
-            nodes=nodes[:max_nodes],
+            nodes=sample,
             llm=self._llm,
             num_questions_per_chunk=num_questions_per_chunk,
+            workers=workers,
+            checkpoint_path=checkpoint_path,
+        )
+
+        # the checkpoint holds every node that got its questions
+        header = _checkpoint_header(
+            self._llm, DEFAULT_QA_GENERATE_PROMPT_TMPL, num_questions_per_chunk
         )
+        done = _load_checkpoint(checkpoint_path, header)
+        missing = [node.node_id for node in sample if node.node_id not in done]
+        if missing:
+            raise RuntimeError(
+                f"Questions for {len(missing)} of {len(sample)} nodes are missing, "
+                f"dataset.json was not written; run again to retry them from {checkpoint_path}"
+            )
 
         # save dataset
         dataset.save_json(os.path.join(output_dir, "dataset.json"))
-
-        # save nodes
-        docstore = DocumentStore()
-        docstore.add_documents(nodes)
-        docstore.persist(persist_path=os.path.join(output_dir, "docstore.json"))
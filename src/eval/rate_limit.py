@@ -0,0 +1,158 @@
+import asyncio
+import time
+from contextlib import asynccontextmanager
+from typing import Awaitable, Callable, TypeVar
+
+T = TypeVar("T")
+
+
+class AdaptiveLimiter:
+    """AIMD concurrency limit with an optional token bucket for LLM backends.
+
+    The limit grows by one per window of successful calls and is cut when a
+    call fails or times out (halved), or when `patience` calls in a row take
+    longer than `latency_tolerance` times the usual latency (x0.75). The usual
+    latency is a moving average of successful calls, so it follows a backend
+    that got slower for good instead of cutting forever. A cut only happens
+    once per window: calls that started before the last cut cannot cut again.
+    `rate` caps how many calls start per second on top of that (None for no cap).
+    Use one limiter per kind of call, their latencies are not comparable.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        max_concurrency: int = 8,
+        min_concurrency: int = 1,
+        initial: int | None = None,
+        rate: float | None = None,
+        latency_tolerance: float = 3.0,
+        patience: int = 3,
+        smoothing: float = 0.1,
+        timeout: float | None = None,
+        retries: int = 2,
+        backoff: float = 1.0,
+    ) -> None:
+        self.name = name
+        self._max = max(1, max_concurrency)
+        self._min = max(1, min(min_concurrency, self._max))
+        self._limit = float(min(self._max, max(self._min, initial or self._min)))
+        self._rate = rate if rate and rate > 0 else None
+        self._tokens = 1.0
+        self._refilled = time.monotonic()
+        self._tolerance = latency_tolerance
+        self._patience = max(1, patience)
+        self._smoothing = smoothing
+        self._timeout = timeout
+        self._retries = retries
+        self._backoff = backoff
+        self._in_flight = 0
+        self._epoch = 0
+        self._baseline: float | None = None  # moving average latency of successful calls
+        self._inflated = 0  # successful calls in a row above the tolerance
+        self._condition: asyncio.Condition | None = None
+        # stats
+        self._started: float | None = None
+        self.calls = 0
+        self.errors = 0
+        self.retried = 0
+        self.decreases = 0
+        self.peak_limit = self._limit
+        self.peak_in_flight = 0
+
+    @property
+    def limit(self) -> int:
+        return int(self._limit)
+
+    async def _take_token(self) -> None:
+        while True:
+            now = time.monotonic()
+            self._tokens = min(1.0, self._tokens + (now - self._refilled) * self._rate)
+            self._refilled = now
+            if self._tokens >= 1.0:
+                self._tokens -= 1.0
+                return
+            await asyncio.sleep((1.0 - self._tokens) / self._rate)
+
+    @asynccontextmanager
+    async def slot(self):
+        """One call against the backend, its outcome adjusts the limit."""
+        if self._condition is None:
+            # created lazily, it belongs to the running event loop
+            self._condition = asyncio.Condition()
+        if self._started is None:
+            self._started = time.perf_counter()
+        async with self._condition:
+            await self._condition.wait_for(lambda: self._in_flight < self.limit)
+            self._in_flight += 1
+            self.peak_in_flight = max(self.peak_in_flight, self._in_flight)
+        epoch = self._epoch
+        start = time.perf_counter()
+        failed = True
+        try:
+            if self._rate is not None:
+                await self._take_token()
+            yield
+            failed = False
+        finally:
+            latency = time.perf_counter() - start
+            async with self._condition:
+                self._in_flight -= 1
+                self.calls += 1
+                self._adjust(latency, failed, epoch)
+                self._condition.notify_all()
+
+    def _adjust(self, latency: float, failed: bool, epoch: int) -> None:
+        if failed:
+            self.errors += 1
+            self._decrease(0.5, epoch)
+            return
+        if self._baseline is None:
+            self._baseline = latency
+        inflated = latency > self._baseline * self._tolerance
+        self._baseline += self._smoothing * (latency - self._baseline)
+        if inflated:
+            self._inflated += 1
+            if self._inflated >= self._patience:
+                self._inflated = 0
+                self._decrease(0.75, epoch)
+            return
+        self._inflated = 0
+        self._limit = min(self._max, self._limit + 1.0 / self._limit)
+        self.peak_limit = max(self.peak_limit, self._limit)
+
+    def _decrease(self, factor: float, epoch: int) -> None:
+        if epoch != self._epoch:
+            return
+        self._epoch += 1
+        self._limit = max(self._min, self._limit * factor)
+        self.decreases += 1
+
+    async def run(self, call: Callable[[], Awaitable[T]]) -> T:
+        """Await `call()` in a slot, retried with exponential backoff when it raises or times out."""
+        for attempt in range(self._retries + 1):
+            try:
+                async with self.slot():
+                    return await asyncio.wait_for(call(), self._timeout)
+            except Exception as e:
+                if attempt == self._retries:
+                    raise
+                self.retried += 1
+                delay = self._backoff * 2**attempt
+                print(f"{self.name}: {type(e).__name__}: {e}, retrying in {delay:.1f}s")
+                await asyncio.sleep(delay)
+
+    def stats(self) -> dict:
+        elapsed = time.perf_counter() - self._started if self._started else 0.0
+        return {
+            "calls": self.calls,
+            "errors": self.errors,
+            "retried": self.retried,
+            "elapsed_s": round(elapsed, 3),
+            "calls_per_s": round(self.calls / elapsed, 3) if elapsed else None,
+            "limit": self.limit,
+            "peak_limit": int(self.peak_limit),
+            "peak_in_flight": self.peak_in_flight,
+            "decreases": self.decreases,
+            "baseline_s": round(self._baseline, 3) if self._baseline is not None else None,
+        }
@@ -1,60 +1,170 @@
+import atexit
 import os
+import queue
 import sys
 import re
+import threading
+from collections import deque
 #------------------------------------------------------------------------------
 class Logger:
-    def __init__(self, filename):
+    """Tee of stdout into a log file and a bounded ring of recent lines.
+
+    The file is written by a background thread in batches and rotated at
+    `max_bytes`. Readers never touch the file: `tail(offset)` returns the lines
+    written after `offset`, `read_logs` the last `max_lines` for the UI.
+    """
+
+    _PROGRESS = re.compile(r"\[.*\] \d+\.\d+%")
+    _RESET = object()
+
+    def __init__(
+        self,
+        filename,
+        max_lines: int = 300,
+        max_bytes: int = 50 * 1024 * 1024,
+        backup_count: int = 3,
+        flush_interval: float = 0.5,
+    ):
         self.filename = os.path.join(os.getcwd(), filename)
         self.terminal = sys.stdout
-        self.reset_logs()
-        self.log = open(self.filename, "w", encoding="utf-8")
-        self.flush()
+        self._max_bytes = max_bytes
+        self._backup_count = backup_count
+        self._flush_interval = flush_interval
+        self._lock = threading.Lock()
+        self._lines = deque(maxlen=max_lines)
+        self._next = 0          # offset of the next complete line
+        self._partial = ""      # text after the last newline
+        self._progress = None   # latest progress bar line, replaced on every update
+        self._rendered = (None, "")
+        self._queue = queue.SimpleQueue()
+        self._log = open(self.filename, "w", encoding="utf-8")
+        self._size = 0
+        self._writer = threading.Thread(target=self._write_loop, daemon=True)
+        self._writer.start()
+        atexit.register(self.close)
 
     def write(self, message):
         self.terminal.write(message)
-        self.log.write(message)
+        if not message:
+            return
+        self._queue.put(message)
+        with self._lock:
+            text = self._partial + message
+            *lines, self._partial = text.split("\n")
+            for line in lines:
+                self._add_line(line)
+
+    def _add_line(self, line):
+        # keep what a terminal would show after carriage returns
+        line = line.rsplit("\r", 1)[-1]
+        if "\x00" in line:
+            return
+        if self._PROGRESS.search(line) and " - Completed!" not in line:
+            self._progress = line
+            return
+        # a progress bar is only shown while it is the last line
+        self._progress = None
+        self._lines.append(line)
+        self._next += 1
 
     def flush(self):
         self.terminal.flush()
-        self.log.flush()
 
     def isatty(self):
         return False
 
     def reset_logs(self):
-        with open(self.filename, "w", encoding="utf-8") as file:
-            file.truncate(0)
+        with self._lock:
+            self._lines.clear()
+            self._partial = ""
+            self._progress = None
+            self._rendered = (None, "")
+        self._queue.put(self._RESET)
+
+    def tail(self, offset: int = 0) -> tuple[list[str], int]:
+        """Lines written from `offset` on (older ones may have left the ring), and the next offset.
+
+        A pending progress bar is not part of the lines, see `progress()`.
+        """
+        with self._lock:
+            first = self._next - len(self._lines)
+            start = max(offset, first) - first
+            return list(self._lines)[start:], self._next
+
+    def progress(self) -> str | None:
+        with self._lock:
+            return self._progress
 
     def read_logs(self):
-        sys.stdout.flush()
-
-        # Read the entire content of the log file
-        with open(self.filename, "r", encoding="utf-8") as f:
-            log_content = f.readlines()
-
-        # Filter out lines containing null characters
-        log_content = [line for line in log_content if "\x00" not in line]
-
-        # Define the regex pattern for the progress bar
-        progress_pattern = re.compile(r"\[.*\] \d+\.\d+%")
-
-        # Find lines matching the progress bar pattern
-        progress_lines = [
-            line
-            for line in log_content
-            if progress_pattern.search(line) and " - Completed!\n" not in line
-        ]
-
-        # If there are multiple progress bars, keep only the last one in recent_lines
-        if progress_lines:
-            valid_content = [line for line in log_content if line not in progress_lines]
-            if log_content[-1] == progress_lines[-1]:
-                valid_content.append(progress_lines[-1].strip("\n"))
-        else:
-            valid_content = log_content
-
-        # Get the latest 30 lines
-        recent_lines = valid_content[-300:]
-
-        # Return the joined recent lines
-        return "".join(recent_lines)
+        with self._lock:
+            # the unterminated last line as a terminal shows it, e.g. a "\r" progress bar
+            pending = self._partial.rsplit("\r", 1)[-1].replace("\x00", "")
+            key = (self._next, self._progress, pending)
+            if self._rendered[0] != key:
+                lines = list(self._lines)
+                progress = self._progress
+                if pending and self._PROGRESS.search(pending):
+                    # a newer update of the same bar
+                    progress = None
+                if progress is not None:
+                    lines.append(progress)
+                if pending:
+                    lines.append(pending)
+                self._rendered = (key, "\n".join(lines))
+            return self._rendered[1]
+
+    #--- background writer
+    def _write_loop(self):
+        while True:
+            try:
+                item = self._queue.get(timeout=self._flush_interval)
+            except queue.Empty:
+                self._log.flush()
+                continue
+            batch = [item]
+            # drain whatever is queued, one write per batch
+            while True:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            text = []
+            for item in batch:
+                if item is None:
+                    self._write(text)
+                    self._log.close()
+                    return
+                if item is self._RESET:
+                    text = []
+                    self._log.close()
+                    self._log = open(self.filename, "w", encoding="utf-8")
+                    self._size = 0
+                else:
+                    text.append(item)
+            self._write(text)
+
+    def _write(self, text):
+        if not text:
+            return
+        data = "".join(text)
+        if self._max_bytes and self._size + len(data) > self._max_bytes and self._size:
+            self._rotate()
+        self._log.write(data)
+        self._size += len(data)
+
+    def _rotate(self):
+        self._log.close()
+        for i in range(self._backup_count - 1, 0, -1):
+            source = f"{self.filename}.{i}"
+            if os.path.exists(source):
+                os.replace(source, f"{self.filename}.{i + 1}")
+        if self._backup_count > 0:
+            os.replace(self.filename, f"{self.filename}.1")
+        self._log = open(self.filename, "w", encoding="utf-8")
+        self._size = 0
+
+    def close(self):
+        """Write out everything queued and stop the writer."""
+        if self._writer.is_alive():
+            self._queue.put(None)
+            self._writer.join(timeout=5)
@@ -1,15 +1,21 @@
 import asyncio
+import glob
+import os
+import shutil
 import threading
 import socket
+from urllib.parse import urlsplit
+from .core.client import get_endpoints
+from .setting import RAGSettings
 #------------------------------------------------------------------------------
-def run_ollama_server():
+def run_ollama_server(env: dict[str, str] | None = None, prefix: list[str] | None = None):
     async def run_process(cmd):
-        print(">>> starting", *cmd)
+        print(">>> starting", *cmd, *[f"{k}={v}" for k, v in (env or {}).items()])
         process = await asyncio.create_subprocess_exec(
             *cmd,
             stdout=asyncio.subprocess.PIPE,
             stderr=asyncio.subprocess.PIPE,
-            # env={**os.environ, 'OLLAMA_NUM_PARALLEL': '8', 'OLLAMA_MAX_LOADED_MODELS': '1'}
+            env={**os.environ, **env} if env else None,
         )
         #---
         # define an async pipe function
@@ -26,7 +32,7 @@ def run_ollama_server():
         await asyncio.gather(pipe(process.stdout), pipe(process.stderr))
     #---
     async def start_ollama_serve():
-        await run_process(["ollama", "serve"])
+        await run_process([*(prefix or []), "ollama", "serve"])
     #---
     def run_async_in_thread(loop, coro):
         asyncio.set_event_loop(loop)
@@ -41,6 +47,33 @@ def run_ollama_server():
     )
     thread.start()
 #---
+def _numa_nodes() -> int:
+    if shutil.which("numactl") is None:
+        print("numactl not found, servers are not pinned to NUMA nodes")
+        return 0
+    return len(glob.glob("/sys/devices/system/node/node[0-9]*"))
+#---
+def run_ollama_servers(setting: RAGSettings | None = None) -> int:
+    """Start `ollama serve` for every local endpoint that is not up yet, returns how many."""
+    setting = setting or RAGSettings()
+    numa_nodes = _numa_nodes() if setting.ollama.numa_pin else 0
+    started = 0
+    for index, endpoint in enumerate(get_endpoints(setting)):
+        url = urlsplit(endpoint)
+        port = url.port or 11434
+        if url.hostname not in ("localhost", "127.0.0.1") or is_port_open(port):
+            continue
+        env = {"OLLAMA_HOST": f"{url.hostname}:{port}"}
+        if setting.ollama.num_parallel > 0:
+            env["OLLAMA_NUM_PARALLEL"] = str(setting.ollama.num_parallel)
+        prefix = []
+        if numa_nodes:
+            node = index % numa_nodes
+            prefix = ["numactl", f"--cpunodebind={node}", f"--membind={node}"]
+        run_ollama_server(env=env, prefix=prefix)
+        started += 1
+    return started
+#---
 def is_port_open(port):
     with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
         try:
@@ -1,36 +1,153 @@
+import os
+import threading
+import time
+from collections import OrderedDict
 from .core import (
     LocalChatEngine,
     LocalDataIngestion,
+    IngestionJob,
+    IngestionQueue,
     LocalRAGModel,
+    LocalOllama,
     LocalEmbedding,
     LocalVectorStore,
+    QueryCoalescer,
+    AnswerCache,
+    RecordingResponse,
+    GenerationRecorder,
+    GenerationStats,
+    MeteredResponse,
+    REGISTRY,
+    RequestProfiler,
+    Trace,
+    Tracer,
     get_system_prompt,
+    span,
+    warmup_retriever,
 )
+from .setting import RAGSettings
 from llama_index.core import Settings
 from llama_index.core.chat_engine.types import StreamingAgentChatResponse
 from llama_index.core.prompts import ChatMessage, MessageRole
+
+QUERIES = REGISTRY.counter("rag_queries_total", "Queries by chat mode and topic", ["mode", "topic"])
 #------------------------------------------------------------------------------
 class LocalRAGPipeline:
-    def __init__(self) -> None:
+    _HISTORY_ROLES = {"user": MessageRole.USER, "assistant": MessageRole.ASSISTANT}
+    _MAX_CONVERSATIONS = 256
+    #----
+    def __init__(self, setting: RAGSettings | None = None) -> None:
+        self._setting = setting or RAGSettings()
         self._language = "eng"
         self._model_name = ""
         self._system_prompt = get_system_prompt("eng", is_rag_prompt=False)
-        self._engine = LocalChatEngine()
-        self._default_model = LocalRAGModel.set(self._model_name)
+        self._engine = LocalChatEngine(self._setting)
+        self._default_model = LocalRAGModel.set(self._model_name, setting=self._setting)
         self._query_engine = None
-        self._ingestion = LocalDataIngestion()
-        self._vector_store = LocalVectorStore()
-        Settings.llm = LocalRAGModel.set()
-        Settings.embed_model = LocalEmbedding.set()        
-        # Initialize persistent index
-        self._vector_index = self._vector_store.get_index()        
-        # Initialize query engine with existing index if available
-        self._query_engine = self._engine.set_engine(
-            llm=self._default_model, 
-            nodes=[], 
-            language=self._language,
-            vector_index=self._vector_index
+        # converted messages per conversation, keyed by its first turn
+        self._histories: OrderedDict[tuple, list] = OrderedDict()
+        self._history_lock = threading.Lock()
+        self._coalescer = QueryCoalescer()
+        self._answer_cache = (
+            AnswerCache(self._setting) if self._setting.cache.answer_cache else None
         )
+        self._generation_stats = GenerationStats(self._setting)
+        self._tracer = Tracer(self._setting.metrics.trace_buffer)
+        # RAG_PROFILE=1 profiles every request, otherwise only those asking for it
+        self._profile_all = os.environ.get("RAG_PROFILE", "") not in ("", "0")
+        self._ingestion = LocalDataIngestion(self._setting)
+        self._vector_store = LocalVectorStore(self._setting)
+        # ingested chunks dropped from memory are read back from the current topic
+        self._ingestion.set_node_loader(self._vector_store.get_nodes)
+        # held while new nodes are committed to the index and while the topic changes
+        self._index_lock = threading.RLock()
+        self._jobs = IngestionQueue(
+            self._run_ingestion_job, workers=self._setting.ingestion.job_workers
+        )
+        Settings.llm = LocalRAGModel.set(setting=self._setting)
+        self._vector_index = None
+        self._warm_model = ""
+        self._ready = threading.Event()
+        self._load_error = None
+        # Loading the embedding model and index is slow, let the app start serving meanwhile
+        if self._setting.pipeline.background_load:
+            threading.Thread(target=self._load, daemon=True).start()
+        else:
+            self._load()
+            if self._load_error is not None:
+                raise self._load_error
+    #----
+    def _load(self):
+        try:
+            Settings.embed_model = LocalEmbedding.set(self._setting)
+            # Initialize persistent index
+            self._vector_index = self._vector_store.get_index()
+            # Initialize query engine with existing index if available
+            self._query_engine = self._engine.set_engine(
+                llm=self._default_model,
+                nodes=[],
+                language=self._language,
+                vector_index=self._vector_index
+            )
+            self._warmup()
+        except Exception as e:
+            print(f"Error loading index: {e}")
+            self._load_error = e
+        finally:
+            self._ready.set()
+    #----
+    def _warmup(self, steps: list[str] | None = None) -> dict[str, float]:
+        """Load models and run a synthetic query so the first real request is not slower."""
+        timings = {}
+        actions = {
+            "llm": self._warmup_llm,
+            "embedding": lambda: Settings.embed_model.get_query_embedding(
+                self._setting.pipeline.warmup_query
+            ),
+            "retrieval": self._warmup_retrieval,
+        }
+        if steps is None:
+            steps = self._setting.pipeline.warmup_steps
+        for name in steps:
+            start = time.perf_counter()
+            try:
+                actions[name]()
+            except Exception as e:
+                print(f"Warmup step '{name}' failed: {e}")
+            timings[name] = round(time.perf_counter() - start, 3)
+        if timings:
+            print(f"Warmup done: {timings}")
+        return timings
+    #----
+    def _warmup_llm(self):
+        if self._model_name and isinstance(self._default_model, LocalOllama):
+            LocalRAGModel.load(self._model_name, self._setting)
+    #----
+    def _warmup_retrieval(self):
+        # vector search, BM25 and rerank of the current topic, without the LLM
+        warmup_retriever(
+            getattr(self._query_engine, "_retriever", None),
+            self._setting.pipeline.warmup_query,
+            self._setting,
+        )
+    #----
+    def _warmup_llm_in_background(self):
+        threading.Thread(target=self._warmup, args=(["llm"],), daemon=True).start()
+    #----
+    def warmup(self) -> dict[str, float]:
+        self.wait_ready()
+        return self._warmup()
+    #----
+    def is_ready(self) -> bool:
+        """True once the index and query engine are loaded."""
+        return self._ready.is_set() and self._load_error is None
+    #----
+    def wait_ready(self, timeout: float | None = None) -> bool:
+        if not self._ready.wait(timeout):
+            return False
+        if self._load_error is not None:
+            raise self._load_error
+        return True
     #----
     def get_model_name(self):
         return self._model_name
@@ -56,10 +173,16 @@ class LocalRAGPipeline:
         Settings.llm = LocalRAGModel.set(
             model_name=self._model_name,
             system_prompt=self._system_prompt,
+            setting=self._setting,
         )
         self._default_model = Settings.llm
+        # Load a newly selected LLM right away instead of on the first question
+        if "llm" in self._setting.pipeline.warmup_steps and self._model_name != self._warm_model:
+            self._warm_model = self._model_name
+            self._warmup_llm_in_background()
     #----
     def reset_engine(self):
+        self.wait_ready()
         self._query_engine = self._engine.set_engine(
             llm=self._default_model, 
             nodes=[], 
@@ -71,6 +194,7 @@ class LocalRAGPipeline:
         self._ingestion.reset()
     #----
     def clear_conversation(self):
+        self.wait_ready()
         self._query_engine.reset()
     #----
     def reset_conversation(self):
@@ -81,14 +205,22 @@ class LocalRAGPipeline:
     #----
     def delete_database(self, entire_db: bool = False):
         """Clear the vector store (optionally entire DB) and reset the pipeline state."""
-        if entire_db:
-            self._vector_store.clear_all_database()
-        else:
-            self._vector_store.clear_database()            
-        # Re-initialize state based on whatever topic the vector store is now on (fallback or default)
-        self._vector_index = self._vector_store.get_index()
-        self.reset_documents()
-        self.reset_conversation()
+        self.wait_ready()
+        with self._index_lock:
+            deleted_topic = self.get_current_topic()
+            if entire_db:
+                self._vector_store.clear_all_database()
+            else:
+                self._vector_store.clear_database()            
+            if self._answer_cache is not None:
+                if entire_db:
+                    self._answer_cache.clear()
+                else:
+                    self._answer_cache.invalidate_topic(deleted_topic)
+            # Re-initialize state based on whatever topic the vector store is now on (fallback or default)
+            self._vector_index = self._vector_store.get_index()
+            self.reset_documents()
+            self.reset_conversation()
     #----
     def get_topics(self) -> list[str]:
         """Get available topics."""
@@ -100,42 +232,104 @@ class LocalRAGPipeline:
     #----
     def switch_topic(self, topic_name: str):
         """Switch to a different topic and refresh the index."""
-        self._vector_store.change_topic(topic_name)
-        self._vector_index = self._vector_store.get_index()
-        self.reset_documents()
-        self.reset_conversation()
+        self.wait_ready()
+        with self._index_lock:
+            self._vector_store.change_topic(topic_name)
+            self._vector_index = self._vector_store.get_index()
+            self.reset_documents()
+            self.reset_conversation()
+        # the LLM does not depend on the topic, don't make the switch wait for it
+        steps = self._setting.pipeline.warmup_steps
+        self._warmup([step for step in steps if step != "llm"])
+        if "llm" in steps:
+            self._warmup_llm_in_background()
     #----
     def set_embed_model(self, model_name: str):
         Settings.embed_model = LocalEmbedding.set(model_name)
+        # Retrieval results depend on the embedding model, no cached answer is valid anymore
+        if self._answer_cache is not None:
+            self._answer_cache.clear()
     #----
     def pull_model(self, model_name: str):
-        return LocalRAGModel.pull(model_name)
+        # A pull can replace the weights behind an existing tag
+        if self._answer_cache is not None:
+            self._answer_cache.invalidate_model(model_name)
+        return LocalRAGModel.pull(model_name, setting=self._setting)
     #----
     def pull_embed_model(self, model_name: str):
-        return LocalEmbedding.pull(model_name)
+        return LocalEmbedding.pull(model_name, setting=self._setting)
     #----
     def get_installed_models(self) -> list[str]:
-        return LocalRAGModel.get_installed_models()
+        return LocalRAGModel.get_installed_models(setting=self._setting)
     #----
     def check_exist(self, model_name: str) -> bool:
-        return LocalRAGModel.check_model_exist(model_name)
+        return LocalRAGModel.check_model_exist(model_name, setting=self._setting)
     #----
     def check_exist_embed(self, model_name: str) -> bool:
-        return LocalEmbedding.check_model_exist(model_name)
+        return LocalEmbedding.check_model_exist(model_name, setting=self._setting)
     #----
-    def store_nodes(self, input_files: list[str] = None) -> None:
-        nodes = self._ingestion.store_nodes(input_files=input_files)
+    def store_nodes(
+        self,
+        input_files: list[str] = None,
+        profile: bool = False,
+        progress=None,
+        topic: str | None = None,
+    ) -> None:
+        self.wait_ready()
+        trace = self._tracer.start()
+        profiler = None
+        if profile or self._profile_all:
+            profiler = RequestProfiler(trace.request_id, self._setting).start()
+        try:
+            with trace.active(), span("store_nodes", files=len(input_files or [])):
+                self._store_nodes(input_files, progress, topic)
+        finally:
+            if profiler is not None:
+                profiler.stop()
+    #----
+    def _store_nodes(self, input_files: list[str] | None, progress=None, topic=None) -> None:
+        # Parsing and embedding leave the index alone, queries keep being answered
+        # from the current one until the new nodes are committed below
+        nodes = self._ingestion.store_nodes(input_files=input_files, progress=progress)
         if nodes:
-            # Get current index and insert new nodes
-            self._vector_index.insert_nodes(nodes)
-            
-            # Persist the storage context (docstore, index_store, etc.)
-            self._vector_index.storage_context.persist(
-                persist_dir=self._vector_store.get_persist_dir()
-            )
-            
-            # Update query engine with refreshed index
-            self.set_engine()
+            with self._index_lock:
+                if topic is not None and topic != self.get_current_topic():
+                    raise RuntimeError(
+                        f"Topic changed to '{self.get_current_topic()}' while ingesting into '{topic}'"
+                    )
+                # Get current index and insert new nodes
+                self._vector_index.insert_nodes(nodes)
+                if progress is not None:
+                    progress("upserts", len(nodes))
+                
+                # Persist the storage context (docstore, index_store, etc.)
+                self._vector_index.storage_context.persist(
+                    persist_dir=self._vector_store.get_persist_dir()
+                )
+                if self._answer_cache is not None:
+                    self._answer_cache.invalidate_topic(self.get_current_topic())
+                
+                # Update query engine with refreshed index; the nodes of this call,
+                # the last ingested files may belong to another job running alongside
+                self.set_engine(nodes)
+    #----
+    def submit_ingestion(self, input_files: list[str], profile: bool = False) -> IngestionJob:
+        """Ingest the files into the current topic in the background, see `get_ingestion_job`."""
+        return self._jobs.submit(input_files, self.get_current_topic(), profile)
+    #----
+    def _run_ingestion_job(self, job: IngestionJob) -> None:
+        self.store_nodes(job.files, profile=job.profile, progress=job.update, topic=job.topic)
+        # there are documents now: the default prompt becomes the RAG one, a custom prompt is kept
+        default = get_system_prompt(language=self._language, is_rag_prompt=False)
+        self.set_system_prompt(None if self._system_prompt == default else self._system_prompt)
+        self.set_model()
+        self.set_engine()
+    #----
+    def get_ingestion_job(self, job_id: str) -> IngestionJob | None:
+        return self._jobs.get(job_id)
+    #----
+    def get_ingestion_jobs(self) -> list[IngestionJob]:
+        return self._jobs.jobs()
     #----
     def set_chat_mode(self, system_prompt: str | None = None):
         self.set_language(self._language)
@@ -143,29 +337,152 @@ class LocalRAGPipeline:
         self.set_model()
         self.set_engine()
     #----
-    def set_engine(self):
+    def set_engine(self, nodes: list | None = None):
+        self.wait_ready()
+        if nodes is None:
+            # the engine only checks for documents, no need to read dropped chunks back
+            nodes = self._ingestion.get_ingested_nodes(fetch=False)
         self._query_engine = self._engine.set_engine(
             llm=self._default_model,
-            nodes=self._ingestion.get_ingested_nodes(),
+            nodes=nodes,
             language=self._language,
             vector_index=self._vector_index
         )
     #----
     def get_history(self, chatbot: list[dict[str, str]]):
-        history = []
-        for chat in chatbot:
-            if chat["role"] == "user":
-                history.append(ChatMessage(role=MessageRole.USER, content=chat["content"]))
-            elif chat["role"] == "assistant":
-                history.append(ChatMessage(role=MessageRole.ASSISTANT, content=chat["content"]))
-        return history
+        """Convert the Gradio chatbot list, reusing messages converted on earlier turns.
+
+        Every conversation (told apart by its first turn) has its own cache, so
+        sessions and API clients chatting at the same time don't evict each other.
+        """
+        if not chatbot:
+            return []
+        key = (chatbot[0]["role"], chatbot[0]["content"])
+        with span("history") as attrs:
+            with self._history_lock:
+                # taken out while it is updated, a concurrent turn starts from scratch
+                history = self._histories.pop(key, [])
+            # keep the common prefix, only new or edited turns (undo, clear) are rebuilt
+            keep = 0
+            for (role, content, _), chat in zip(history, chatbot):
+                if role != chat["role"] or content != chat["content"]:
+                    break
+                keep += 1
+            del history[keep:]
+            for chat in chatbot[keep:]:
+                role = self._HISTORY_ROLES.get(chat["role"])
+                message = None
+                if role is not None:
+                    message = ChatMessage(role=role, content=chat["content"])
+                history.append((chat["role"], chat["content"], message))
+            attrs["rebuilt"] = len(chatbot) - keep
+            messages = [message for _, _, message in history if message is not None]
+            with self._history_lock:
+                self._histories[key] = history
+                while len(self._histories) > self._MAX_CONVERSATIONS:
+                    self._histories.popitem(last=False)
+            return messages
     #----
     def query(
+        self,
+        mode: str,
+        message: str,
+        chatbot: list[dict[str, str]],
+        profile: bool = False,
+    ) -> StreamingAgentChatResponse:
+        QUERIES.labels(mode, self.get_current_topic()).inc()
+        trace = self._tracer.start()
+        with trace.active(), span("query", mode=mode):
+            if not (profile or self._profile_all):
+                return self._route_query(trace, mode, message, chatbot)
+            profiler = RequestProfiler(trace.request_id, self._setting).start()
+            try:
+                response = self._route_query(trace, mode, message, chatbot)
+            except Exception:
+                profiler.stop()
+                raise
+            if profiler.mode == "cprofile":
+                # cProfile only sees this thread, the answer is generated in another one
+                profiler.stop()
+                return response
+            return RecordingResponse(
+                response, on_complete=lambda *_: profiler.stop(), on_close=profiler.stop
+            )
+    #----
+    def _route_query(
+        self, trace: Trace, mode: str, message: str, chatbot: list[dict[str, str]]
+    ) -> StreamingAgentChatResponse:
+        if mode == "chat" and self.get_history(chatbot):
+            return self._metered(trace, mode, lambda: self._query(mode, message, chatbot))
+        # Standalone questions only depend on the message, so they can be cached and shared
+        topic = self.get_current_topic()
+        question = " ".join(message.split())
+        key = version = None
+        if self._answer_cache is not None and mode != "chat":
+            # read once: the answer is only stored if no ingestion bumped it meanwhile
+            version = self._answer_cache.get_version(topic)
+            key = self._answer_cache.make_key(
+                topic, self._model_name, self._system_prompt, question, version
+            )
+            cached = self._answer_cache.get(key)
+            if cached is not None:
+                return cached
+
+        def compute():
+            response = self._metered(trace, mode, lambda: self._query(mode, message, chatbot))
+            if key is None:
+                return response
+            return self._answer_cache.record(
+                key, topic, self._model_name, response, version
+            )
+
+        if not self._setting.pipeline.coalesce_queries:
+            return compute()
+        return self._coalescer.run(
+            (topic, mode, self._model_name, self._system_prompt, self._language, question),
+            compute,
+        )
+    #----
+    def _metered(self, trace: Trace, mode: str, run) -> MeteredResponse:
+        """Run a query and measure its answer: TTFT plus Ollama's prompt and decode counters."""
+        recorder = GenerationRecorder()
+        with recorder.active():
+            response = run()
+        topic = self.get_current_topic()
+
+        def on_complete(metrics):
+            trace.record("total", trace.start, time.perf_counter())
+            self._generation_stats.record(
+                metrics, mode=mode, topic=topic, request_id=trace.request_id
+            )
+
+        return MeteredResponse(
+            response,
+            recorder,
+            self._model_name,
+            trace.start,
+            on_complete=on_complete,
+            request_id=trace.request_id,
+        )
+    #----
+    def get_generation_stats(self) -> dict[str, dict[str, float]]:
+        """Per-model aggregates of the generation metrics since startup."""
+        return self._generation_stats.summary()
+    #----
+    def get_traces(self, request_id: str | None = None) -> list[dict]:
+        """Spans of recent queries (all, or of one request id)."""
+        return self._tracer.spans(request_id)
+    #----
+    def export_traces(self, path: str, request_id: str | None = None) -> int:
+        return self._tracer.export_jsonl(path, request_id)
+    #----
+    def _query(
         self, mode: str, message: str, chatbot: list[dict[str, str]]
     ) -> StreamingAgentChatResponse:
+        self.wait_ready()
+        # a copy with its own memory per query, concurrent callers (API, batch
+        # workers) would otherwise share one chat memory buffer
+        engine = self._engine.standalone(self._query_engine)
         if mode == "chat":
-            history = self.get_history(chatbot)
-            return self._query_engine.stream_chat(message, history)
-        else:
-            self._query_engine.reset()
-            return self._query_engine.stream_chat(message)
+            return engine.stream_chat(message, self.get_history(chatbot))
+        return engine.stream_chat(message)
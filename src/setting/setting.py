@@ -11,9 +11,36 @@ class OllamaSettings(BaseModel):
     repeat_penalty: float = Field(default=1.1, description="Repeat penalty")
     request_timeout: float = Field(default=300, description="Request timeout")
     port: int = Field(default=11434, description="Port number")
+    connect_timeout: float = Field(default=3.0, description="Connect timeout")
+    inventory_timeout: float = Field(
+        default=5.0, description="Timeout for listing the installed models"
+    )
+    inventory_ttl: float = Field(
+        default=30.0, description="Seconds the installed model list is cached"
+    )
+    pool_size: int = Field(default=16, description="Keep-alive connections per server")
+    endpoints: List[str] = Field(
+        default=[],
+        description="Ollama servers to balance across (default: local servers from port on)",
+    )
+    num_servers: int = Field(
+        default=1, description="Local ollama serve processes on consecutive ports"
+    )
+    num_parallel: int = Field(
+        default=0, description="OLLAMA_NUM_PARALLEL of launched servers (0 = Ollama default)"
+    )
+    numa_pin: bool = Field(
+        default=False, description="Pin launched servers to NUMA nodes with numactl"
+    )
+    health_interval: float = Field(
+        default=10.0, description="Seconds between backend health checks"
+    )
     context_window: int = Field(default=16000, description="Context window size")
     temperature: float = Field(default=0.1, description="Temperature")
     chat_token_limit: int = Field(default=4000, description="Chat memory limit")
+    condense_cache_size: int = Field(
+        default=256, description="Max memoized condensed questions (0 disables)"
+    )
 #------------------------------------------------------------------------------
 class RetrieverSettings(BaseModel):
     num_queries: int = Field(default=5, description="Number of generated queries")
@@ -40,6 +67,13 @@ class IngestionSettings(BaseModel):
     )
     paragraph_sep: str = Field(default="\n \n", description="Paragraph separator")
     num_workers: int = Field(default=0, description="Number of workers")
+    job_workers: int = Field(
+        default=1, description="Background threads running ingestion jobs"
+    )
+    node_cache_mb: int = Field(
+        default=256,
+        description="Ingested chunks kept in memory, older ones are read back from the vector store",
+    )
 #------------------------------------------------------------------------------
 class StorageSettings(BaseModel):
     persist_dir_chroma: str = Field(
@@ -51,8 +85,66 @@ class StorageSettings(BaseModel):
     collection_name: str = Field(default="collection", description="Collection name")
     port: int = Field(default=8000, description="Port number")
 #------------------------------------------------------------------------------
+class CacheSettings(BaseModel):
+    cache_dir: str = Field(default="data/cache", description="Cache directory")
+    answer_cache: bool = Field(
+        default=False, description="Replay cached answers for repeated QA questions"
+    )
+    answer_cache_max_mb: int = Field(default=256, description="Answer cache size limit")
+#------------------------------------------------------------------------------
+class PipelineSettings(BaseModel):
+    background_load: bool = Field(
+        default=True, description="Load the embedding model and index in the background"
+    )
+    coalesce_queries: bool = Field(
+        default=True, description="Share one answer between identical in-flight queries"
+    )
+    warmup_steps: List[str] = Field(
+        default=["llm", "embedding", "retrieval"],
+        description="Warmup steps at startup and after a topic switch (llm, embedding, retrieval)",
+    )
+    warmup_query: str = Field(
+        default="What is this document about?", description="Synthetic warmup query"
+    )
+#------------------------------------------------------------------------------
+class ApiSettings(BaseModel):
+    host: str = Field(default="127.0.0.1", description="API server host")
+    port: int = Field(default=7861, description="API server port")
+    max_streams: int = Field(default=64, description="Max concurrent answer streams")
+    max_body_mb: int = Field(default=100, description="Max request body size")
+#------------------------------------------------------------------------------
+class UISettings(BaseModel):
+    stream_frame_ms: int = Field(
+        default=40, description="Streamed tokens are sent to the chatbot at most this often"
+    )
+#------------------------------------------------------------------------------
+class MetricsSettings(BaseModel):
+    generation_log: str = Field(
+        default="data/metrics/generation.jsonl",
+        description="JSONL log of per-query generation metrics (empty disables)",
+    )
+    trace_buffer: int = Field(
+        default=10000, description="Spans of recent queries kept in memory"
+    )
+    profile_dir: str = Field(default="data/profiles", description="Request profiles")
+    profile_mode: str = Field(
+        default="sample",
+        description="sample (all threads, collapsed stacks) or cprofile (calling thread, pstats)",
+    )
+    profile_interval_ms: float = Field(default=5.0, description="Sampling interval")
+    profile_max_s: float = Field(
+        default=600.0, description="Stop sampling a request after this long"
+    )
+    host: str = Field(default="127.0.0.1", description="Metrics endpoint host")
+    port: int = Field(default=9464, description="Metrics endpoint port")
+#------------------------------------------------------------------------------
 class RAGSettings(BaseModel):
     ollama: OllamaSettings = OllamaSettings()
     retriever: RetrieverSettings = RetrieverSettings()
     ingestion: IngestionSettings = IngestionSettings()
     storage: StorageSettings = StorageSettings()
+    pipeline: PipelineSettings = PipelineSettings()
+    cache: CacheSettings = CacheSettings()
+    api: ApiSettings = ApiSettings()
+    ui: UISettings = UISettings()
+    metrics: MetricsSettings = MetricsSettings()
@@ -0,0 +1,25 @@
+import pytest
+from src.core.cache.answer_cache import AnswerCache
+from src.setting import RAGSettings
+
+
+@pytest.fixture
+def cache(tmp_path):
+    setting = RAGSettings()
+    setting.cache.cache_dir = str(tmp_path)
+    return AnswerCache(setting)
+
+
+def test_answer_is_stored_at_its_version(cache):
+    version = cache.get_version("topic")
+    key = cache.make_key("topic", "model", None, "question", version)
+    cache.put(key, "topic", "model", "answer", [], version)
+    assert str(cache.get(key)) == "answer"
+
+
+def test_answer_generated_during_ingestion_is_dropped(cache):
+    version = cache.get_version("topic")
+    key = cache.make_key("topic", "model", None, "question", version)
+    cache.invalidate_topic("topic")
+    cache.put(key, "topic", "model", "stale answer", [], version)
+    assert cache.get(key) is None
@@ -0,0 +1,61 @@
+import threading
+from src.core.engine.coalesce import QueryCoalescer
+
+
+class _Stream:
+    """Response whose tokens are released one at a time by the test."""
+
+    def __init__(self) -> None:
+        self.release = threading.Semaphore(0)
+        self.sent = 0
+        self.closed = threading.Event()
+
+    @property
+    def response_gen(self):
+        while not self.closed.is_set():
+            self.release.acquire()
+            self.sent += 1
+            yield f"t{self.sent} "
+
+    def close(self) -> None:
+        self.closed.set()
+
+
+def test_readers_share_one_generation():
+    coalescer = QueryCoalescer()
+    stream = _Stream()
+    calls = []
+
+    def compute():
+        calls.append(1)
+        return stream
+
+    first = coalescer.run("key", compute)
+    second = coalescer.run("key", compute)
+    tokens = second.response_gen
+    stream.release.release()
+    assert next(tokens) == "t1 "
+    assert len(calls) == 1
+    first.close()
+    second.close()
+
+
+def test_generation_is_closed_once_every_reader_left():
+    coalescer = QueryCoalescer()
+    stream = _Stream()
+    first = coalescer.run("key", lambda: stream)
+    second = coalescer.run("key", lambda: stream)
+
+    first.close()
+    assert not stream.closed.is_set()
+    tokens = second.response_gen
+    stream.release.release()
+    next(tokens)
+    tokens.close()
+    assert stream.closed.wait(1)
+
+    # the abandoned stream is not joined, the next request starts over
+    fresh = _Stream()
+    coalescer.run("key", lambda: fresh).close()
+    assert fresh.closed.is_set()
+    stream.release.release()
@@ -0,0 +1,56 @@
+import uuid
+import chromadb
+import pytest
+from llama_index.core import Settings, StorageContext, VectorStoreIndex
+from llama_index.core.chat_engine import SimpleChatEngine
+from llama_index.core.embeddings import MockEmbedding
+from llama_index.core.llms import MockLLM
+from llama_index.core.postprocessor.types import BaseNodePostprocessor
+from llama_index.core.schema import TextNode
+from llama_index.vector_stores.chroma import ChromaVectorStore
+from src.core.engine import LocalChatEngine
+from src.core.engine import retriever
+from src.core.engine.engine import LocalCondensePlusContextChatEngine
+from src.setting import RAGSettings
+
+
+class _KeepAll(BaseNodePostprocessor):
+    def _postprocess_nodes(self, nodes, query_bundle=None):
+        return nodes
+
+
+@pytest.fixture
+def setting():
+    setting = RAGSettings()
+    Settings.embed_model = MockEmbedding(embed_dim=8)
+    # no cross-encoder download for the two stage retriever
+    key = (setting.retriever.rerank_llm, setting.retriever.top_k_rerank)
+    retriever._rerankers[key] = _KeepAll()
+    yield setting
+    retriever._rerankers.pop(key, None)
+
+
+def _chroma_index(texts: list[str]) -> VectorStoreIndex:
+    """Index over a fresh Chroma collection, loaded like the app does after a restart."""
+    collection = chromadb.EphemeralClient().get_or_create_collection(f"test_{uuid.uuid4().hex}")
+    vector_store = ChromaVectorStore(chroma_collection=collection)
+    if texts:
+        VectorStoreIndex(
+            nodes=[TextNode(text=text) for text in texts],
+            storage_context=StorageContext.from_defaults(vector_store=vector_store),
+        )
+    # the docstore of an index loaded from Chroma is empty
+    return VectorStoreIndex.from_vector_store(vector_store)
+
+
+def test_empty_collection_gives_simple_chat(setting):
+    index = _chroma_index([])
+    engine = LocalChatEngine(setting).set_engine(MockLLM(), nodes=[], vector_index=index)
+    assert isinstance(engine, SimpleChatEngine)
+
+
+def test_collection_with_chunks_gives_rag_engine(setting):
+    index = _chroma_index(["The owl waited by the lake.", "A letter came from the castle."])
+    assert len(index.docstore.docs) == 0
+    engine = LocalChatEngine(setting).set_engine(MockLLM(), nodes=[], vector_index=index)
+    assert isinstance(engine, LocalCondensePlusContextChatEngine)
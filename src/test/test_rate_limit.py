@@ -0,0 +1,85 @@
+import asyncio
+import pytest
+from src.eval.rate_limit import AdaptiveLimiter
+
+
+def _succeed(limiter: AdaptiveLimiter, latency: float, times: int = 1) -> None:
+    for _ in range(times):
+        limiter._adjust(latency, False, limiter._epoch)
+
+
+def test_grows_on_fast_calls():
+    limiter = AdaptiveLimiter("test", max_concurrency=8)
+    _succeed(limiter, 1.0, 50)
+    assert limiter.limit == 8
+
+
+def test_single_slow_call_does_not_cut():
+    limiter = AdaptiveLimiter("test", max_concurrency=8, initial=8)
+    _succeed(limiter, 1.0, 10)
+    _succeed(limiter, 10.0)
+    _succeed(limiter, 1.0)
+    assert limiter.limit == 8
+    assert limiter.decreases == 0
+
+
+def test_sustained_inflation_cuts():
+    limiter = AdaptiveLimiter("test", max_concurrency=8, initial=8, patience=3)
+    _succeed(limiter, 1.0, 10)
+    _succeed(limiter, 10.0, 3)
+    assert limiter.limit == 6
+    assert limiter.decreases == 1
+
+
+def test_recovers_from_a_lasting_slowdown():
+    # the fastest call ever must not stay the reference, or the limit never grows again
+    limiter = AdaptiveLimiter("test", max_concurrency=8, initial=8)
+    _succeed(limiter, 0.1, 10)
+    _succeed(limiter, 2.0, 100)
+    assert limiter.limit == 8
+
+
+def test_error_halves_once_per_window():
+    limiter = AdaptiveLimiter("test", max_concurrency=8, initial=8)
+    epoch = limiter._epoch
+    limiter._adjust(1.0, True, epoch)
+    limiter._adjust(1.0, True, epoch)
+    assert limiter.limit == 4
+    assert limiter.errors == 2
+    assert limiter.decreases == 1
+
+
+def test_run_keeps_in_flight_under_limit_and_retries():
+    limiter = AdaptiveLimiter("test", max_concurrency=3, initial=3, retries=1, backoff=0.0)
+    in_flight = 0
+    peak = 0
+    attempts = {}
+
+    async def call(i: int) -> int:
+        nonlocal in_flight, peak
+        in_flight += 1
+        peak = max(peak, in_flight)
+        await asyncio.sleep(0.01)
+        in_flight -= 1
+        attempts[i] = attempts.get(i, 0) + 1
+        if i == 0 and attempts[i] == 1:
+            raise RuntimeError("flaky")
+        return i
+
+    async def main():
+        return await asyncio.gather(*[limiter.run(lambda i=i: call(i)) for i in range(12)])
+
+    assert asyncio.run(main()) == list(range(12))
+    assert peak <= 3
+    assert limiter.retried == 1
+
+
+def test_timeout_counts_as_error():
+    limiter = AdaptiveLimiter("test", timeout=0.01, retries=0)
+
+    async def main():
+        await limiter.run(lambda: asyncio.sleep(1))
+
+    with pytest.raises(asyncio.TimeoutError):
+        asyncio.run(main())
+    assert limiter.errors == 1
@@ -0,0 +1,31 @@
+import threading
+from src.core.metrics.registry import MetricsRegistry
+
+
+def _in_threads(fn, count: int = 8) -> None:
+    threads = [threading.Thread(target=fn) for _ in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+
+def test_counter_keeps_counts_of_finished_threads():
+    counter = MetricsRegistry().counter("test_total", "test")
+    _in_threads(lambda: [counter.inc() for _ in range(100)])
+    counter.inc()
+    child = counter.labels()
+    assert child.get() == 801
+    # only the slot of this thread is left
+    assert len(child._slots) == 1
+
+
+def test_histogram_keeps_observations_of_finished_threads():
+    registry = MetricsRegistry()
+    histogram = registry.histogram("test_seconds", "test", buckets=[1.0])
+    _in_threads(lambda: histogram.observe(0.5), count=4)
+    _in_threads(lambda: histogram.observe(2.0), count=2)
+    child = histogram.labels()
+    assert child.get() == ([4, 2], 6.0)
+    assert len(child._shards) == 0
+    assert 'test_seconds_bucket{le="1"} 4' in registry.render()
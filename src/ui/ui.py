@@ -11,6 +11,7 @@ from .theme import JS_LIGHT_THEME, CSS
 from ..core.prompt.qa_prompt import get_system_prompt
 from ..pipeline import LocalRAGPipeline
 from ..logger import Logger
+from ..setting import RAGSettings
 #------------------------------------------------------------------------------
 @dataclass
 class DefaultElement:
@@ -29,12 +30,13 @@ class DefaultElement:
     MODEL_NOT_EXIST_STATUS: str = "Model doesn't exist!"
     PROCESS_DOCUMENT_SUCCESS_STATUS: str = "Processing documents 📄 completed!"
     PROCESS_DOCUMENT_EMPTY_STATUS: str = "Empty documents!"
+    LOADING_INDEX_STATUS: str = "Loading index ..."
     ANSWERING_STATUS: str = "Answering!"
     COMPLETED_STATUS: str = "Completed!"
 #------------------------------------------------------------------------------
 class LLMResponse:
-    def __init__(self) -> None:
-        pass
+    def __init__(self, frame_interval: float = 0.04) -> None:
+        self._frame_interval = frame_interval
     #---
     def _yield_string(self, message: str):
         for i in range(len(message)):
@@ -60,18 +62,33 @@ class LLMResponse:
         history: list[list[str]],
         response: StreamingAgentChatResponse,
     ):
-        answer = []
+        # Tokens are collected into frames of `frame_interval`, and only the chatbot
+        # is updated while answering. Gradio sends a streamed value as a diff to
+        # the previous one, so a frame only carries the newly appended text.
+        assistant = {"role": "assistant", "content": ""}
+        chatbot = history + [{"role": "user", "content": message}, assistant]
+        pending = []
+        last_frame = None
         for text in response.response_gen:
-            answer.append(text)
-            yield (
-                DefaultElement.DEFAULT_MESSAGE,
-                history + [{"role": "user", "content": message}, {"role": "assistant", "content": "".join(answer)}],
-                DefaultElement.ANSWERING_STATUS,
-            )
+            pending.append(text)
+            now = time.perf_counter()
+            if last_frame is not None and now - last_frame < self._frame_interval:
+                continue
+            assistant["content"] += "".join(pending)
+            pending = []
+            if last_frame is None:
+                yield (DefaultElement.DEFAULT_MESSAGE, chatbot, DefaultElement.ANSWERING_STATUS)
+            else:
+                yield (gr.update(), chatbot, gr.update())
+            last_frame = now
+        assistant["content"] += "".join(pending)
+        metrics = getattr(response, "metrics", None)
         yield (
             DefaultElement.DEFAULT_MESSAGE,
-            history + [{"role": "user", "content": message}, {"role": "assistant", "content": "".join(answer)}],
-            DefaultElement.COMPLETED_STATUS,
+            chatbot,
+            f"{DefaultElement.COMPLETED_STATUS} {metrics.status()}"
+            if metrics is not None
+            else DefaultElement.COMPLETED_STATUS,
         )
 #------------------------------------------------------------------------------
 class LocalChatbotUI:
@@ -81,7 +98,9 @@ class LocalChatbotUI:
         logger: Logger,
         data_dir: str = "data/data",
         avatar_images: list[str] = ["./assets/user.png", "./assets/bot.png"],
+        setting: RAGSettings | None = None,
     ):
+        self._setting = setting or RAGSettings()
         self._pipeline = pipeline
         self._logger = logger
         self._data_dir = os.path.join(os.getcwd(), data_dir)
@@ -91,13 +110,14 @@ class LocalChatbotUI:
             os.path.join(os.getcwd(), image) for image in avatar_images
         ]
         self._variant = "panel"
-        self._llm_response = LLMResponse()
+        self._llm_response = LLMResponse(self._setting.ui.stream_frame_ms / 1000)
     #---
     def _get_response(
         self,
         chat_mode: str,
         message: dict[str, str],
         chatbot: list[dict[str, str]],
+        profile: bool = False,
         progress=gr.Progress(track_tqdm=True),
     ):
         if self._pipeline.get_model_name() in [None, ""]:
@@ -107,9 +127,18 @@ class LocalChatbotUI:
             for m in self._llm_response.empty_message():
                 yield m
         else:
+            if not self._pipeline.is_ready():
+                yield (
+                    DefaultElement.DEFAULT_MESSAGE,
+                    chatbot + [{"role": "user", "content": message["text"]}],
+                    DefaultElement.LOADING_INDEX_STATUS,
+                )
+                self._pipeline.wait_ready()
             console = sys.stdout
             sys.stdout = self._logger
-            response = self._pipeline.query(chat_mode, message["text"], chatbot)
+            response = self._pipeline.query(
+                chat_mode, message["text"], chatbot, profile=profile
+            )
             for m in self._llm_response.stream_response(
                 message["text"], chatbot, response
             ):
@@ -200,13 +229,40 @@ class LocalChatbotUI:
         return (gr.update(visible=visible), gr.update(visible=visible))
     #---
     def _processing_document(
-        self, document: list[str], progress=gr.Progress(track_tqdm=True)
+        self,
+        document: list[str],
+        profile: bool = False,
     ):
         document = document or []
-        self._pipeline.store_nodes(input_files=document)
-        self._pipeline.set_chat_mode()
-        gr.Info("Processing Completed!")
-        return (self._pipeline.get_system_prompt(), DefaultElement.COMPLETED_STATUS)
+        if not document:
+            self._pipeline.store_nodes(input_files=document, profile=profile)
+            self._pipeline.set_chat_mode()
+            return (
+                self._pipeline.get_system_prompt(),
+                DefaultElement.COMPLETED_STATUS,
+                None,
+                gr.Timer(active=False),
+            )
+        # Ingest in the background, the session keeps chatting with the current index
+        job = self._pipeline.submit_ingestion(document, profile=profile)
+        return (gr.update(), job.status_text(), job.id, gr.Timer(active=True))
+    #---
+    def _poll_ingestion(self, job_id: str | None):
+        job = self._pipeline.get_ingestion_job(job_id) if job_id else None
+        if job is None:
+            return (gr.update(), gr.update(), None, gr.Timer(active=False))
+        if job.status not in ("done", "failed"):
+            return (gr.update(), job.status_text(), job_id, gr.Timer(active=True))
+        if job.status == "done":
+            gr.Info("Processing Completed!")
+        else:
+            gr.Warning(job.status_text())
+        return (
+            self._pipeline.get_system_prompt(),
+            job.status_text(),
+            None,
+            gr.Timer(active=False),
+        )
     #---
     def _change_system_prompt(self, sys_prompt: str):
         self._pipeline.set_system_prompt(sys_prompt)
@@ -296,6 +352,8 @@ class LocalChatbotUI:
             gr.Markdown("## Local RAG Chatbot 🤖")
             with gr.Tab("Interface"):
                 sidebar_state = gr.State(True)
+                ingestion_job = gr.State(None)
+                ingestion_timer = gr.Timer(1, active=False)
                 with gr.Row(variant=self._variant, equal_height=False):
                     with gr.Column(
                         variant=self._variant, scale=10, visible=sidebar_state.value
@@ -402,6 +460,11 @@ class LocalChatbotUI:
                             max_lines=50,
                         )
                         sys_prompt_btn = gr.Button(value="Set System Prompt")
+                        profile = gr.Checkbox(
+                            label="Profile requests (saved to the profile directory)",
+                            value=False,
+                            interactive=True,
+                        )
                         #---
                         gr.Markdown("---")
                         gr.Markdown("### ⚠️ Danger Zone")
@@ -460,7 +523,7 @@ class LocalChatbotUI:
                 self._upload_document, inputs=[documents, message], outputs=[documents]
             ).then(
                 self._get_response,
-                inputs=[chat_mode, message, chatbot],
+                inputs=[chat_mode, message, chatbot, profile],
                 outputs=[message, chatbot, status],
             )
             language.change(self._change_language, inputs=[language], outputs=[system_prompt])
@@ -471,13 +534,19 @@ class LocalChatbotUI:
             )
             documents.change(
                 self._processing_document,
-                inputs=[documents],
-                outputs=[system_prompt, status],
+                inputs=[documents, profile],
+                outputs=[system_prompt, status, ingestion_job, ingestion_timer],
             ).then(
                 self._show_document_btn,
                 inputs=[documents],
                 outputs=[upload_doc_btn, reset_doc_btn],
             )
+            ingestion_timer.tick(
+                self._poll_ingestion,
+                inputs=[ingestion_job],
+                outputs=[system_prompt, status, ingestion_job, ingestion_timer],
+                show_progress="hidden",
+            )
             #---
             sys_prompt_btn.click(self._change_system_prompt, inputs=[system_prompt])
             ui_btn.click(